@@ -0,0 +1,159 @@
+"""Admission control in front of the OCR and LLM stages.
+
+- ``REQUESTS``: a token bucket per client, checked before any work is done.
+  Over it the endpoints answer 429 with ``Retry-After``.
+- ``AI_QUOTA``: a second bucket per client, spent one token per LLM call.
+  Over it the request is still served, from the rule-based path only.
+- ``AI_GATE``: LLM calls running in, or queued for, the AI thread pool. Past
+  AI_MAX_CONCURRENCY + AI_MAX_PENDING new calls are skipped rather than left
+  to wait in the queue until the request's deadline runs out.
+
+Skipped calls leave ``meta.degraded`` set on the response. OCR has its own
+bound (OCR_WORKERS + OCR_MAX_PENDING, see ``ocr.OCRBusy``). All limits are
+per process, like the metrics.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import threading
+import time
+
+from django.conf import settings
+
+
+# Reasons an AI call is skipped under load; they mark a response as degraded.
+SHED_REASONS = ("overload", "quota")
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``capacity``."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """0.0 after taking ``cost`` tokens, else seconds until they are there."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """One token bucket per client key; a ``rate`` of 0 admits everything.
+
+    Only the ``max_clients`` most recently seen clients keep a bucket; a
+    client that was dropped starts again with a full one.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """0.0 if admitted, else seconds to wait before trying again.
+
+        ``cost`` is capped at the burst size, so a large batch is never
+        refused outright.
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(min(cost, self.burst), now)
+
+    def clients(self) -> int:
+        return len(self._buckets)
+
+
+class StageGate:
+    """Counts calls in a stage and refuses new ones once ``limit`` are in it."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, force: bool = False) -> bool:
+        """Take a slot; ``force`` takes one even past the limit (work that must not be shed)."""
+        with self._lock:
+            if not force and self._in_use >= self.limit:
+                return False
+            self._in_use += 1
+            return True
+
+    def release(self, *_) -> None:
+        """Give a slot back; usable as a future's done callback."""
+        with self._lock:
+            self._in_use -= 1
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+
+REQUESTS = RateLimiter(
+    getattr(settings, "RATE_LIMIT_PER_SECOND", 0.0),
+    getattr(settings, "RATE_LIMIT_BURST", 20),
+)
+AI_QUOTA = RateLimiter(
+    getattr(settings, "AI_RATE_LIMIT_PER_MINUTE", 0.0) / 60.0,
+    getattr(settings, "AI_RATE_LIMIT_BURST", 10),
+)
+AI_GATE = StageGate(getattr(settings, "AI_MAX_CONCURRENCY", 8) + getattr(settings, "AI_MAX_PENDING", 16))
+
+
+def client_key(request) -> str:
+    """Who a request is rate limited as.
+
+    RATE_LIMIT_CLIENT_HEADER when set and present (e.g. an API key checked by
+    a gateway). Else, behind RATE_LIMIT_TRUST_FORWARDED proxies, the
+    X-Forwarded-For entry the outermost trusted proxy appended: the
+    N-th from the right, as entries left of it come from the client and can
+    be anything. Else the socket peer address.
+    """
+    header = getattr(settings, "RATE_LIMIT_CLIENT_HEADER", "")
+    if header:
+        value = request.headers.get(header)
+        if value:
+            return "h:" + value.strip()[:128]
+    hops = int(getattr(settings, "RATE_LIMIT_TRUST_FORWARDED", 0))
+    if hops > 0:
+        entries = [e.strip() for e in request.headers.get("X-Forwarded-For", "").split(",") if e.strip()]
+        if len(entries) >= hops:
+            return entries[-hops]
+    return request.META.get("REMOTE_ADDR") or "unknown"
+
+
+def admit(key: str, cost: float = 1.0) -> Optional[float]:
+    """None if the client may proceed, else the seconds it should wait."""
+    wait = REQUESTS.acquire(key, cost)
+    return wait if wait > 0 else None
+
+
+def snapshot() -> Dict:
+    return {
+        "ai_in_flight": AI_GATE.in_use,
+        "ai_limit": AI_GATE.limit,
+        "tracked_clients": REQUESTS.clients(),
+    }
@@ -1,26 +1,207 @@
+"""Groq calls for AI extraction and summaries.
+
+The groq SDK and its HTTP client are imported and built on first use, not at
+import time: they are most of this app's import cost, and a process that
+never calls the LLM (no key, or every report handled by the rules) should not
+pay for them. ``preload()`` imports the SDK ahead of time without creating a
+client, so a preloading gunicorn master can share it with its workers.
+"""
 import json
+import logging
 import os
-from groq import Groq, APIError
-from typing import List, Tuple, Dict
+import threading
+from typing import List, Optional, Tuple, Dict
 import re
-from dotenv import load_dotenv
+import hashlib
+from django.conf import settings
+from .cache import LRUCache
+from . import metrics, validation
+from .resilience import CircuitBreaker, Deadline, SingleFlight, call_with_retries
+
+
+logger = logging.getLogger(__name__)
+
+
+class AIExtractError(Exception):
+    """AI extraction failed (deadline, open breaker, provider error, unusable
+    reply), as opposed to finding no further tests."""
+
+
+def _http_client():
+    """One pooled, keep-alive transport shared by every thread that calls Groq."""
+    import httpx
+
+    max_connections = getattr(settings, "AI_HTTP_MAX_CONNECTIONS", 16)
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=getattr(settings, "AI_HTTP_MAX_KEEPALIVE", max_connections),
+            keepalive_expiry=getattr(settings, "AI_HTTP_KEEPALIVE_EXPIRY", 30.0),
+        ),
+        # Per-call timeouts come from call_with_retries; this only bounds connects.
+        timeout=httpx.Timeout(getattr(settings, "AI_CALL_TIMEOUT", 10.0), connect=5.0),
+        follow_redirects=True,
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def preload() -> None:
+    """Import the SDK now (e.g. in a preloading master) instead of on the first call."""
+    import groq  # noqa: F401
+
+
+def _groq_client():
+    """The shared Groq client, built on first use.
+
+    Retries are handled by call_with_retries so they respect the request
+    deadline. GROQ_BASE_URL (read by the client) can point at a local stub.
+    The client is created in the process that uses it, never before a fork.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+
+                _client = Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0, http_client=_http_client())
+    return _client
+
+
+def _retryable() -> Tuple[type, ...]:
+    from groq import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 
+    return APITimeoutError, APIConnectionError, RateLimitError, InternalServerError
 
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
 
+_MODEL = "llama-3.3-70b-versatile"
 
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+_breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, "AI_BREAKER_FAILURES", 5),
+    reset_timeout=getattr(settings, "AI_BREAKER_RESET_SECONDS", 30.0),
+)
 
 def _has_groq_key() -> bool:
   return bool(os.getenv("GROQ_API_KEY"))
 
-def extract_tests_ai(text: str) -> Tuple[List[str], float]:
-    """Use Groq API to extract tests, then validate against source text."""
+
+# Identical prompts in flight at the same time (several users posting the same
+# report) share one Groq call.
+_flights = SingleFlight()
+
+
+def breaker_state() -> Dict:
+    return _breaker.snapshot()
+
+
+def _chat(system: str, user: str, deadline: Optional[Deadline] = None, call: str = "") -> str:
+    """One chat completion under the shared deadline, retry policy and breaker.
+
+    Concurrent calls with the same prompt are coalesced into one request.
+    """
+    def create(timeout: float):
+        return _groq_client().chat.completions.create(
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            model=_MODEL,
+            timeout=timeout,
+        )
+
+    issued = False
+
+    def issue():
+        nonlocal issued
+        issued = True
+        metrics.AI_REQUESTS.inc(call=call, outcome="issued")
+        return call_with_retries(
+            create,
+            timeout=getattr(settings, "AI_CALL_TIMEOUT", 10.0),
+            retries=getattr(settings, "AI_MAX_RETRIES", 2),
+            backoff=getattr(settings, "AI_RETRY_BACKOFF", 0.5),
+            retry_on=_retryable(),
+            deadline=deadline,
+            breaker=_breaker,
+        )
+
     try:
-        if not _has_groq_key():
-            return [], 0.0
+        if getattr(settings, "AI_COALESCE", True):
+            key = hashlib.sha256(f"{_MODEL}\0{system}\0{user}".encode()).digest()
+            response, _ = _flights.do(key, issue, deadline)
+        else:
+            response = issue()
+    finally:
+        if not issued:
+            metrics.AI_REQUESTS.inc(call=call, outcome="coalesced")
+    resp_text = response.choices[0].message.content or ""
+    if resp_text.startswith("```"):
+        resp_text = re.sub(r"^```(?:json)?\s*", "", resp_text)
+        resp_text = re.sub(r"```$", "", resp_text)
+    return resp_text
+
+
+# Summaries depend only on the compact test list sent to the model, which
+# repeats heavily across patients, so answers are memoized on that text.
+_summary_cache = LRUCache(
+    maxsize=getattr(settings, "SUMMARY_CACHE_MAX_ENTRIES", 512),
+    ttl=getattr(settings, "SUMMARY_CACHE_TTL", None),
+)
+
 
-        
+def _summary_cache_mode() -> str:
+    """``exact`` (values included), ``coarse`` (analyte + status only) or ``off``."""
+    return getattr(settings, "SUMMARY_CACHE_MODE", "exact")
+
+
+def summary_cache_stats() -> Dict:
+    return {"mode": _summary_cache_mode(), **_summary_cache.stats()}
+
+
+def _compact_tests(tests: List[Dict], coarse: bool = False) -> List[str]:
+    """Canonical, order-independent text for a test list.
+
+    In coarse mode values are left out entirely, so the model never sees them
+    and a cached answer cannot leak one patient's numbers to another.
+    """
+    compact = set()
+    for t in tests:
+        name = t.get("name")
+        value = t.get("value")
+        unit = t.get("unit")
+        status = t.get("status")
+        ref = t.get("ref_range") or {}
+        if coarse:
+            compact.add(f"{name}: [{status}] ref({ref.get('low')}-{ref.get('high')} {unit})")
+        else:
+            compact.add(f"{name}: {value} {unit} [{status}] ref({ref.get('low')}-{ref.get('high')})")
+    return sorted(compact)
+
+
+def summary_key(tests: List[Dict]) -> str:
+    """The exact text sent to the model for ``tests``; equal keys get equal answers."""
+    return "\n".join(_compact_tests(tests, coarse=_summary_cache_mode() == "coarse"))
+
+
+def _validate_tests_in_source(tests_raw: List, text: str) -> List[str]:
+    """The AI-extracted strings the source text actually supports."""
+    evidence = validation.validate(tests_raw, text)
+    if len(evidence) < len(tests_raw):
+        logger.info("ai_extract_rejected", extra={"candidates": len(tests_raw), "validated": len(evidence)})
+    return [e.test for e in evidence]
+
+
+def extract_tests_ai(text: str, deadline: Optional[Deadline] = None) -> Tuple[List[str], float]:
+    """Use Groq API to extract tests, then validate against source text.
+
+    Raises ``AIExtractError`` when the call fails; ``([], 0.0)`` means it
+    found nothing (or no key is configured).
+    """
+    if not _has_groq_key():
+        return [], 0.0
+    try:
         prompt = (
             "You will be given raw medical report text. Extract only lab tests present in the text. "
             "Return strict JSON with key tests_raw as an array of human-readable strings matching the text, "
@@ -29,28 +210,11 @@ def extract_tests_ai(text: str) -> Tuple[List[str], float]:
             "JSON schema: {\"tests_raw\":[\"...\"],\"confidence\":0.0}. Return ONLY JSON."
         )
 
-       
-        response = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": text}
-            ],
-            model="llama-3.3-70b-versatile"  
-        )
-
-        #
-        resp_text = response.choices[0].message.content
-
-        
-        if resp_text.startswith("```"):
-           
-            resp_text = re.sub(r"^```(?:json)?\s*", "", resp_text)
-            resp_text = re.sub(r"```$", "", resp_text)
-
+        resp_text = _chat(prompt, text, deadline, call="extract")
         data = json.loads(resp_text or "{}")
         tests_raw = data.get("tests_raw") or []
         if not isinstance(tests_raw, list):
-            return [], 0.0
+            raise ValueError("tests_raw is not a list")
         validated = _validate_tests_in_source(tests_raw, text)
         if not validated:
             return [], 0.0
@@ -58,54 +222,36 @@ def extract_tests_ai(text: str) -> Tuple[List[str], float]:
         conf = max(0.0, min(1.0, conf))
         return validated, conf
 
-    except APIError as e:
-        print("❌ Groq API error:", str(e))
-        return [], 0.0
     except Exception as e:
-        print("❌ Unexpected error in extract_tests_ai:", str(e))
-        return [], 0.0
+        # groq.APIError subclasses carry the HTTP status.
+        logger.warning("ai_extract_failed", extra={"error": type(e).__name__, "status_code": getattr(e, "status_code", None)})
+        raise AIExtractError(str(e) or type(e).__name__) from e
 
 
-def summarize_with_ai(tests: List[Dict]) -> Dict:
+def summarize_with_ai(tests: List[Dict], deadline: Optional[Deadline] = None) -> Dict:
     """Use Groq API to generate patient-friendly summary/explanations."""
     try:
         if not tests:
             return {"_used": False, "error": "no_tests"}
+
+        mode = _summary_cache_mode()
+        content = summary_key(tests)
+        if mode != "off":
+            cached = _summary_cache.get(content)
+            if cached is not None:
+                return {**cached, "explanations": list(cached["explanations"]), "_cached": True}
+
         if not _has_groq_key():
             return {"_used": False, "error": "missing_api_key"}
 
-      
-        compact = []
-        for t in tests:
-            name = t.get("name")
-            value = t.get("value")
-            unit = t.get("unit")
-            status = t.get("status")
-            ref = t.get("ref_range") or {}
-            compact.append(
-                f"{name}: {value} {unit} [{status}] ref({ref.get('low')}-{ref.get('high')})"
-            )
         prompt = (
             "You will receive normalized lab tests. Create a concise patient-friendly summary that mentions all tests that are low/high, "
             "and provide 2-4 short, non-diagnostic explanations tailored to these tests (e.g., anemia for low hemoglobin). "
             "STRICT RULES: Never add any tests that are not in the list; never change values; do not diagnose. "
             "Return ONLY strict JSON: {\"summary\": string, \"explanations\": string[]}."
         )
-        content = "\n".join(compact)
-
-        response = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": content}
-            ],
-            model="llama-3.3-70b-versatile"
-        )
-
-        resp_text = response.choices[0].message.content
-        if resp_text.startswith("```"):
-            resp_text = re.sub(r"^```(?:json)?\s*", "", resp_text)
-            resp_text = re.sub(r"```$", "", resp_text)
 
+        resp_text = _chat(prompt, content, deadline, call="summary")
         data = json.loads(resp_text or "{}")
         out = {
             "summary": data.get("summary") or "",
@@ -114,13 +260,10 @@ def summarize_with_ai(tests: List[Dict]) -> Dict:
         }
         if not isinstance(out["explanations"], list):
             out["explanations"] = []
+        if mode != "off":
+            _summary_cache.set(content, {**out, "explanations": list(out["explanations"])})
         return out
 
-    except APIError as e:
-        return {"_used": False, "error": str(e)}
     except Exception as e:
+        logger.warning("ai_summary_failed", extra={"error": type(e).__name__, "status_code": getattr(e, "status_code", None)})
         return {"_used": False, "error": str(e)}
-
-
-
-
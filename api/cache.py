@@ -0,0 +1,160 @@
+"""Content-addressed caching of /api/process results.
+
+Results live in the ``results`` alias of Django's cache framework, so the
+default local-memory backend gives a per-process LRU (``MAX_ENTRIES``) with a
+TTL (``TIMEOUT``), and a shared backend (file, Redis, Memcached) can be
+configured for multiple gunicorn workers without code changes.
+
+``LRUCache`` is a lighter in-process cache for hot lookups such as AI
+summaries.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+import hashlib
+import json
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import classify, registry
+
+
+# Bump when the pipeline changes in a way the registry fingerprint cannot see
+# (cleanup rules, prompts, response shape).
+PIPELINE_VERSION = "3"
+
+# AI errors that are a property of the input or deployment, not a transient
+# provider failure, and therefore safe to cache alongside the result.
+_STABLE_AI_ERRORS = {None, "no_tests", "missing_api_key"}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _pipeline_fingerprint() -> str:
+    digest = hashlib.sha256(PIPELINE_VERSION.encode())
+    digest.update(repr(registry.ANALYTES).encode())
+    digest.update(repr(classify.REFERENCE_RANGES).encode())
+    # The AI policies decide whether a result carries AI output at all.
+    for name, default in (("AI_EXTRACT_POLICY", "auto"), ("AI_SUMMARY_POLICY", "abnormal")):
+        digest.update(str(getattr(settings, name, default)).encode())
+    return digest.hexdigest()[:16]
+
+
+_FINGERPRINT = _pipeline_fingerprint()
+
+
+def _enabled() -> bool:
+    return getattr(settings, "RESULT_CACHE_ENABLED", True)
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text or "").strip()
+
+
+def text_key(source: str, tests_raw: Optional[list] = None, patient: Optional[Dict] = None) -> str:
+    key = {"source": normalize_text(source), "tests_raw": tests_raw or []}
+    if patient:
+        key["patient"] = patient
+    payload = json.dumps(
+        key,
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return _make_key("text", [payload.encode("utf-8")])
+
+
+def bytes_key(chunks: Iterable[bytes]) -> str:
+    return _make_key("image", chunks)
+
+
+def _make_key(kind: str, chunks: Iterable[bytes]) -> str:
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return f"process:{_FINGERPRINT}:{kind}:{digest.hexdigest()}"
+
+
+def get_result(key: str) -> Optional[Tuple[Dict, int]]:
+    if not _enabled():
+        return None
+    cached = caches["results"].get(key)
+    if cached is None:
+        return None
+    return cached["payload"], cached["status"]
+
+
+def set_result(key: str, payload: Dict, status: int) -> None:
+    if not _enabled() or not _cacheable(payload, status):
+        return
+    caches["results"].set(key, {"payload": payload, "status": status})
+
+
+def _cacheable(payload: Dict, status: int) -> bool:
+    if status != 200:
+        return False
+    meta = payload.get("meta") or {}
+    # A result degraded under load, truncated because the OCR pool was full,
+    # or missing tests because AI extraction failed, would keep being served
+    # after the problem passes.
+    if meta.get("degraded") or meta.get("ai_extract_error") or (meta.get("ocr") or {}).get("truncated"):
+        return False
+    return meta.get("ai_summary_error") in _STABLE_AI_ERRORS
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU with optional TTL and hit counters.
+
+    Used for hot, per-process lookups where a round-trip through the Django
+    cache backend (and its pickling) would cost more than the value saves.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: object) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,188 @@
+"""Reference-range evaluation.
+
+``evaluate`` takes arrays of analyte codes (indexes into
+``registry.ANALYTES``) and values and returns, in one NumPy pass, each
+value's status, severity and the reference range that applied.
+``classify_values`` gives the same answers as lists. It reads the same
+tables with plain lookups below VECTOR_MIN values, which covers a report's
+handful of tests, where NumPy's per-call overhead would dominate.
+``classify_reports`` does the same for many reports (a batch request, a
+backfill chunk), with one ``evaluate`` call for all of their values.
+
+Ranges default to the registry's. ``REFERENCE_RANGES`` overrides them by
+sex and age; rows are applied in order, so more specific rows come last.
+A patient of unknown age is evaluated as an adult.
+"""
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import math
+
+import numpy as np
+
+from . import registry
+from .results import ref_range
+
+
+STATUSES = ("normal", "low", "high")
+NORMAL, LOW, HIGH = 0, 1, 2
+
+SEXES = {"": 0, "M": 1, "F": 2}
+
+CODES: Dict[str, int] = {a.key: i for i, a in enumerate(registry.ANALYTES)}
+
+_ADULT_AGE = 30.0
+
+# (analyte key, sex "M"/"F" or None for both, min age, max age (exclusive) or None, low, high)
+REFERENCE_RANGES: Tuple[Tuple, ...] = (
+    ("hemoglobin", None, 0.5, 12, 11.0, 13.5),
+    ("hematocrit", None, 0.5, 12, 33, 40),
+    ("wbc", None, 0.5, 12, 5000, 14500),
+    ("hemoglobin", "M", 12, None, 13.5, 17.5),
+    ("hemoglobin", "F", 12, None, 12.0, 15.5),
+    ("hematocrit", "M", 12, None, 41, 50),
+    ("hematocrit", "F", 12, None, 36, 44),
+    ("rbc", "M", 12, None, 4.7, 6.1),
+    ("rbc", "F", 12, None, 4.2, 5.4),
+)
+
+
+def _build_table() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Age band edges and (analyte, sex, band) -> low, high and ``RefRange`` lookups."""
+    edges = sorted({0.0} | {float(a) for r in REFERENCE_RANGES for a in (r[2], r[3]) if a is not None})
+    shape = (len(registry.ANALYTES), len(SEXES), len(edges))
+    low = np.empty(shape)
+    high = np.empty(shape)
+    ranges = np.empty(shape, dtype=object)
+    for code, analyte in enumerate(registry.ANALYTES):
+        low[code] = analyte.ref_low
+        high[code] = analyte.ref_high
+        # RefRange is a Mapping, so NumPy would unpack it on slice assignment.
+        ranges[code].fill(ref_range(analyte.ref_low, analyte.ref_high))
+    for key, sex, min_age, max_age, row_low, row_high in REFERENCE_RANGES:
+        sexes = [SEXES[sex]] if sex else list(SEXES.values())
+        bands = [
+            b for b, edge in enumerate(edges)
+            if edge >= min_age and (max_age is None or edge < max_age)
+        ]
+        for s in sexes:
+            low[CODES[key], s, bands] = row_low
+            high[CODES[key], s, bands] = row_high
+            for b in bands:
+                ranges[CODES[key], s, b] = ref_range(row_low, row_high)
+    return np.asarray(edges), low, high, ranges
+
+
+_EDGES, _LOW, _HIGH, _RANGES = _build_table()
+# The same tables as flat lists, for ``classify_values``' scalar path.
+_EDGE_LIST = _EDGES.tolist()
+_LOW_LIST = _LOW.ravel().tolist()
+_HIGH_LIST = _HIGH.ravel().tolist()
+_RANGE_LIST = _RANGES.ravel().tolist()
+
+# Values below which ``classify_values`` skips NumPy.
+VECTOR_MIN = 256
+
+
+class Evaluation(NamedTuple):
+    status: np.ndarray  # int8 codes into STATUSES
+    severity: np.ndarray  # 0 in range, else distance outside it in range widths
+    low: np.ndarray
+    high: np.ndarray
+    ref_range: np.ndarray  # the shared ``RefRange`` objects
+
+
+def evaluate(codes: Sequence[int], values: Sequence[float], sex=0, age=math.nan) -> Evaluation:
+    """Classify ``values`` of the analytes ``codes``.
+
+    ``sex`` (codes from ``SEXES``) and ``age`` (years, NaN when unknown)
+    are scalars for one patient or arrays aligned with ``values``.
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    values = np.asarray(values, dtype=np.float64)
+    ages = np.asarray(age, dtype=np.float64)
+    ages = np.where(np.isnan(ages), _ADULT_AGE, ages)
+    bands = np.searchsorted(_EDGES, ages, side="right") - 1
+    # One flat index into the (analyte, sex, band) tables.
+    index = (codes * _LOW.shape[1] + np.asarray(sex, dtype=np.intp)) * _LOW.shape[2] + bands
+    low = np.take(_LOW, index)
+    high = np.take(_HIGH, index)
+    status = (values < low).astype(np.int8) + (values > high).astype(np.int8) * HIGH
+    severity = (np.maximum(low - values, 0.0) + np.maximum(values - high, 0.0)) / (high - low)
+    return Evaluation(status, severity, low, high, np.take(_RANGES, index))
+
+
+def classify_values(
+    codes: Sequence[int], values: Sequence[float], sex: int = 0, age: float = math.nan,
+) -> Tuple[List[int], List[float], List]:
+    """``evaluate``'s status codes, severities and ranges as lists, for one patient."""
+    if len(codes) >= VECTOR_MIN:
+        evaluation = evaluate(codes, values, sex, age)
+        return evaluation.status.tolist(), evaluation.severity.tolist(), evaluation.ref_range.tolist()
+    band = bisect_right(_EDGE_LIST, _ADULT_AGE if math.isnan(age) else age) - 1
+    statuses, severities, ranges = [], [], []
+    for code, value in zip(codes, values):
+        index = (code * _LOW.shape[1] + sex) * _LOW.shape[2] + band
+        low, high = _LOW_LIST[index], _HIGH_LIST[index]
+        statuses.append(LOW if value < low else HIGH if value > high else NORMAL)
+        severities.append((max(low - value, 0.0) + max(value - high, 0.0)) / (high - low))
+        ranges.append(_RANGE_LIST[index])
+    return statuses, severities, ranges
+
+
+def classify_reports(
+    reports: Sequence[Tuple[Sequence[int], Sequence[float], int, float]],
+) -> List[Tuple[List[int], List[float], List]]:
+    """``classify_values`` for many ``(codes, values, sex, age)`` reports.
+
+    From VECTOR_MIN values in total, all of them go through one ``evaluate``
+    call and the results are split back per report.
+    """
+    sizes = [len(codes) for codes, _, _, _ in reports]
+    if sum(sizes) < VECTOR_MIN:
+        return [classify_values(*report) for report in reports]
+    evaluation = evaluate(
+        [code for codes, _, _, _ in reports for code in codes],
+        [value for _, values, _, _ in reports for value in values],
+        np.repeat([sex for _, _, sex, _ in reports], sizes),
+        np.repeat([age for _, _, _, age in reports], sizes),
+    )
+    statuses = evaluation.status.tolist()
+    severities = evaluation.severity.tolist()
+    ranges = evaluation.ref_range.tolist()
+    split = []
+    start = 0
+    for size in sizes:
+        end = start + size
+        split.append((statuses[start:end], severities[start:end], ranges[start:end]))
+        start = end
+    return split
+
+
+def parse_patient(data) -> Optional[Dict]:
+    """Validated ``{"sex", "age"}`` from a request's ``patient`` object; ValueError when invalid."""
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        raise ValueError("patient must be an object")
+    sex = str(data.get("sex") or "").strip().upper()[:1]
+    if sex not in SEXES:
+        raise ValueError("patient.sex must be M or F")
+    age = data.get("age")
+    if age is not None:
+        try:
+            age = float(age)
+        except (TypeError, ValueError):
+            raise ValueError("patient.age must be a number") from None
+        if not 0 <= age <= 130:
+            raise ValueError("patient.age must be between 0 and 130")
+    if not sex and age is None:
+        return None
+    return {"sex": sex or None, "age": age}
+
+
+def patient_args(patient: Optional[Dict]) -> Tuple[int, float]:
+    """``evaluate``'s ``sex`` and ``age`` for a ``parse_patient`` result."""
+    if not patient:
+        return 0, math.nan
+    age = patient.get("age")
+    return SEXES.get(patient.get("sex") or "", 0), math.nan if age is None else float(age)
@@ -0,0 +1,258 @@
+"""Single-pass, table-driven lab analyte extraction.
+
+A report is scanned once for analyte name anchors using a case-sensitive
+literal alternation over the lowercased text (which lets ``re`` skip ahead on
+the first character instead of trying every branch at every offset). Each
+anchor hit dispatches to that analyte's precompiled pattern, built from
+``api.registry`` and matched in place on the original text, so adding
+analytes does not add passes over the report.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import re
+import string
+
+from . import registry, spelling
+
+
+_STATUS = r"(?:\s*\((Low|High|Normal)\))?"
+
+
+# OCR correction against the registry vocabulary (see ``api.spelling``).
+# Only the longer analyte names are fuzzy-matched. Acronyms are too close to
+# one another (MCV/MPV, RBC/NRBC) for edit distance, so they are only fixed
+# through known OCR glyph confusions ("W8C", "WBG"), and never when the token
+# is itself a lab acronym. Status words are only fuzzy-matched as a whole
+# parenthesized status ("(Hihg)"), so ordinary words such as "now" never
+# become "Low".
+def _term_vocabulary() -> Dict[str, str]:
+    words = {w: w for a in registry.ANALYTES for alias in a.aliases for w in alias.split()}
+    words.update({"CBC": "CBC", "million": "million"})
+    return words
+
+
+# Lab acronyms, recognized or not, that must be left as written.
+_LAB_ACRONYMS = frozenset({
+    "CBC", "WBC", "RBC", "NRBC", "HGB", "HB", "HCT", "PCV", "MCV", "MCH", "MCHC", "MPV", "PDW", "PCT",
+    "RDW", "ESR", "CRP", "ANC", "ALC", "AMC", "ABS", "RETIC", "LYM", "MON", "NEU", "EOS", "BAS",
+})
+# Glyphs OCR reads in place of a letter of an all-caps word.
+_GLYPH_CONFUSIONS = {"B": "8", "O": "0", "I": "1l", "S": "5", "Z": "2", "G": "6C", "C": "G"}
+# Generic words among the aliases; fixed in case only, so "Mount" stays "Mount".
+_GENERIC_TERMS = frozenset({"count", "million"})
+
+
+def _acronym_fixes(vocabulary: Dict[str, str]) -> Dict[str, str]:
+    """Known spellings of the registry acronyms: their exact forms in any
+    case, plus all-caps readings with one confused glyph (``W8C`` -> ``WBC``)."""
+    acronyms = {c for c in vocabulary.values() if c.isupper()}
+    readings: Dict[str, set] = {}
+    for acronym in acronyms:
+        for i, letter in enumerate(acronym):
+            for glyph in _GLYPH_CONFUSIONS.get(letter, ""):
+                variant = acronym[:i] + glyph + acronym[i + 1:]
+                if variant.upper() not in _LAB_ACRONYMS and _WORD_RE.fullmatch(variant):
+                    readings.setdefault(variant, set()).add(acronym)
+    # A reading two acronyms could produce is left alone.
+    fixes = {v: next(iter(a)) for v, a in readings.items() if len(a) == 1}
+    fixes.update({a.lower(): a for a in acronyms})
+    return fixes
+
+
+_WORD_RE = re.compile(r"(?<![A-Za-z0-9])[A-Za-z](?:[A-Za-z0-9]*[A-Za-z])?")
+_TERMS = spelling.SymSpell(
+    {w: c for w, c in _term_vocabulary().items() if not c.isupper() and w.lower() not in _GENERIC_TERMS},
+    max_distance=2,
+)
+_ACRONYM_FIXES = _acronym_fixes(_term_vocabulary())
+_STATUS_WORDS = spelling.SymSpell(
+    {"low": "Low", "high": "High", "normal": "Normal", "hgh": "High", "hg": "High"}, max_distance=1,
+)
+# Lab flags read as a status only inside parentheses: "(H)", "(Lo)".
+_STATUS_FLAGS = {"h": "High", "hi": "High", "l": "Low", "lo": "Low", "n": "Normal"}
+_EXACT_FIXES = {"ul": "uL", "count": "Count", "million": "million"}
+
+_STATUS_MARK_RE = re.compile(r",?\s*\(\s*([A-Za-z][A-Za-z0-9]{0,9})\s*\)")
+_TAB_CR_RE = re.compile(r"[\t\r]+")
+
+
+@lru_cache(maxsize=8192)
+def _fix_term(word: str) -> str:
+    lowered = word.lower()
+    exact = _EXACT_FIXES.get(lowered)
+    if exact is not None:
+        return exact
+    if word.upper() in _LAB_ACRONYMS:
+        return _ACRONYM_FIXES.get(lowered, word)
+    if word.isupper() or lowered in _ACRONYM_FIXES:
+        fixed = _ACRONYM_FIXES.get(word if word.isupper() else lowered)
+        if fixed is not None:
+            return fixed
+    # One typo in words of four to seven letters, two from eight up ("Hernatocrit").
+    return _TERMS.lookup(word, 0 if len(word) < 4 else 1 if len(word) < 8 else 2) or word
+
+
+@lru_cache(maxsize=1024)
+def _fix_status(word: str) -> Optional[str]:
+    """The status a parenthesized word stands for, or None."""
+    lowered = word.lower()
+    if lowered in ("low", "high", "normal"):
+        return word
+    return _STATUS_FLAGS.get(lowered) or _STATUS_WORDS.lookup(word, 1 if len(word) >= 3 else 0)
+
+
+def fix_ocr_word(word: str) -> str:
+    """One word with the cleanup's OCR fixes applied (``hemglobn`` -> ``Hemoglobin``).
+
+    Outside parentheses a status word is only fixed if it is a known variant (``hgh``).
+    """
+    fixed = _fix_term(word)
+    if fixed == word:
+        return _STATUS_WORDS.lookup(word, 0) or word
+    return fixed
+
+
+@lru_cache(maxsize=256)
+def _fixes_re(words: Tuple[str, ...]) -> "re.Pattern[str]":
+    """Matches exactly the ``_WORD_RE`` tokens in ``words``."""
+    names = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    return re.compile(rf"(?<![A-Za-z0-9])(?:{names})(?![A-Za-z]|[0-9]+[A-Za-z])")
+
+
+def _status_mark(m: "re.Match[str]") -> str:
+    status = _fix_status(m.group(1))
+    return f" ({status})" if status is not None else m.group(0)
+
+
+def simple_ocr_text_cleanup(text: str) -> str:
+    if not text:
+        return ""
+    # Each distinct word is corrected once, and only the words that change
+    # are rewritten, in one pass over a (cached) alternation of them.
+    fixes = {}
+    for word in set(_WORD_RE.findall(text)):
+        fixed = _fix_term(word)
+        if fixed != word:
+            fixes[word] = fixed
+    cleaned = text
+    if fixes:
+        cleaned = _fixes_re(tuple(sorted(fixes))).sub(lambda m: fixes[m.group(0)], text)
+    cleaned = _STATUS_MARK_RE.sub(_status_mark, cleaned)
+    # Do not collapse newlines here; preserve structure for line parsing
+    cleaned = _TAB_CR_RE.sub(" ", cleaned)
+    return cleaned
+
+
+def _compile_scanner(analytes: Tuple[registry.Analyte, ...]):
+    by_anchor: Dict[str, List[Tuple[registry.Analyte, "re.Pattern[str]"]]] = {}
+    for analyte in analytes:
+        units = "|".join(registry.phrase_pattern(u) for u in sorted(analyte.units, key=len, reverse=True))
+        groups: Dict[str, List[str]] = {}
+        for alias in sorted(analyte.aliases, key=len, reverse=True):
+            groups.setdefault(registry.anchor_of(alias), []).append(registry.phrase_pattern(alias))
+        for anchor, names in groups.items():
+            pattern = re.compile(
+                rf"(?:{'|'.join(names)})\s*:?\s*({analyte.value_pattern})\s*(?:{units}){_STATUS}",
+                flags=re.IGNORECASE,
+            )
+            by_anchor.setdefault(anchor, []).append((analyte, pattern))
+    # Longest anchors first so "mchc" is not shadowed by "mch".
+    anchors = sorted(by_anchor, key=len, reverse=True)
+    # An anchor starts a word, so "rbc" inside "nrbc" is not an RBC count.
+    anchor_re = re.compile(r"(?<![a-z0-9])(?:" + "|".join(re.escape(a) for a in anchors) + ")")
+    return anchor_re, by_anchor
+
+
+_ANCHOR_RE, _BY_ANCHOR = _compile_scanner(registry.ANALYTES)
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class AnalyteMatch(NamedTuple):
+    key: str
+    value: str
+    status: str
+    start: int
+    end: int
+
+    def as_text(self) -> str:
+        analyte = registry.BY_KEY[self.key]
+        status = f" ({self.status})" if self.status else ""
+        return f"{analyte.label} {self.value} {analyte.unit}{status}"
+
+
+def scan(text: str) -> Iterator[AnalyteMatch]:
+    """Yield every analyte found in ``text`` in document order."""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Some non-ASCII characters change length when lowercased; anchors
+        # are ASCII so an ASCII-only fold keeps offsets aligned.
+        lowered = text.translate(_ASCII_LOWER)
+    pos = 0
+    for anchor in _ANCHOR_RE.finditer(lowered):
+        start = anchor.start()
+        if start < pos:
+            continue
+        for analyte, pattern in _BY_ANCHOR[anchor.group()]:
+            m = pattern.match(text, start)
+            if m is None:
+                continue
+            value = m.group(1)
+            if analyte.strip_commas:
+                value = value.replace(",", "")
+            status = m.group(2)
+            yield AnalyteMatch(analyte.key, value, status.capitalize() if status else "", start, m.end())
+            pos = m.end()
+            break
+
+
+def parse(test: str) -> Optional[AnalyteMatch]:
+    """Return the first registry analyte in a single test string, if any."""
+    return next(scan(test), None)
+
+
+def extract(text: str) -> List[str]:
+    """Return de-duplicated canonical test strings such as ``Hemoglobin 10.2 g/dL (Low)``."""
+    return list(dict.fromkeys(m.as_text() for m in scan(text)))
+
+
+# What a lab value looks like when no registry analyte claimed it: a number
+# with a unit ("95 mg/dL", "4.1 %", "7.2 x10^3/uL"), or a short label at the
+# start of a line followed by a bare number and at most a status flag.
+_UNIT = (
+    r"(?:%|(?:x\s*10\^?\d+\s*)?/\s*[a-zµ]{1,4}\b|[a-zµ]{1,5}\s*/\s*[a-zµ0-9]{1,4}\b"
+    r"|(?:fl|pg|iu|mg|ng|pmol|nmol|mmol|meq|mm|sec|g)\b)"
+)
+_RANGE_RE = re.compile(rf"\d[\d,]*(?:\.\d+)?\s*[-–]\s*\d[\d,]*(?:\.\d+)?(?:\s*{_UNIT})?", re.IGNORECASE)
+_MEASUREMENT_RE = re.compile(rf"(?<![\w.,/:])\d[\d,]*(?:\.\d+)?\s*{_UNIT}", re.IGNORECASE)
+_LABELLED_RE = re.compile(
+    r"^[ \t]*-?[ \t]*([A-Za-z][A-Za-z()]*(?:[ \t-][A-Za-z()]+){0,3})[ \t]*[:=]?[ \t]*\d[\d,]*(?:\.\d+)?"
+    r"[ \t]*(?:\((?:low|high|normal)\)|\b[HL]\b)?[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Labelled numbers that are report metadata rather than tests.
+_NOT_TESTS = frozenset({
+    "age", "page", "id", "mrn", "dob", "date", "time", "phone", "tel", "fax", "room", "bed",
+    "report", "sample", "specimen", "accession", "patient", "no", "number", "year", "years", "ref",
+    "range", "reference", "zip", "pin",
+})
+
+
+def unmatched_measurements(text: str, matches: Iterable[AnalyteMatch]) -> List[str]:
+    """Measurement-like tokens in ``text`` outside every analyte match.
+
+    An empty result means regex extraction accounted for every value in the
+    report; anything left may be a test the registry does not know.
+    """
+    pieces: List[str] = []
+    last = 0
+    for m in matches:
+        pieces.append(text[last:m.start])
+        last = m.end
+    pieces.append(text[last:])
+    rest = _RANGE_RE.sub(" ", "\n".join(pieces))
+    found = [m.group(0) for m in _MEASUREMENT_RE.finditer(rest)]
+    found.extend(
+        m.group(0).strip() for m in _LABELLED_RE.finditer(rest)
+        if m.group(1).split()[0].lower().strip("()") not in _NOT_TESTS
+    )
+    return found
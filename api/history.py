@@ -0,0 +1,265 @@
+"""Per-patient history of normalized results and trend queries.
+
+Requests that carry a ``patient_id`` (and optionally ``collected_at``) have
+their tests written as ``LabValue`` rows. Each row repeats the patient and
+collection time, so ``trends`` reads one analyte's series as a range scan of
+the ``(patient_id, analyte, collected_at)`` index, newest first and bounded
+by ``limit``. Its cost depends on the points returned, not on the table size.
+"""
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+import hmac
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import dateparse, timezone
+
+from . import registry
+from .models import LabValue, PatientReport
+
+
+_PATIENT_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._:-]{0,63}$")
+
+
+class InvalidTarget(ValueError):
+    pass
+
+
+class Target(NamedTuple):
+    patient_id: str
+    # None when the request gave no time: the report is then stored once per
+    # patient, at the time it was first submitted.
+    collected_at: Optional[datetime]
+
+    def to_json(self) -> Dict:
+        collected_at = self.collected_at.isoformat() if self.collected_at else None
+        return {"patient_id": self.patient_id, "collected_at": collected_at}
+
+
+class Recorded(NamedTuple):
+    report_id: int
+    stored: int  # tests written; 0 for a duplicate
+    duplicate: bool
+
+
+def _parse_time(value, field: str = "collected_at") -> datetime:
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        parsed = dateparse.parse_datetime(text)
+        if parsed is None:
+            day = dateparse.parse_date(text)
+            if day is None:
+                raise InvalidTarget(f"{field} must be an ISO 8601 date or datetime")
+            parsed = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def authorized(request) -> bool:
+    """Whether the request carries one of HISTORY_API_KEYS (none configured: never)."""
+    keys = getattr(settings, "HISTORY_API_KEYS", [])
+    header = request.headers.get("Authorization", "")
+    presented = header[7:].strip() if header[:7].lower() == "bearer " else request.headers.get("X-API-Key", "")
+    if not presented:
+        return False
+    # Every key is compared, in constant time, so timing says nothing about which matched.
+    return any([hmac.compare_digest(presented.encode(), key.encode()) for key in keys])
+
+
+def parse_target(patient_id, collected_at=None) -> Optional[Target]:
+    """Where to store a request's results, or None; InvalidTarget when malformed."""
+    if patient_id in (None, ""):
+        if collected_at not in (None, ""):
+            raise InvalidTarget("collected_at requires patient_id")
+        return None
+    if not isinstance(patient_id, (str, int)) or not _PATIENT_ID_RE.match(str(patient_id)):
+        raise InvalidTarget("patient_id must be 1-64 letters, digits or . _ : -")
+    when = None if collected_at in (None, "") else _parse_time(collected_at)
+    return Target(str(patient_id), when)
+
+
+def target_from_json(data: Optional[Dict]) -> Optional[Target]:
+    return parse_target(data.get("patient_id"), data.get("collected_at")) if data else None
+
+
+def analyte_key(name: str) -> str:
+    analyte = registry.BY_NAME.get(name)
+    return analyte.key if analyte else (name or "").strip().lower()[:64]
+
+
+def _values(report: PatientReport, tests: Iterable[Mapping]) -> List[LabValue]:
+    rows = []
+    for t in tests:
+        value = t.get("value")
+        name = t.get("name")
+        if value is None or not name:
+            continue
+        ref = t.get("ref_range") or {}
+        rows.append(LabValue(
+            report=report, patient_id=report.patient_id, analyte=analyte_key(name),
+            collected_at=report.collected_at, name=name[:128], value=float(value),
+            unit=(t.get("unit") or "")[:32], status=t.get("status") or "",
+            ref_low=ref.get("low"), ref_high=ref.get("high"), severity=t.get("severity"),
+        ))
+    return rows
+
+
+def _record_many(items: Sequence[Tuple[Target, str, Sequence[Mapping]]]) -> List[Recorded]:
+    # Identity of a stored report: patient, key and collection time, or just
+    # patient and key (time None) when the request gave no time.
+    def ident(target: Target, key: str) -> Tuple:
+        return target.patient_id, key, target.collected_at
+
+    wanted = {ident(target, key) for target, key, _ in items}
+    existing: Dict[Tuple, int] = {}
+    for p, k, c, pk in (
+        PatientReport.objects.filter(report_key__in={k for _, k, _ in wanted})
+        .order_by("collected_at", "pk").values_list("patient_id", "report_key", "collected_at", "pk")
+    ):
+        if (p, k, c) in wanted:
+            existing[(p, k, c)] = pk
+        if (p, k, None) in wanted:
+            existing.setdefault((p, k, None), pk)
+    new: Dict[Tuple, Tuple[PatientReport, Sequence[Mapping]]] = {}
+    now = timezone.now()
+    for target, key, tests in items:
+        i = ident(target, key)
+        if i not in existing and i not in new:
+            report = PatientReport(
+                patient_id=target.patient_id, collected_at=target.collected_at or now, report_key=key,
+            )
+            new[i] = (report, tests)
+    stored: Dict[Tuple, int] = {}
+    if new:
+        batch_size = getattr(settings, "HISTORY_BULK_SIZE", 1000)
+        with transaction.atomic():
+            PatientReport.objects.bulk_create([report for report, _ in new.values()], batch_size=batch_size)
+            values = []
+            for i, (report, tests) in new.items():
+                rows = _values(report, tests)
+                stored[i] = len(rows)
+                values.extend(rows)
+            LabValue.objects.bulk_create(values, batch_size=batch_size)
+    out = []
+    for target, key, _ in items:
+        i = ident(target, key)
+        if i in new and i in stored:
+            # Later copies of the same report in one call are duplicates.
+            out.append(Recorded(new[i][0].pk, stored.pop(i), False))
+        else:
+            out.append(Recorded(existing.get(i) or new[i][0].pk, 0, True))
+    return out
+
+
+def record_many(items: Sequence[Tuple[Target, str, Sequence[Mapping]]]) -> List[Recorded]:
+    """Store ``(target, report_key, tests)`` items with one bulk insert per table.
+
+    Reports already stored for the same patient, key and collection time (or
+    for the same patient and key at any time, when the target has no time)
+    are not written again and come back as duplicates.
+    """
+    if not items:
+        return []
+    try:
+        return _record_many(items)
+    except IntegrityError:
+        # A concurrent request stored one of these first; it is now "existing".
+        return _record_many(items)
+
+
+def record(target: Target, report_key: str, tests: Sequence[Mapping]) -> Recorded:
+    return record_many([(target, report_key, tests)])[0]
+
+
+arecord = sync_to_async(record)
+arecord_many = sync_to_async(record_many)
+
+
+def history_meta(recorded: Recorded) -> Dict:
+    return {"report_id": recorded.report_id, "stored": recorded.stored, "duplicate": recorded.duplicate}
+
+
+# -- trends ------------------------------------------------------------------
+
+_POINT_FIELDS = ("collected_at", "value", "unit", "status", "report_id")
+
+
+def _delta(previous: Optional[Dict], current: Dict) -> Optional[float]:
+    """``current - previous`` when both are in the same unit."""
+    if previous is None or previous["unit"] != current["unit"]:
+        return None
+    return round(current["value"] - previous["value"], 6)
+
+
+def _series(patient_id: str, analyte: str, since: Optional[datetime], until: Optional[datetime], limit: int) -> Dict:
+    rows = LabValue.objects.filter(patient_id=patient_id, analyte=analyte)
+    if since is not None:
+        rows = rows.filter(collected_at__gte=since)
+    if until is not None:
+        rows = rows.filter(collected_at__lt=until)
+    # Newest first, so the index is read from the end and stops after
+    # ``limit`` points plus the one before them (for the first point's delta).
+    newest = list(rows.order_by("-collected_at", "-pk").values_list("name", *_POINT_FIELDS)[:limit + 1])
+    if not newest:
+        return {}
+    name = newest[0][0]
+    points: List[Dict] = []
+    before = None
+    for row in reversed(newest):
+        point = dict(zip(_POINT_FIELDS, row[1:]))
+        point["delta"] = _delta(before, point)
+        points.append(point)
+        before = point
+    latest = points[-1]
+    previous = points[-2] if len(points) > 1 else None
+    change = latest["delta"]
+    return {
+        "name": name,
+        "unit": latest["unit"],
+        "count": min(len(points), limit),
+        "points": points[-limit:],
+        "latest": latest,
+        "previous": previous,
+        "delta": change,
+        "delta_pct": round(change / previous["value"] * 100, 2) if change is not None and previous["value"] else None,
+        "direction": None if change is None else "up" if change > 0 else "down" if change < 0 else "flat",
+    }
+
+
+def trends(
+    patient_id: str,
+    analytes: Optional[Sequence[str]] = None,
+    since=None,
+    until=None,
+    limit: Optional[int] = None,
+) -> Dict:
+    """Time series and change since the previous value for each of a patient's analytes.
+
+    ``analytes`` are registry keys or names; every analyte on record when
+    empty. ``since``/``until`` bound ``collected_at`` (inclusive/exclusive);
+    at most ``limit`` of the most recent points are returned per analyte.
+    """
+    max_points = getattr(settings, "HISTORY_MAX_POINTS", 1000)
+    limit = max(1, min(limit or max_points, max_points))
+    since = _parse_time(since, "since") if since not in (None, "") else None
+    until = _parse_time(until, "until") if until not in (None, "") else None
+    if analytes:
+        keys = list(dict.fromkeys(analyte_key(a) for a in analytes))
+    else:
+        keys = sorted(
+            LabValue.objects.filter(patient_id=patient_id).order_by().values_list("analyte", flat=True).distinct()
+        )
+    series = {}
+    for key in keys:
+        data = _series(patient_id, key, since, until, limit)
+        if data:
+            series[key] = data
+    return {"patient_id": patient_id, "since": since, "until": until, "limit": limit, "analytes": series}
+
+
+atrends = sync_to_async(trends)
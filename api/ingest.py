@@ -0,0 +1,279 @@
+"""Size-bounded, streaming handling of request bodies and uploads.
+
+- ``BodyLimit`` wraps the ASGI application. A body over REQUEST_MAX_BYTES is
+  refused with 413 from its Content-Length, or as soon as that many bytes
+  have arrived, instead of after Django has spooled all of it.
+- ``LimitedUploadHandler`` runs first in FILE_UPLOAD_HANDLERS and stops
+  multipart parsing once a file passes OCR_MAX_UPLOAD_BYTES. Files over
+  FILE_UPLOAD_MAX_MEMORY_SIZE go to temporary files; ``upload_source`` gives
+  OCR their path so the upload is never copied into memory.
+- ``read_json`` and ``iter_reports`` parse JSON from the request stream, not
+  ``request.body``; NDJSON and JSON-array batches are decoded one report at a
+  time.
+"""
+from typing import Any, Iterator, Optional
+import codecs
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from . import ocr
+
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 64 * 1024
+
+
+class RequestTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"request body is larger than {limit} bytes")
+        self.limit = limit
+
+
+def request_limit() -> int:
+    return getattr(settings, "REQUEST_MAX_BYTES", 11 * 1024 * 1024)
+
+
+def upload_limit() -> int:
+    return getattr(settings, "OCR_MAX_UPLOAD_BYTES", 10 * 1024 * 1024)
+
+
+def _content_length(headers) -> Optional[int]:
+    for name, value in headers:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class BodyLimit:
+    """ASGI middleware answering 413 to HTTP bodies over ``max_bytes`` (0: no limit).
+
+    The rest of a refused body is read and dropped (up to another
+    ``max_bytes``) before answering, as most clients only read the response
+    once they have sent everything; nothing of it is kept.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            return await self.app(scope, receive, send)
+        length = _content_length(scope.get("headers", ()))
+        if length is not None and length > self.max_bytes:
+            return await self._reject(scope, receive, send, True)
+        received = 0
+        more_body = True
+        started = False
+
+        async def limited_receive():
+            nonlocal received, more_body
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                more_body = message.get("more_body", False)
+                if received > self.max_bytes:
+                    raise RequestTooLarge(self.max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except RequestTooLarge:
+            if not started:
+                await self._reject(scope, receive, send, more_body)
+
+    async def _reject(self, scope, receive, send, more_body: bool) -> None:
+        logger.warning("request_too_large", extra={"path": scope.get("path"), "max_bytes": self.max_bytes})
+        dropped = 0
+        while more_body and dropped <= self.max_bytes:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            dropped += len(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = json.dumps({"error": "request_too_large", "max_bytes": self.max_bytes}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Stops reading a multipart body once one file passes OCR_MAX_UPLOAD_BYTES.
+
+    Only counts: the bytes are passed on to the storing handlers after it.
+    The rest of the body is discarded unread into memory, and the request is
+    marked so the view can answer 413 (see ``upload_too_large``).
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        limit = upload_limit()
+        if limit and self.received > limit:
+            self.request.upload_too_large = limit
+            raise StopUpload(connection_reset=False)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def upload_too_large(request) -> Optional[int]:
+    """The limit an upload of this request was cut off at, if any (parses the form)."""
+    if request.method == "POST":
+        request.FILES  # parses a multipart body, running the upload handlers
+    return getattr(request, "upload_too_large", None)
+
+
+def upload_source(uploaded) -> ocr.Document:
+    """What to hand OCR: the temporary file's path when spooled to disk, else the bytes."""
+    if hasattr(uploaded, "temporary_file_path"):
+        uploaded.file.flush()
+        return uploaded.temporary_file_path()
+    uploaded.seek(0)
+    return uploaded.read()
+
+
+def read_json(request, default: Any = None) -> Any:
+    """Parse a JSON body from the request stream, ``default`` when it is empty.
+
+    Raises ``RequestTooLarge`` past REQUEST_MAX_BYTES (also under WSGI, where
+    ``BodyLimit`` is not in front), ``ValueError`` on malformed JSON.
+    """
+    limit = request_limit()
+    data = request.read(limit + 1) if limit else request.read()
+    if limit and len(data) > limit:
+        raise RequestTooLarge(limit)
+    if not data.strip():
+        return default
+    return json.loads(data)
+
+
+class _Reader:
+    """Decoded text of a byte stream, buffered for ``raw_decode``."""
+
+    def __init__(self, stream, limit: int):
+        self.stream = stream
+        self.limit = limit
+        self.read_bytes = 0
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append more text; False at the end of the stream."""
+        if self.eof:
+            return False
+        # Grow reads with the pending text so one huge report is not re-parsed per chunk.
+        chunk = self.stream.read(max(_CHUNK, len(self.buffer) - self.pos))
+        self.read_bytes += len(chunk)
+        if self.limit and self.read_bytes > self.limit:
+            raise RequestTooLarge(self.limit)
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=not chunk)
+        self.pos = 0
+        self.eof = not chunk
+        return True
+
+    def peek(self) -> str:
+        """The next non-whitespace character, '' at the end."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def rest(self) -> str:
+        while self.fill():
+            pass
+        return self.buffer[self.pos:]
+
+    def value(self, decoder: json.JSONDecoder) -> Any:
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number or literal at the very end may continue in the next chunk.
+            if end < len(self.buffer) or self.eof or self.buffer[self.pos] in "{[\"":
+                self.pos = end
+                return value
+            self.fill()
+
+
+def iter_ndjson(stream, limit: int = 0) -> Iterator[Any]:
+    """One value per non-blank line."""
+    read = 0
+    for line in stream:
+        read += len(line)
+        if limit and read > limit:
+            raise RequestTooLarge(limit)
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(stream, limit: int = 0) -> Iterator[Any]:
+    """Elements of a top-level JSON array, decoded as the stream is read.
+
+    A top-level ``{"reports": [...]}`` object is parsed whole instead.
+    """
+    reader = _Reader(stream, limit)
+    decoder = json.JSONDecoder()
+    first = reader.peek()
+    if first == "":
+        return
+    if first != "[":
+        data = json.loads(reader.rest())
+        if isinstance(data, dict):
+            data = data.get("reports")
+        if not isinstance(data, list):
+            raise ValueError("expected a JSON array of reports")
+        yield from data
+        return
+    reader.pos += 1
+    if reader.peek() == "]":
+        reader.pos += 1
+    else:
+        while True:
+            yield reader.value(decoder)
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError("malformed JSON array")
+            reader.peek()
+    if reader.peek() != "":
+        raise ValueError("extra data after JSON array")
+
+
+def iter_reports(request) -> Iterator[Any]:
+    """Reports of a batch body, NDJSON or JSON, parsed while it is read."""
+    if (request.content_type or "").lower() in ("application/x-ndjson", "application/jsonl"):
+        return iter_ndjson(request, request_limit())
+    return iter_json_array(request, request_limit())
@@ -0,0 +1,425 @@
+"""Background job queue for reports, persisted in the ``Job`` table.
+
+Submitting a job only writes a row; a ``JobWorker`` claims queued rows with a
+conditional UPDATE (so several server processes can share one database) and
+runs the same pipeline as ``/api/process``. OCR and the AI/pipeline stage
+have separate semaphores so slow LLM calls cannot starve OCR and vice versa.
+A claimed job holds a lease; rows whose lease expired (the worker died) are
+re-queued up to ``JOBS_MAX_ATTEMPTS``.
+
+Uploads are copied to a file under ``JOBS_UPLOAD_DIR`` rather than into the
+database, and OCR reads them from there. On completion the result is stored
+on the job, the input is cleared, and an optional webhook is POSTed with
+bounded retries.
+"""
+from datetime import timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .resilience import call_with_retries
+
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidWebhook(ValueError):
+    pass
+
+
+class _RetryableWebhookError(Exception):
+    pass
+
+
+def _check_public_host(host: str, port: Optional[int]) -> None:
+    """Refuse hosts resolving to loopback, private, link-local or reserved addresses."""
+    try:
+        infos = socket.getaddrinfo(host, port or 443, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise InvalidWebhook(f"webhook host {host} cannot be resolved") from None
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise InvalidWebhook(f"webhook host {host} resolves to a non-public address")
+
+
+def validate_webhook_url(url: str) -> str:
+    """The URL if jobs may call it back, else ``InvalidWebhook``.
+
+    Hosts in JOBS_WEBHOOK_ALLOWED_HOSTS are trusted as is. Any other host
+    must resolve to public addresses only (unless JOBS_WEBHOOK_ALLOW_PRIVATE),
+    and is refused outright when the allowlist is set. Resolves DNS, so
+    call it off the event loop.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise InvalidWebhook("webhook_url must be an absolute http(s) URL")
+    allowed = getattr(settings, "JOBS_WEBHOOK_ALLOWED_HOSTS", [])
+    if parts.hostname in allowed:
+        return url
+    if allowed:
+        raise InvalidWebhook(f"webhook host {parts.hostname} is not allowed")
+    if not getattr(settings, "JOBS_WEBHOOK_ALLOW_PRIVATE", False):
+        try:
+            port = parts.port
+        except ValueError:
+            raise InvalidWebhook("webhook_url has an invalid port") from None
+        _check_public_host(parts.hostname, port)
+    return url
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point the callback at an internal address; report the
+    # 3xx as the outcome instead of following it.
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def job_payload(job: Job) -> Dict:
+    """What ``GET /api/jobs/<id>`` and the webhook return."""
+    data = {
+        "id": str(job.id),
+        "status": job.status,
+        "kind": job.kind,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "attempts": job.attempts,
+    }
+    if job.status == Job.DONE:
+        data["result"] = job.result
+        data["http_status"] = job.http_status
+    elif job.status == Job.FAILED:
+        data["error"] = job.error
+    if job.webhook_url:
+        data["webhook"] = {"url": job.webhook_url, "status": job.webhook_status or None}
+    return data
+
+
+# -- queue operations (synchronous ORM; called from worker threads) ---------
+
+def _claim(limit: int) -> List[Job]:
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, "JOBS_LEASE_SECONDS", 300))
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by("run_after")
+        .values_list("id", flat=True)[:limit]
+    )
+    claimed = [
+        job_id for job_id in candidates
+        # Only one worker wins each row, whichever process it runs in.
+        if Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=now, locked_until=now + lease, attempts=F("attempts") + 1,
+        )
+    ]
+    return list(Job.objects.filter(pk__in=claimed))
+
+
+def save_upload(uploaded) -> str:
+    """Copy an upload into JOBS_UPLOAD_DIR chunk by chunk and return its path."""
+    directory = str(getattr(settings, "JOBS_UPLOAD_DIR", "job_uploads"))
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in uploaded.chunks():
+                out.write(chunk)
+    except BaseException:
+        discard_upload(path)
+        raise
+    return path
+
+
+def discard_upload(path: str) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _requeue_expired() -> int:
+    now = timezone.now()
+    expired = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+    lost = expired.filter(attempts__gte=getattr(settings, "JOBS_MAX_ATTEMPTS", 3))
+    uploads = list(lost.exclude(image_path="").values_list("image_path", flat=True))
+    failed = lost.update(
+        status=Job.FAILED, error="worker lost", finished_at=now, source="", image_path="",
+    )
+    for path in uploads:
+        discard_upload(path)
+    requeued = expired.update(status=Job.QUEUED, run_after=now, locked_until=None)
+    if failed or requeued:
+        logger.warning("jobs_recovered", extra={"requeued": requeued, "failed": failed})
+    return requeued
+
+
+def _purge_finished() -> int:
+    retention = getattr(settings, "JOBS_RETENTION_SECONDS", 86400)
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    deleted, _ = Job.objects.filter(status__in=(Job.DONE, Job.FAILED), finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def _finish(job_id, status: str, result: Optional[Dict] = None, http_status: Optional[int] = None, error: str = "") -> None:
+    Job.objects.filter(pk=job_id).update(
+        status=status, result=result, http_status=http_status, error=error,
+        finished_at=timezone.now(), locked_until=None, source="", image_path="",
+    )
+
+
+def _retry_later(job_id, delay: float) -> None:
+    Job.objects.filter(pk=job_id).update(
+        status=Job.QUEUED, run_after=timezone.now() + timedelta(seconds=delay), locked_until=None,
+        attempts=F("attempts") - 1,
+    )
+
+
+def _in_thread(fn, *args):
+    def call():
+        close_old_connections()
+        try:
+            return fn(*args)
+        finally:
+            close_old_connections()
+
+    return asyncio.get_running_loop().run_in_executor(None, call)
+
+
+# -- webhooks ----------------------------------------------------------------
+
+def deliver_webhook(job_id) -> str:
+    job = Job.objects.get(pk=job_id)
+    body = json.dumps(job_payload(job), cls=DjangoJSONEncoder).encode("utf-8")
+    headers = {"Content-Type": "application/json", "User-Agent": "medical-simplifier-jobs"}
+    secret = getattr(settings, "JOBS_WEBHOOK_SECRET", "")
+    if secret:
+        digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers["X-Signature-256"] = f"sha256={digest}"
+
+    def send(timeout: float) -> int:
+        # Checked again on every attempt: DNS may have changed since submit.
+        validate_webhook_url(job.webhook_url)
+        request = urllib.request.Request(job.webhook_url, data=body, headers=headers, method="POST")
+        try:
+            with _opener.open(request, timeout=timeout) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            if e.code >= 500 or e.code == 429:
+                raise _RetryableWebhookError(f"HTTP {e.code}") from None
+            return e.code
+        except (urllib.error.URLError, OSError) as e:
+            raise _RetryableWebhookError(type(e).__name__) from None
+
+    try:
+        outcome = str(call_with_retries(
+            send,
+            timeout=getattr(settings, "JOBS_WEBHOOK_TIMEOUT", 10.0),
+            retries=getattr(settings, "JOBS_WEBHOOK_RETRIES", 3),
+            backoff=1.0,
+            retry_on=(_RetryableWebhookError,),
+        ))
+    except (_RetryableWebhookError, InvalidWebhook) as e:
+        outcome = f"failed: {e}"
+        logger.warning("webhook_failed", extra={"job": str(job_id), "error": str(e)})
+    Job.objects.filter(pk=job_id).update(webhook_status=outcome[:64])
+    return outcome
+
+
+# -- worker ------------------------------------------------------------------
+
+class JobWorker:
+    """Claims and runs jobs on its own event loop in a background thread."""
+
+    def __init__(self):
+        self.concurrency = max(1, getattr(settings, "JOBS_CONCURRENCY", 8))
+        self.poll_interval = getattr(settings, "JOBS_POLL_INTERVAL", 1.0)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self) -> "JobWorker":
+        self._thread = threading.Thread(target=self.run_forever, name="jobs", daemon=True)
+        self._thread.start()
+        return self
+
+    def run_forever(self) -> None:
+        asyncio.run(self._main())
+
+    def notify(self) -> None:
+        """Wake the worker now instead of at the next poll."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            loop.call_soon_threadsafe(wake.set)
+
+    def stop(self) -> None:
+        self._stopping = True
+        self.notify()
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._ocr_slots = asyncio.Semaphore(max(1, getattr(settings, "JOBS_OCR_CONCURRENCY", 2)))
+        self._ai_slots = asyncio.Semaphore(max(1, getattr(settings, "JOBS_AI_CONCURRENCY", 4)))
+        running: set = set()
+        last_housekeeping = 0.0
+        while not self._stopping:
+            now = time.monotonic()
+            if now - last_housekeeping > 60:
+                last_housekeeping = now
+                try:
+                    await _in_thread(_requeue_expired)
+                    await _in_thread(_purge_finished)
+                except Exception:
+                    logger.exception("jobs_housekeeping_failed")
+            free = self.concurrency - len(running)
+            claimed: List[Job] = []
+            if free > 0:
+                try:
+                    claimed = await _in_thread(_claim, free)
+                except Exception:
+                    logger.exception("jobs_claim_failed")
+            for job in claimed:
+                task = asyncio.ensure_future(self._run(job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            if claimed and len(running) < self.concurrency:
+                continue
+            self._wake.clear()
+            waiters = [asyncio.ensure_future(self._wake.wait())]
+            if running:
+                # A finished job frees a slot; look for more work right away.
+                waiters.append(asyncio.ensure_future(asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)))
+            done, pending = await asyncio.wait(waiters, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in pending:
+                waiter.cancel()
+        if running:
+            await asyncio.wait(running)
+
+    async def _run(self, job: Job) -> None:
+        from . import cache as result_cache
+        from . import history, metrics, ocr, views
+
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        try:
+            cached = result_cache.get_result(job.cache_key) if job.cache_key else None
+            if cached is not None:
+                payload, status = cached
+                payload.setdefault("meta", {})["cache"] = "hit"
+            else:
+                ocr_info = None
+                if job.kind == Job.IMAGE:
+                    async with self._ocr_slots:
+                        t0 = time.perf_counter()
+                        source, ocr_timings, ocr_info = await ocr.ocr_document(job.image_path, partial=False)
+                        timings.update(ocr_timings)
+                        timings["ocr"] = round((time.perf_counter() - t0) * 1000, 2)
+                else:
+                    source = job.source
+                async with self._ai_slots:
+                    payload, status = await views._process_text(
+                        source, job.tests_raw, timings, views._ai_deadline(), use_ai=job.kind == Job.TEXT,
+                        patient=job.patient, shed_ai=False,
+                    )
+                meta = payload.setdefault("meta", {})
+                if ocr_info is not None:
+                    meta["ocr"] = ocr_info
+                if job.cache_key:
+                    result_cache.set_result(job.cache_key, payload, status)
+                meta["cache"] = "miss"
+                timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+                meta["timings_ms"] = timings
+                metrics.observe_stages(timings)
+            target = history.target_from_json(job.history)
+            if target is not None and status == 200 and payload.get("tests"):
+                try:
+                    recorded = await _in_thread(history.record, target, job.cache_key, payload["tests"])
+                    payload["meta"]["history"] = history.history_meta(recorded)
+                except Exception as e:
+                    logger.warning("history_write_failed", extra={"job": str(job.pk), "error": type(e).__name__})
+                    payload["meta"]["history"] = {"error": "write_failed"}
+            metrics.observe_request("job", status, time.perf_counter() - started, payload["meta"].get("cache"))
+            await _in_thread(_finish, job.pk, Job.DONE, payload, status)
+        except ocr.OCRBusy:
+            # The OCR pool is shared with /api/process; try again shortly.
+            await _in_thread(_retry_later, job.pk, 2.0)
+            return
+        except Exception as e:
+            logger.exception("job_failed", extra={"job": str(job.pk)})
+            metrics.observe_request("job", 500, time.perf_counter() - started)
+            await _in_thread(_finish, job.pk, Job.FAILED, None, None, f"{type(e).__name__}: {e}")
+        discard_upload(job.image_path)
+        if job.webhook_url:
+            try:
+                await _in_thread(deliver_webhook, job.pk)
+            except Exception:
+                logger.exception("webhook_failed", extra={"job": str(job.pk)})
+
+
+_worker: Optional[JobWorker] = None
+_worker_lock = threading.Lock()
+
+
+def ensure_worker() -> Optional[JobWorker]:
+    """Start this process's embedded worker if enabled; idempotent."""
+    global _worker
+    if not getattr(settings, "JOBS_EMBEDDED_WORKER", True):
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = JobWorker().start()
+        return _worker
+
+
+async def submit(
+    kind: str,
+    source: str = "",
+    upload=None,
+    tests_raw: Optional[list] = None,
+    cache_key: str = "",
+    webhook_url: str = "",
+    patient: Optional[Dict] = None,
+    history: Optional[Dict] = None,
+) -> Job:
+    if webhook_url:
+        webhook_url = await asyncio.to_thread(validate_webhook_url, webhook_url)
+    image_path = await asyncio.to_thread(save_upload, upload) if upload is not None else ""
+    try:
+        job = await Job.objects.acreate(
+            kind=kind, source=source, image_path=image_path, tests_raw=tests_raw, patient=patient,
+            history=history, cache_key=cache_key, webhook_url=webhook_url,
+        )
+    except BaseException:
+        discard_upload(image_path)
+        raise
+    worker = ensure_worker()
+    if worker is not None:
+        worker.notify()
+    return job
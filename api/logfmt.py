@@ -0,0 +1,42 @@
+"""Structured log formatting: ``extra=`` fields become ``key=value`` pairs or JSON keys.
+
+Callers pass facts (counts, sizes, timings, error classes), never report text,
+so logs stay free of patient data at any level.
+"""
+import json
+import logging
+
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, json_lines: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        if self.json_lines:
+            fields = _fields(record)
+            entry = {
+                "ts": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+        return super().format(record)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
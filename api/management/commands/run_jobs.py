@@ -0,0 +1,26 @@
+"""Run the background job worker in the foreground: ``manage.py run_jobs``.
+
+Use this (with ``JOBS_EMBEDDED_WORKER=0`` on the web servers) to keep job
+execution out of the request-serving processes. Several instances can run
+against the same database.
+"""
+from django.core.management.base import BaseCommand
+
+from api.jobs import JobWorker
+
+
+class Command(BaseCommand):
+    help = "Process queued /api/jobs reports until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, help="Jobs in flight (default: JOBS_CONCURRENCY)")
+
+    def handle(self, *args, **options):
+        worker = JobWorker()
+        if options["concurrency"]:
+            worker.concurrency = max(1, options["concurrency"])
+        self.stdout.write(f"Job worker running with concurrency {worker.concurrency}; Ctrl-C to stop.")
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
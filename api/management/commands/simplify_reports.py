@@ -0,0 +1,270 @@
+"""Offline bulk processing: ``manage.py simplify_reports INPUT... -o results.jsonl``.
+
+Inputs may be directories, text files, images, PDFs or JSONL files (one report per
+line, either a string or ``{id?, text?, image_text?, tests_raw?, patient?}``). Reports
+are fanned out over a process pool because OCR and regex extraction are
+CPU-bound. Reports go to the workers in chunks of ``--chunk-size``, whose values
+are classified together. Inputs are read lazily and at most ``2 * workers``
+chunks are queued at a time, so memory does not grow with the corpus. Each result is
+appended to the output JSONL as soon as it is ready, so the output doubles as
+the checkpoint: re-running with the same output skips every id already written.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import asyncio
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.results import ResultColumns, ResultEncoder
+
+
+TEXT_SUFFIXES = {".txt", ".text", ".md"}
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif", ".webp", ".pdf"}
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+
+def _init_worker() -> None:
+    # With the spawn start method (Windows, macOS) workers start cold.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "medical_simplifier.settings")
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _invalid_result(record: Dict) -> Dict:
+    return {
+        "id": record["id"], "status": "unprocessed", "reason": "invalid_report",
+        "detail": record["error"], "http_status": 400,
+    }
+
+
+def _result(record: Dict, payload: Dict, status: int, timings: Dict[str, float], started: float, ocr_info) -> Dict:
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    meta = payload.setdefault("meta", {})
+    meta["timings_ms"] = timings
+    if ocr_info is not None:
+        meta["ocr"] = ocr_info
+    return {"id": record["id"], **payload, "http_status": status}
+
+
+def _failed(e: Exception) -> Tuple[Dict, int]:
+    return {"status": "unprocessed", "reason": "failed", "detail": str(e)}, 500
+
+
+def _process_chunk(records: List[Dict], use_ai: bool) -> Tuple[ResultColumns, List[Dict]]:
+    """Results for a chunk of records, in order, with their tests packed into
+    one ``ResultColumns`` (see ``ResultColumns.unpack``) to keep what is sent
+    back to the main process small.
+
+    The rule-extracted values of the whole chunk are classified together
+    (``views._rules_many``), so a chunk of a few dozen reports makes one
+    vectorized ``classify.evaluate`` call.
+    """
+    from api import classify, ocr, views
+
+    results: List[Optional[Dict]] = [None] * len(records)
+    pending = []
+    for i, record in enumerate(records):
+        timings: Dict[str, float] = {}
+        ocr_info = None
+        started = time.perf_counter()
+        try:
+            if record["kind"] == "image":
+                # Already inside a worker process, so OCR runs inline here, on
+                # the memory-mapped file.
+                source, ocr_timings, ocr_info = ocr.recognize_document(record["path"])
+                timings.update(ocr_timings)
+                provided = None
+            else:
+                source = record.get("text") or ""
+                provided = record.get("tests_raw")
+            patient = classify.parse_patient(record.get("patient"))
+        except Exception as e:
+            results[i] = _result(record, *_failed(e), timings, started, ocr_info)
+            continue
+        pending.append((i, record, source, provided, patient, timings, ocr_info, started))
+
+    try:
+        rules = views._rules_many([(p[2], p[3], p[4]) for p in pending], [p[5] for p in pending])
+    except Exception as e:
+        for i, record, _, _, _, timings, ocr_info, started in pending:
+            results[i] = _result(record, *_failed(e), timings, started, ocr_info)
+        return ResultColumns(), results
+    for (i, record, source, provided, patient, timings, ocr_info, started), report_rules in zip(pending, rules):
+        try:
+            payload, status = asyncio.run(views._process_text(
+                source,
+                provided,
+                timings,
+                views._ai_deadline(),
+                use_ai=use_ai and record["kind"] != "image",
+                ai_summary=use_ai,
+                patient=patient,
+                shed_ai=False,
+                rules=report_rules,
+            ))
+        except Exception as e:
+            payload, status = _failed(e)
+        results[i] = _result(record, payload, status, timings, started, ocr_info)
+    columns = ResultColumns()
+    return columns, [columns.pack(result) for result in results]
+
+
+def _records_from_jsonl(path: Path) -> Iterator[Dict]:
+    with path.open(encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                # Reported in the output like the batch endpoint's invalid reports.
+                yield {"id": f"{path}:{lineno}", "kind": "invalid", "error": f"invalid JSON: {e}"}
+                continue
+            if isinstance(item, str):
+                item = {"text": item}
+            if not isinstance(item, dict):
+                yield {"id": f"{path}:{lineno}", "kind": "invalid", "error": "report must be a string or an object"}
+                continue
+            yield {
+                "id": str(item.get("id") or f"{path}:{lineno}"),
+                "kind": "text",
+                "text": (item.get("text") or "").strip() or (item.get("image_text") or "").strip(),
+                "tests_raw": item.get("tests_raw") if isinstance(item.get("tests_raw"), list) else None,
+                "patient": item.get("patient"),
+            }
+
+
+def _records_from_path(path: Path) -> Iterator[Dict]:
+    if path.is_dir():
+        for child in sorted(p for p in path.rglob("*") if p.is_file()):
+            yield from _records_from_path(child)
+        return
+    suffix = path.suffix.lower()
+    if suffix in JSONL_SUFFIXES:
+        yield from _records_from_jsonl(path)
+    elif suffix in TEXT_SUFFIXES:
+        yield {"id": str(path), "kind": "text", "text": path.read_text(encoding="utf-8", errors="replace")}
+    elif suffix in IMAGE_SUFFIXES:
+        yield {"id": str(path), "kind": "image", "path": str(path)}
+
+
+def _completed_ids(output: Path) -> Set[str]:
+    """Ids already in the output; a torn final line from a crash is cut off.
+
+    Any other unreadable line raises ``CommandError`` rather than dropping the
+    results after it.
+    """
+    done: Set[str] = set()
+    if not output.exists():
+        return done
+    valid_until = 0
+    with output.open("rb") as fh:
+        for lineno, line in enumerate(fh, 1):
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError, TypeError):
+                if line.endswith(b"\n") or fh.read(1):
+                    raise CommandError(f"{output}:{lineno} is not a result line; fix or remove it to resume") from None
+                break
+            valid_until += len(line)
+    if valid_until < output.stat().st_size:
+        with output.open("r+b") as fh:
+            fh.truncate(valid_until)
+    return done
+
+
+def _pending(inputs: Iterable[Path], done: Set[str]) -> Iterator[Dict]:
+    for path in inputs:
+        yield from (r for r in _records_from_path(path) if r["id"] not in done)
+
+
+class Command(BaseCommand):
+    help = "Simplify reports from files, directories or JSONL in parallel and write JSONL results."
+
+    def add_arguments(self, parser):
+        parser.add_argument("inputs", nargs="+", help="Text/image files, directories or JSONL files")
+        parser.add_argument("-o", "--output", required=True, help="Output JSONL (also the resume checkpoint)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--ai", action="store_true", help="Also call the AI extraction and summary")
+        parser.add_argument("--overwrite", action="store_true", help="Start over instead of resuming")
+        parser.add_argument("--chunk-size", type=int, default=64, help="Reports per worker task")
+        parser.add_argument("--progress-every", type=float, default=5.0, help="Seconds between progress lines")
+
+    def handle(self, *args, **options):
+        output = Path(options["output"])
+        if options["overwrite"] and output.exists():
+            output.unlink()
+        done = _completed_ids(output)
+
+        inputs = [Path(raw) for raw in options["inputs"]]
+        for path in inputs:
+            if not path.exists():
+                raise CommandError(f"{path} does not exist")
+        if done:
+            self.stderr.write(f"Resuming: {len(done)} reports already in {output}")
+
+        workers = max(1, options["workers"])
+        records = _pending(inputs, done)
+        started = last_report = time.perf_counter()
+        completed = failed = invalid = 0
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with output.open("a", encoding="utf-8") as out, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker
+        ) as pool:
+
+            def write(result: Dict) -> None:
+                nonlocal completed, failed
+                out.write(json.dumps(result, cls=ResultEncoder) + "\n")
+                out.flush()
+                completed += 1
+                failed += result.get("http_status", 200) >= 500
+
+            chunk_size = max(1, options["chunk_size"])
+            in_flight: Deque[Future] = deque()
+            exhausted = False
+            while True:
+                # Keep every worker busy with one chunk queued behind it.
+                while not exhausted and len(in_flight) < 2 * workers:
+                    chunk: List[Dict] = []
+                    while len(chunk) < chunk_size:
+                        record = next(records, None)
+                        if record is None:
+                            exhausted = True
+                            break
+                        if record["kind"] == "invalid":
+                            write(_invalid_result(record))
+                            invalid += 1
+                        else:
+                            chunk.append(record)
+                    if chunk:
+                        in_flight.append(pool.submit(_process_chunk, chunk, options["ai"]))
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    in_flight.remove(future)
+                    columns, chunk_results = future.result()
+                    for result in chunk_results:
+                        write(columns.unpack(result))
+                now = time.perf_counter()
+                if now - last_report >= options["progress_every"]:
+                    last_report = now
+                    rate = completed / (now - started)
+                    self.stderr.write(f"{completed} reports, {rate:.1f}/s")
+
+        if not completed:
+            self.stdout.write("Nothing to do.")
+            return
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {completed} reports in {elapsed:.1f}s "
+            f"({completed / elapsed:.1f}/s, {failed} failed, {invalid} invalid) -> {output}"
+        ))
@@ -0,0 +1,226 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Per-stage latencies go into histograms so percentiles can be computed at
+scrape time; request counts and provider state are exported alongside them.
+Metrics are per process: with several gunicorn workers, each worker reports
+its own series (scrape each worker, or aggregate with ``sum by``).
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import bisect
+import threading
+
+
+# Seconds; spans regex stages (sub-millisecond) up to OCR and LLM calls.
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in values
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum.
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        lines = self._header()
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Read at scrape time from ``fn``, which returns a value or ``{label values: value}``."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            values = self.fn()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} {_number(v)}"
+            for key, v in sorted(values.items())
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "simplifier_stage_duration_seconds",
+    "Wall time of one pipeline stage (ocr, cleanup, extract, ai_extract, normalize, summary, ai_summary, serialize).",
+    ("stage",),
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "simplifier_request_duration_seconds",
+    "End-to-end handling time per report.",
+    ("endpoint", "cache"),
+))
+REQUESTS = REGISTRY.register(Counter(
+    "simplifier_requests_total",
+    "Reports handled, by endpoint and HTTP status.",
+    ("endpoint", "status"),
+))
+AI_CALLS = REGISTRY.register(Counter(
+    "simplifier_ai_calls_total",
+    "AI calls the pipeline made (including summary cache hits), by call (extract, summary).",
+    ("call",),
+))
+AI_CALLS_AVOIDED = REGISTRY.register(Counter(
+    "simplifier_ai_calls_avoided_total",
+    "AI calls skipped by AI_EXTRACT_POLICY / AI_SUMMARY_POLICY, by call and reason.",
+    ("call", "reason"),
+))
+AI_REQUESTS = REGISTRY.register(Counter(
+    "simplifier_ai_requests_total",
+    "Groq chat completions by call and outcome: issued (sent, retries included) or coalesced (shared an identical in-flight request).",
+    ("call", "outcome"),
+))
+SHED = REGISTRY.register(Counter(
+    "simplifier_shed_total",
+    "Requests refused by admission control, by endpoint and reason (rate_limited: 429, ocr_busy: 503).",
+    ("endpoint", "reason"),
+))
+DEGRADED = REGISTRY.register(Counter(
+    "simplifier_degraded_total",
+    "AI calls skipped under load, the rule-based result being served instead, by call and reason (overload, quota).",
+    ("call", "reason"),
+))
+
+
+def _summary_cache() -> Dict[Tuple[str, ...], float]:
+    from .ai import summary_cache_stats
+
+    stats = summary_cache_stats()
+    return {(k,): stats[k] for k in ("size", "hits", "misses", "evictions")}
+
+
+def _breaker_open() -> Dict[Tuple[str, ...], float]:
+    from .ai import breaker_state
+
+    state = breaker_state()["state"]
+    return {(s,): 1.0 if s == state else 0.0 for s in ("closed", "half_open", "open")}
+
+
+def _ai_in_flight() -> float:
+    from .admission import AI_GATE
+
+    return float(AI_GATE.in_use)
+
+
+REGISTRY.register(Gauge("simplifier_summary_cache", "AI summary cache counters.", _summary_cache, ("field",)))
+REGISTRY.register(Gauge("simplifier_ai_breaker_state", "1 for the current AI circuit breaker state.", _breaker_open, ("state",)))
+REGISTRY.register(Gauge("simplifier_ai_in_flight", "AI calls running or queued in the AI pool.", _ai_in_flight))
+
+
+def observe_stages(timings: Dict[str, float]) -> None:
+    """Record a request's ``meta.timings_ms`` (milliseconds) into the stage histogram."""
+    for stage, ms in timings.items():
+        if stage != "total":
+            STAGE_SECONDS.observe(ms / 1000.0, stage=stage)
+
+
+def observe_request(endpoint: str, status: int, seconds: float, cache: Optional[str] = None) -> None:
+    REQUESTS.inc(endpoint=endpoint, status=str(status))
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint, cache=cache or "none")
+
+
+def render() -> str:
+    return REGISTRY.render()
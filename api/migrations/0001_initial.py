@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:48
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('kind', models.CharField(choices=[('text', 'Text'), ('image', 'Image')], default='text', max_length=8)),
+                ('source', models.TextField(blank=True, default='')),
+                ('tests_raw', models.JSONField(blank=True, null=True)),
+                ('image', models.BinaryField(blank=True, null=True)),
+                ('cache_key', models.CharField(blank=True, default='', max_length=200)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('http_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('webhook_url', models.URLField(blank=True, default='', max_length=2000)),
+                ('webhook_status', models.CharField(blank=True, default='', max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='api_job_queue_idx'), models.Index(fields=['status', 'finished_at'], name='api_job_finished_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:56
+
+import api.results
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='result',
+            field=models.JSONField(blank=True, encoder=api.results.ResultEncoder, null=True),
+        ),
+    ]
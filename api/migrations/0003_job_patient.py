@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_job_result_encoder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='patient',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
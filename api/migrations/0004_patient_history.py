@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_job_patient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='history',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PatientReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_id', models.CharField(max_length=64)),
+                ('collected_at', models.DateTimeField()),
+                ('report_key', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient_id', 'collected_at'], name='api_report_patient_idx')],
+                'constraints': [models.UniqueConstraint(fields=('report_key', 'patient_id', 'collected_at'), name='api_report_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LabValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_id', models.CharField(max_length=64)),
+                ('analyte', models.CharField(max_length=64)),
+                ('collected_at', models.DateTimeField()),
+                ('name', models.CharField(max_length=128)),
+                ('value', models.FloatField()),
+                ('unit', models.CharField(blank=True, default='', max_length=32)),
+                ('status', models.CharField(blank=True, default='', max_length=16)),
+                ('ref_low', models.FloatField(blank=True, null=True)),
+                ('ref_high', models.FloatField(blank=True, null=True)),
+                ('severity', models.FloatField(blank=True, null=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='api.patientreport')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient_id', 'analyte', 'collected_at'], name='api_labvalue_trend_idx')],
+            },
+        ),
+    ]
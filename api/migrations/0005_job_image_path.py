@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_patient_history'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='job',
+            name='image',
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='image_path',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+    ]
@@ -0,0 +1,117 @@
+import uuid
+
+from django.db import models
+from django.utils import timezone
+
+from .results import ResultEncoder
+
+
+class Job(models.Model):
+    """A report queued for background processing (see ``api.jobs``).
+
+    The input (``source``, or the uploaded file at ``image_path``) is cleared
+    once the job finishes, so report content is only kept for as long as it
+    is needed.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    TEXT = "text"
+    IMAGE = "image"
+    KIND_CHOICES = [(TEXT, "Text"), (IMAGE, "Image")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES, default=TEXT)
+    source = models.TextField(blank=True, default="")
+    tests_raw = models.JSONField(null=True, blank=True)
+    # Sex/age for reference ranges (see ``api.classify``).
+    patient = models.JSONField(null=True, blank=True)
+    # {"patient_id", "collected_at"} when the result goes into patient history.
+    history = models.JSONField(null=True, blank=True)
+    # An uploaded image or PDF, copied under JOBS_UPLOAD_DIR (see ``jobs.save_upload``).
+    image_path = models.CharField(max_length=500, blank=True, default="")
+    cache_key = models.CharField(max_length=200, blank=True, default="")
+
+    result = models.JSONField(null=True, blank=True, encoder=ResultEncoder)
+    http_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    webhook_url = models.URLField(max_length=2000, blank=True, default="")
+    webhook_status = models.CharField(max_length=64, blank=True, default="")
+
+    created_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A running job whose lease has expired belonged to a worker that died.
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="api_job_queue_idx"),
+            models.Index(fields=["status", "finished_at"], name="api_job_finished_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Job {self.id} ({self.status})"
+
+
+class PatientReport(models.Model):
+    """One processed report stored in a patient's history (see ``api.history``).
+
+    Only the results are kept, never the report text. ``report_key`` is the
+    result-cache key of the input, so re-submitting the same report for the
+    same collection time does not add a second copy.
+    """
+
+    patient_id = models.CharField(max_length=64)
+    collected_at = models.DateTimeField()
+    report_key = models.CharField(max_length=200)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Leads with report_key so the duplicate check is an index lookup.
+            models.UniqueConstraint(fields=["report_key", "patient_id", "collected_at"], name="api_report_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["patient_id", "collected_at"], name="api_report_patient_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Report {self.pk} ({self.patient_id} @ {self.collected_at:%Y-%m-%d})"
+
+
+class LabValue(models.Model):
+    """One normalized test of a ``PatientReport``.
+
+    ``patient_id`` and ``collected_at`` are copied from the report so a trend
+    query is a single range scan of ``api_labvalue_trend_idx`` with no join.
+    """
+
+    report = models.ForeignKey(PatientReport, on_delete=models.CASCADE, related_name="values")
+    patient_id = models.CharField(max_length=64)
+    # Registry key ("hemoglobin"), or the lowercased name for unknown analytes.
+    analyte = models.CharField(max_length=64)
+    collected_at = models.DateTimeField()
+    name = models.CharField(max_length=128)
+    value = models.FloatField()
+    unit = models.CharField(max_length=32, blank=True, default="")
+    status = models.CharField(max_length=16, blank=True, default="")
+    ref_low = models.FloatField(null=True, blank=True)
+    ref_high = models.FloatField(null=True, blank=True)
+    severity = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["patient_id", "analyte", "collected_at"], name="api_labvalue_trend_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} {self.value} {self.unit} ({self.patient_id} @ {self.collected_at:%Y-%m-%d})"
@@ -0,0 +1,399 @@
+"""OCR subsystem: image preprocessing plus a warm, bounded tesseract pool.
+
+Uploads may be single images, multi-page TIFFs or PDFs (rendered with the
+optional ``pypdfium2``). ``recognize_document`` runs preprocessing and
+tesseract page by page in the calling process (used by the bulk command,
+which already runs in a process pool). ``ocr_document`` fans the pages out to
+a lazily created process pool whose workers import PIL and pytesseract once;
+at most ``OCR_WORKERS + OCR_MAX_PENDING`` pages are accepted at a time and
+further submissions fail fast with ``OCRBusy``. A document that already has
+pages recognized by then is returned truncated rather than failed.
+
+Both stop early once every analyte of the expected panel has been seen, so
+trailing pages (methodology, signatures) are not OCR'd.
+
+A document is passed either as bytes or as the path of a file holding it
+(an upload Django spooled to disk). Paths are memory-mapped where the pages
+are read, so pool workers receive a file name rather than a pickled copy of
+the upload for every page.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, FrozenSet, Iterator, Optional, Tuple, Union
+import asyncio
+import io
+import mmap
+import multiprocessing
+import os
+import platform
+import threading
+import time
+
+from django.conf import settings
+
+from . import extraction, registry
+
+
+# Encoded image/PDF bytes, or the path of a file holding them.
+Document = Union[bytes, str]
+
+
+class OCRError(Exception):
+    pass
+
+
+class OCRBusy(OCRError):
+    """The OCR queue is full; the caller should retry later."""
+
+
+class ImageTooLarge(OCRError):
+    pass
+
+
+def _default_tesseract_cmd() -> str:
+    if platform.system() == "Windows":
+        return r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+    return "/usr/bin/tesseract"
+
+
+def ocr_config() -> Dict:
+    """Plain-data OCR settings, passed to workers so they need no Django."""
+    return {
+        "tesseract_cmd": getattr(settings, "TESSERACT_CMD", None) or _default_tesseract_cmd(),
+        "max_pixels": getattr(settings, "OCR_MAX_PIXELS", 40_000_000),
+        "max_side": getattr(settings, "OCR_MAX_SIDE", 2500),
+        "binarize": getattr(settings, "OCR_BINARIZE", True),
+        "psm": getattr(settings, "OCR_PSM", 6),
+        "whitelist": getattr(settings, "OCR_WHITELIST", ""),
+        "pdf_dpi": getattr(settings, "OCR_PDF_DPI", 300),
+        "max_pages": getattr(settings, "OCR_MAX_PAGES", 20),
+    }
+
+
+def expected_panel() -> FrozenSet[str]:
+    """Analyte keys whose presence ends OCR of a multi-page document early."""
+    keys = getattr(settings, "OCR_EARLY_STOP_PANEL", None)
+    if keys is None:
+        return frozenset(a.key for a in registry.ANALYTES)
+    return frozenset(k for k in keys if k in registry.BY_KEY)
+
+
+class PanelTracker:
+    """Scans page text as it arrives and reports when the panel is complete."""
+
+    def __init__(self, expected: FrozenSet[str]):
+        self.expected = expected
+        self.found: set = set()
+
+    def feed(self, text: str) -> bool:
+        if self.expected and not self.complete:
+            cleaned = extraction.simple_ocr_text_cleanup(text)
+            self.found.update(m.key for m in extraction.scan(cleaned))
+        return self.complete
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.expected) and self.expected <= self.found
+
+
+def _otsu_threshold(histogram) -> int:
+    total = sum(histogram)
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    sum_bg = weight_bg = 0
+    best, threshold = -1.0, 127
+    for i, h in enumerate(histogram):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def preprocess(image, config: Dict):
+    """Grayscale, downscale oversized scans and binarize with Otsu's threshold."""
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L")
+    max_side = config["max_side"]
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if config["binarize"]:
+        threshold = _otsu_threshold(image.histogram())
+        image = image.point(lambda p: 255 if p > threshold else 0, mode="1")
+    return image
+
+
+def _tesseract_args(config: Dict) -> str:
+    args = f"--psm {int(config['psm'])}"
+    if config["whitelist"]:
+        args += f" -c tessedit_char_whitelist={config['whitelist']}"
+    return args
+
+
+def is_pdf(data: bytes) -> bool:
+    return data[:5] == b"%PDF-"
+
+
+def _is_pdf_document(document: Document) -> bool:
+    if isinstance(document, str):
+        with open(document, "rb") as fh:
+            return is_pdf(fh.read(5))
+    return is_pdf(document)
+
+
+@contextmanager
+def _opened(document: Document) -> Iterator:
+    """A seekable file object over the document; files are memory-mapped, not read."""
+    if not isinstance(document, str):
+        yield io.BytesIO(document)
+        return
+    with open(document, "rb") as fh:
+        if not os.fstat(fh.fileno()).st_size:
+            # mmap refuses empty files; let PIL report the bad image.
+            yield io.BytesIO(b"")
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def _pdfium():
+    try:
+        import pypdfium2
+    except ImportError:
+        raise OCRError("PDF uploads require the pypdfium2 package") from None
+    return pypdfium2
+
+
+def _check_pixels(width: int, height: int, config: Dict) -> None:
+    if config["max_pixels"] and width * height > config["max_pixels"]:
+        raise ImageTooLarge(f"image has {width * height} pixels, limit is {config['max_pixels']}")
+
+
+def page_count(data: Document, config: Optional[Dict] = None) -> int:
+    """Number of pages, read from the document structure without rendering."""
+    config = config or ocr_config()
+    if _is_pdf_document(data):
+        document = _pdfium().PdfDocument(data)
+        try:
+            pages = len(document)
+        finally:
+            document.close()
+    else:
+        from PIL import Image
+
+        with _opened(data) as fh, Image.open(fh) as image:
+            pages = getattr(image, "n_frames", 1)
+    if config["max_pages"] and pages > config["max_pages"]:
+        raise ImageTooLarge(f"document has {pages} pages, limit is {config['max_pages']}")
+    return pages
+
+
+def _ocr_image(image, config: Dict, timings: Dict[str, float]) -> str:
+    t0 = time.perf_counter()
+    image = preprocess(image, config)
+    t1 = time.perf_counter()
+    import pytesseract
+
+    text = pytesseract.image_to_string(image, config=_tesseract_args(config))
+    timings["ocr_preprocess"] = round((t1 - t0) * 1000, 2)
+    timings["ocr_tesseract"] = round((time.perf_counter() - t1) * 1000, 2)
+    return text
+
+
+def recognize_page(data: Document, index: int, config: Optional[Dict] = None) -> Tuple[str, Dict[str, float]]:
+    """OCR one page of an encoded image or PDF; returns text and per-stage timings in ms."""
+    from PIL import Image
+    import pytesseract
+
+    config = config or ocr_config()
+    pytesseract.pytesseract.tesseract_cmd = config["tesseract_cmd"]
+    timings: Dict[str, float] = {}
+
+    t0 = time.perf_counter()
+    if _is_pdf_document(data):
+        document = _pdfium().PdfDocument(data)
+        try:
+            page = document[index]
+            scale = config["pdf_dpi"] / 72.0
+            width, height = page.get_size()
+            _check_pixels(int(width * scale), int(height * scale), config)
+            image = page.render(scale=scale, grayscale=True).to_pil()
+            timings["ocr_decode"] = round((time.perf_counter() - t0) * 1000, 2)
+            # The bitmap is owned by the document, so finish before closing it.
+            text = _ocr_image(image, config, timings)
+        finally:
+            document.close()
+        return text, timings
+
+    with _opened(data) as fh:
+        image = Image.open(fh)
+        if index:
+            image.seek(index)
+        # Only the header has been read so far; refuse decompression bombs here.
+        _check_pixels(*image.size, config)
+        image.load()
+        timings["ocr_decode"] = round((time.perf_counter() - t0) * 1000, 2)
+        return _ocr_image(image, config, timings), timings
+
+
+def recognize(data: Document, config: Optional[Dict] = None) -> Tuple[str, Dict[str, float]]:
+    """OCR the first page of an encoded image; returns text and per-stage timings in ms."""
+    return recognize_page(data, 0, config)
+
+
+def _add_timings(total: Dict[str, float], page: Dict[str, float]) -> None:
+    for stage, ms in page.items():
+        total[stage] = round(total.get(stage, 0.0) + ms, 2)
+
+
+def _join_pages(texts: Dict[int, str]) -> str:
+    return "\n\n".join(texts[i] for i in sorted(texts))
+
+
+def recognize_document(data: Document, config: Optional[Dict] = None) -> Tuple[str, Dict[str, float], Dict]:
+    """OCR every page in order in this process, stopping once the panel is complete."""
+    config = config or ocr_config()
+    pages = page_count(data, config)
+    tracker = PanelTracker(expected_panel())
+    texts: Dict[int, str] = {}
+    timings: Dict[str, float] = {}
+    for index in range(pages):
+        texts[index], page_timings = recognize_page(data, index, config)
+        _add_timings(timings, page_timings)
+        if tracker.feed(texts[index]):
+            break
+    return _join_pages(texts), timings, _document_info(pages, texts, tracker)
+
+
+def _document_info(pages: int, texts: Dict[int, str], tracker: PanelTracker, truncated: bool = False) -> Dict:
+    return {
+        "pages": pages,
+        "pages_ocr": len(texts),
+        "early_stop": len(texts) < pages and tracker.complete,
+        "truncated": truncated,
+    }
+
+
+def _init_worker(config: Dict) -> None:
+    # Import heavy modules and set the binary path once per worker.
+    from PIL import Image
+    import pytesseract
+
+    Image.MAX_IMAGE_PIXELS = config["max_pixels"] or None
+    pytesseract.pytesseract.tesseract_cmd = config["tesseract_cmd"]
+
+
+def _recognize_in_worker(data: Document, index: int, config: Dict) -> Tuple[str, Dict[str, float]]:
+    try:
+        return recognize_page(data, index, config)
+    except OCRError:
+        raise
+    except Exception as e:
+        # Some library exceptions (pytesseract's) do not survive pickling
+        # back to the parent, which would break the whole pool.
+        raise OCRError(f"{type(e).__name__}: {e}") from None
+
+
+def _noop() -> None:
+    return None
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Tuple[ProcessPoolExecutor, threading.BoundedSemaphore]:
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = max(1, getattr(settings, "OCR_WORKERS", 2))
+            # spawn, not fork: the server process is multi-threaded.
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(ocr_config(),),
+            )
+            _slots = threading.BoundedSemaphore(workers + max(0, getattr(settings, "OCR_MAX_PENDING", 8)))
+            # Start every worker now so the first real request does not pay for it.
+            for _ in range(workers):
+                _pool.submit(_noop)
+        return _pool, _slots
+
+
+def _submit(fn: Callable, *args) -> Future:
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise OCRBusy("OCR queue is full")
+    try:
+        future = pool.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def submit(data: Document) -> "Future[Tuple[str, Dict[str, float]]]":
+    """Queue the first page of an image for OCR in the worker pool, or raise ``OCRBusy``."""
+    return _submit(_recognize_in_worker, data, 0, ocr_config())
+
+
+async def ocr_document(data: Document, partial: bool = True) -> Tuple[str, Dict[str, float], Dict]:
+    """OCR a document's pages in parallel in the worker pool.
+
+    Up to ``OCR_WORKERS`` pages of one document are in flight at a time.
+    Finished pages are scanned in page order, and once the expected panel is
+    complete the pages not yet started are cancelled. If the pool is full once
+    this document's pages in flight have finished, the pages recognized so far
+    are returned with ``truncated`` set. Raises ``OCRBusy`` if not even the
+    first page can be queued, or instead of truncating when ``partial`` is off.
+    """
+    config = ocr_config()
+    # Parsing the header (or a PDF's page tree) is file I/O; keep it off the event loop.
+    pages = await asyncio.to_thread(page_count, data, config)
+    window = max(1, getattr(settings, "OCR_WORKERS", 2))
+    tracker = PanelTracker(expected_panel())
+    texts: Dict[int, str] = {}
+    timings: Dict[str, float] = {}
+    in_flight: Dict[asyncio.Future, int] = {}
+    next_page = scanned = 0
+    truncated = False
+    try:
+        while not tracker.complete:
+            while next_page < pages and len(in_flight) < window:
+                try:
+                    future = _submit(_recognize_in_worker, data, next_page, config)
+                except OCRBusy:
+                    if in_flight:
+                        # Other uploads hold the slots; continue with what we have.
+                        break
+                    if not texts or not partial:
+                        raise
+                    truncated = True
+                    break
+                in_flight[asyncio.wrap_future(future)] = next_page
+                next_page += 1
+            if not in_flight:
+                break
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                texts[index], page_timings = future.result()
+                _add_timings(timings, page_timings)
+            while scanned in texts and not tracker.feed(texts[scanned]):
+                scanned += 1
+    finally:
+        for future in in_flight:
+            future.cancel()
+    return _join_pages(texts), timings, _document_info(pages, texts, tracker, truncated)
@@ -0,0 +1,96 @@
+"""Analyte registry shared by extraction, normalization and summarization.
+
+Each analyte is declared once here. Aliases and unit variants are plain
+phrases; whitespace inside them matches any run of whitespace (including
+none), and matching is case-insensitive. Everything derived from the table is
+built once at import time.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Union
+import re
+
+
+Number = Union[int, float]
+
+DECIMAL = r"[0-9]+(?:\.[0-9]+)?"
+COUNT = r"[0-9,]+"
+
+
+@dataclass(frozen=True)
+class Analyte:
+    key: str
+    # Display name used in normalized output.
+    name: str
+    # Label used in canonical raw strings, e.g. "Platelet 250000 /uL".
+    label: str
+    aliases: Tuple[str, ...]
+    units: Tuple[str, ...]
+    unit: str
+    ref_low: Number
+    ref_high: Number
+    value_pattern: str = DECIMAL
+    # Rule-based explanation text keyed by status ("low" / "high").
+    explanations: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def strip_commas(self) -> bool:
+        return self.value_pattern == COUNT
+
+
+ANALYTES: Tuple[Analyte, ...] = (
+    Analyte(
+        "hemoglobin", "Hemoglobin", "Hemoglobin",
+        aliases=("Hemoglobin",), units=("g/dL", "gdL"), unit="g/dL",
+        ref_low=12.0, ref_high=15.0,
+        explanations={"low": "Low hemoglobin may relate to anemia."},
+    ),
+    Analyte(
+        "wbc", "WBC", "WBC",
+        aliases=("WBC Count", "WBC"), units=("/uL", "uL"), unit="/uL",
+        ref_low=4000, ref_high=11000, value_pattern=COUNT,
+        explanations={"high": "High WBC can occur with infections."},
+    ),
+    Analyte(
+        "rbc", "RBC", "RBC",
+        aliases=("RBC Count", "RBC"), units=("million /uL", "million uL", "/uL", "uL"), unit="million/uL",
+        ref_low=4.5, ref_high=5.9,
+    ),
+    Analyte(
+        "platelet", "Platelet Count", "Platelet",
+        aliases=("Platelet Count", "Platelet"), units=("/uL", "uL"), unit="/uL",
+        ref_low=150000, ref_high=450000, value_pattern=COUNT,
+    ),
+    Analyte(
+        "hematocrit", "Hematocrit", "Hematocrit",
+        aliases=("Hematocrit",), units=("%",), unit="%",
+        ref_low=36, ref_high=46,
+    ),
+    Analyte(
+        "mcv", "MCV", "MCV",
+        aliases=("MCV",), units=("fL",), unit="fL",
+        ref_low=80, ref_high=100,
+    ),
+    Analyte(
+        "mch", "MCH", "MCH",
+        aliases=("MCH",), units=("pg",), unit="pg",
+        ref_low=27, ref_high=33,
+    ),
+    Analyte(
+        "mchc", "MCHC", "MCHC",
+        aliases=("MCHC",), units=("g/dL", "gdL"), unit="g/dL",
+        ref_low=32, ref_high=36,
+    ),
+)
+
+BY_KEY: Dict[str, Analyte] = {a.key: a for a in ANALYTES}
+BY_NAME: Dict[str, Analyte] = {a.name: a for a in ANALYTES}
+
+
+def phrase_pattern(phrase: str) -> str:
+    """Regex for a registry phrase: literal text, any whitespace between words."""
+    return r"\s*".join(re.escape(word) for word in phrase.split())
+
+
+def anchor_of(phrase: str) -> str:
+    """Lowercased literal prefix of a phrase used to locate candidates quickly."""
+    return phrase.split()[0].lower()
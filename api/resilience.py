@@ -0,0 +1,197 @@
+"""Deadlines, retries, a circuit breaker and call coalescing for outbound provider calls."""
+from typing import Callable, Dict, Hashable, Optional, Tuple, Type, TypeVar
+import random
+import threading
+import time
+
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class Deadline:
+    """Wall-clock budget shared by every provider call made for one request."""
+
+    def __init__(self, seconds: Optional[float]):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0.0
+
+    def cap(self, timeout: float) -> float:
+        """Per-call timeout, never longer than what is left of the budget."""
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, calls are rejected without touching the provider. After
+    ``reset_timeout`` seconds a single trial call is let through (half-open);
+    its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            state = self._state
+            if state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                state = self.HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "rejected": self.rejected,
+            }
+
+
+def call_with_retries(
+    fn: Callable[[float], T],
+    *,
+    timeout: float,
+    retries: int,
+    backoff: float,
+    retry_on: Tuple[Type[BaseException], ...],
+    deadline: Optional[Deadline] = None,
+    breaker: Optional[CircuitBreaker] = None,
+) -> T:
+    """Call ``fn(timeout)`` with bounded, jittered retries inside a deadline.
+
+    Only exceptions in ``retry_on`` are retried and counted as breaker
+    failures; anything else (bad request, bad JSON) propagates immediately.
+    """
+    deadline = deadline or Deadline(None)
+    if deadline.expired:
+        raise DeadlineExceeded("deadline_exceeded")
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpen("circuit_open")
+    attempt = 0
+    while True:
+        try:
+            result = fn(deadline.cap(timeout))
+        except retry_on:
+            attempt += 1
+            # Full jitter: sleep a random fraction of the exponential step.
+            delay = random.uniform(0, backoff * (2 ** (attempt - 1)))
+            remaining = deadline.remaining()
+            if attempt > retries or (remaining is not None and delay >= remaining):
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            time.sleep(delay)
+            continue
+        except Exception:
+            # The provider answered (e.g. 400/401); that is not an outage.
+            if breaker is not None:
+                breaker.record_success()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one.
+
+    The first caller for a key (the leader) runs ``fn``; callers that arrive
+    while it is in flight wait for it and get its result or exception. A
+    follower waits no longer than its own deadline. Nothing is remembered
+    once the call finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T], deadline: Optional[Deadline] = None) -> Tuple[T, bool]:
+        """``(result, shared)``; ``shared`` is True when another caller's call was reused."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            try:
+                flight.result = fn()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+            return flight.result, False
+        if not flight.done.wait((deadline or Deadline(None)).remaining()):
+            raise DeadlineExceeded("deadline_exceeded")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, True
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,294 @@
+"""Compact result types for normalized tests and their JSON serialization.
+
+``LabResult`` is a read-only mapping with ``__slots__``, so code that treats
+a test as a dict (``t.get("status")``, ``t["name"]``) keeps working while a
+test costs a fraction of a dict plus a nested ``ref_range`` dict. Reference
+ranges are interned: every Hemoglobin result shares one ``RefRange``.
+
+``ResultColumns`` stores many results as typed arrays for batch workloads:
+``/api/process/batch`` keeps finished reports in one while they wait for
+their turn in the output and for the bulk history write, and
+``simplify_reports`` workers return a chunk's results in one. ``dumps``
+serializes payloads with orjson when it is installed.
+"""
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import math
+import sys
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is the fallback
+    orjson = None
+
+
+class RefRange(Mapping):
+    __slots__ = ("low", "high")
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def __getitem__(self, key):
+        if key == "low":
+            return self.low
+        if key == "high":
+            return self.high
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return self.low if key == "low" else self.high if key == "high" else default
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("low", "high"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __eq__(self, other):
+        if isinstance(other, RefRange):
+            return self.low == other.low and self.high == other.high
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self):
+        return hash((self.low, self.high))
+
+    def __reduce__(self):
+        return ref_range, (self.low, self.high)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f"RefRange(low={self.low!r}, high={self.high!r})"
+
+    def to_dict(self) -> Dict:
+        return {"low": self.low, "high": self.high}
+
+
+_REF_RANGES: Dict[Tuple, RefRange] = {}
+
+
+def ref_range(low, high) -> RefRange:
+    """The shared ``RefRange`` for ``(low, high)``."""
+    key = (low, high)
+    found = _REF_RANGES.get(key)
+    if found is None:
+        found = _REF_RANGES.setdefault(key, RefRange(low, high))
+    return found
+
+
+_FIELDS = ("name", "value", "unit", "status", "ref_range", "severity")
+# Left out of the serialized form when None.
+_OPTIONAL = frozenset(("ref_range", "severity"))
+
+
+class LabResult(Mapping):
+    """One normalized test. Serializes like the dict it replaces;
+    ``ref_range`` and ``severity`` are omitted when unknown."""
+
+    __slots__ = _FIELDS
+
+    def __init__(
+        self,
+        name: str,
+        value: float,
+        unit: str,
+        status: str,
+        ref_range: Optional[RefRange] = None,
+        severity: Optional[float] = None,
+    ):
+        self.name = name
+        self.value = value
+        self.unit = unit
+        self.status = sys.intern(status)
+        self.ref_range = ref_range
+        self.severity = severity
+
+    def __getitem__(self, key):
+        if key in _FIELDS:
+            value = getattr(self, key)
+            if value is not None or key not in _OPTIONAL:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELDS:
+            value = getattr(self, key)
+            return default if value is None and key in _OPTIONAL else value
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        return (f for f in _FIELDS if f not in _OPTIONAL or getattr(self, f) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if isinstance(other, LabResult):
+            return self._astuple() == other._astuple()
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return LabResult, self._astuple()
+
+    # Immutable by convention, so copies (batch lines, cache hits) can share it.
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return "LabResult(" + ", ".join(f"{f}={getattr(self, f)!r}" for f in _FIELDS) + ")"
+
+    def _astuple(self) -> Tuple:
+        return self.name, self.value, self.unit, self.status, self.ref_range, self.severity
+
+    def to_dict(self) -> Dict:
+        data = {"name": self.name, "value": self.value, "unit": self.unit, "status": self.status}
+        if self.ref_range is not None:
+            data["ref_range"] = {"low": self.ref_range.low, "high": self.ref_range.high}
+        if self.severity is not None:
+            data["severity"] = self.severity
+        return data
+
+
+class ResultColumns:
+    """Array-backed storage for many ``LabResult``s (e.g. a whole batch).
+
+    Values are a ``double`` array; names, units, statuses and reference ranges
+    are small integer codes into shared tables, so each stored test costs
+    about 26 bytes instead of two dicts.
+    """
+
+    __slots__ = (
+        "_values", "_names", "_units", "_statuses", "_refs", "_severities",
+        "_strings", "_codes", "_ranges", "_range_codes",
+    )
+
+    def __init__(self, results: Iterable[Mapping] = ()):
+        self._values = array("d")
+        self._names = array("I")
+        self._units = array("I")
+        self._statuses = array("I")
+        self._refs = array("H")
+        self._severities = array("f")
+        self._strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+        # Code 0 means "no reference range".
+        self._ranges: List[Optional[RefRange]] = [None]
+        self._range_codes: Dict[RefRange, int] = {}
+        self.extend(results)
+
+    def _code(self, text: str) -> int:
+        code = self._codes.get(text)
+        if code is None:
+            code = self._codes[text] = len(self._strings)
+            self._strings.append(text)
+        return code
+
+    def _range_code(self, ref) -> int:
+        if ref is None:
+            return 0
+        if not isinstance(ref, RefRange):
+            ref = ref_range(ref.get("low"), ref.get("high"))
+        code = self._range_codes.get(ref)
+        if code is None:
+            code = self._range_codes[ref] = len(self._ranges)
+            self._ranges.append(ref)
+        return code
+
+    def append(self, result: Mapping) -> None:
+        value = result.get("value")
+        self._values.append(math.nan if value is None else value)
+        self._names.append(self._code(result.get("name") or ""))
+        self._units.append(self._code(result.get("unit") or ""))
+        self._statuses.append(self._code(result.get("status") or ""))
+        self._refs.append(self._range_code(result.get("ref_range")))
+        severity = result.get("severity")
+        self._severities.append(math.nan if severity is None else severity)
+
+    def extend(self, results: Iterable[Mapping]) -> None:
+        for result in results:
+            self.append(result)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = self._values[index]
+        severity = self._severities[index]
+        strings = self._strings
+        return LabResult(
+            strings[self._names[index]],
+            None if math.isnan(value) else value,
+            strings[self._units[index]],
+            strings[self._statuses[index]],
+            self._ranges[self._refs[index]],
+            None if math.isnan(severity) else round(severity, 2),
+        )
+
+    def __iter__(self) -> Iterator[LabResult]:
+        return (self[i] for i in range(len(self)))
+
+    def pack(self, payload: Dict) -> Dict:
+        """``payload`` with its ``tests`` stored here, replaced by their slice."""
+        tests = payload.get("tests")
+        if tests is None:
+            return payload
+        start = len(self)
+        self.extend(tests)
+        return {**payload, "tests": slice(start, len(self))}
+
+    def unpack(self, payload: Dict) -> Dict:
+        """A ``pack``ed payload with its ``tests`` as ``LabResult``s again."""
+        tests = payload.get("tests")
+        if not isinstance(tests, slice):
+            return payload
+        return {**payload, "tests": self[tests]}
+
+    def status_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for code in self._statuses:
+            status = self._strings[code]
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    @property
+    def nbytes(self) -> int:
+        columns = (self._values, self._names, self._units, self._statuses, self._refs, self._severities)
+        return sum(col.itemsize * len(col) for col in columns)
+
+
+# -- serialization -------------------------------------------------------------
+
+class ResultEncoder(DjangoJSONEncoder):
+    """``DjangoJSONEncoder`` that also understands the result types."""
+
+    def default(self, o):
+        if isinstance(o, (LabResult, RefRange)):
+            return o.to_dict()
+        return super().default(o)
+
+
+_django_default = ResultEncoder().default
+
+
+def dumps(obj) -> bytes:
+    """JSON-encode a payload; orjson when installed, else the stdlib encoder."""
+    if orjson is not None:
+        # Datetimes go through Django's encoder so both paths format them alike.
+        return orjson.dumps(obj, default=_django_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, cls=ResultEncoder).encode("utf-8")
@@ -0,0 +1,64 @@
+"""Helpers for re-processing a corrected report against a previous result."""
+from typing import Dict, FrozenSet, List, Tuple
+import difflib
+
+from . import registry
+from .validation import SourceIndex
+
+
+def changed_lines(previous_text: str, text: str) -> List[str]:
+    """Lines of ``text`` that were inserted or replaced relative to ``previous_text``."""
+    old, new = previous_text.splitlines(), text.splitlines()
+    lines: List[str] = []
+    for tag, _, _, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag in ("replace", "insert"):
+            lines.extend(line for line in new[j1:j2] if line.strip())
+    return lines
+
+
+def _brief(test: Dict) -> Tuple:
+    return test.get("value"), test.get("unit"), test.get("status")
+
+
+def diff_tests(previous: List[Dict], current: List[Dict]) -> Dict:
+    before = {t.get("name"): t for t in previous if t.get("name")}
+    after = {t.get("name"): t for t in current if t.get("name")}
+    changed = [
+        {
+            "name": name,
+            "before": {"value": before[name].get("value"), "unit": before[name].get("unit"), "status": before[name].get("status")},
+            "after": {"value": test.get("value"), "unit": test.get("unit"), "status": test.get("status")},
+        }
+        for name, test in after.items()
+        if name in before and _brief(before[name]) != _brief(test)
+    ]
+    added = [name for name in after if name not in before]
+    return {
+        "added": added,
+        "removed": [name for name in before if name not in after],
+        "changed": changed,
+        "unchanged": len(after) - len(added) - len(changed),
+    }
+
+
+def abnormal_signature(tests: List[Dict]) -> FrozenSet[Tuple[str, str]]:
+    """(name, status) of every out-of-range test; the AI summary depends on nothing else."""
+    return frozenset(
+        (t.get("name"), t.get("status")) for t in tests if t.get("status") in ("low", "high")
+    )
+
+
+def has_evidence(test: Dict, index: SourceIndex) -> bool:
+    """Whether the indexed text still names the test next to the same value.
+
+    Used to keep tests from a previous result that the regex pass cannot
+    see (they came from AI extraction) when the corrected report still
+    contains them.
+    """
+    name = test.get("name") or ""
+    try:
+        value = float(test.get("value"))
+    except (TypeError, ValueError):
+        return False
+    analyte = registry.BY_NAME.get(name)
+    return index.find(analyte.aliases if analyte else [name], value) is not None
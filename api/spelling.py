@@ -0,0 +1,85 @@
+"""Symmetric-deletion (SymSpell-style) spelling correction over a small vocabulary.
+
+Every vocabulary word is indexed under each string obtained by deleting up to
+``max_distance`` of its characters. Two words within that edit distance share
+at least one such string, so a token's nearby words are found by generating
+the token's own deletions and looking each one up: a few dict lookups per
+token, independent of the vocabulary size. Candidates are then confirmed
+with the exact (optimal string alignment) distance.
+"""
+from typing import Dict, Iterator, Mapping, Optional, Set
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    """``word`` and every string with up to ``depth`` characters deleted from it."""
+    out = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+def distance(a: str, b: str) -> int:
+    """Edit distance counting an adjacent transposition as one edit."""
+    if a == b:
+        return 0
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+class SymSpell:
+    """Maps spellings (matched case-insensitively) to canonical forms, allowing typos.
+
+    ``words`` maps each known spelling to what it should be replaced with,
+    e.g. ``{"hemoglobin": "Hemoglobin", "hgh": "High"}``.
+    """
+
+    def __init__(self, words: Mapping[str, str], max_distance: int = 2):
+        self.max_distance = max_distance
+        self.words: Dict[str, str] = {w.lower(): c for w, c in words.items()}
+        self._index: Dict[str, Set[str]] = {}
+        for word in self.words:
+            for variant in _deletes(word, max_distance):
+                self._index.setdefault(variant, set()).add(word)
+
+    def __contains__(self, word: str) -> bool:
+        return word.lower() in self.words
+
+    def candidates(self, word: str, max_distance: int) -> Iterator[str]:
+        """Vocabulary words that may be within ``max_distance`` of ``word`` (lowercased)."""
+        seen: Set[str] = set()
+        for variant in _deletes(word, min(max_distance, self.max_distance)):
+            for candidate in self._index.get(variant, ()):
+                if candidate not in seen:
+                    seen.add(candidate)
+                    yield candidate
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> Optional[str]:
+        """Canonical form of the nearest word, or None when none is close enough
+        or the nearest words disagree."""
+        lowered = word.lower()
+        exact = self.words.get(lowered)
+        if exact is not None:
+            return exact
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if limit <= 0:
+            return None
+        best: Set[str] = set()
+        best_distance = limit + 1
+        for candidate in self.candidates(lowered, limit):
+            d = distance(lowered, candidate)
+            if d < best_distance:
+                best, best_distance = {self.words[candidate]}, d
+            elif d == best_distance:
+                best.add(self.words[candidate])
+        return next(iter(best)) if len(best) == 1 else None
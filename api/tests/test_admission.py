@@ -0,0 +1,91 @@
+from unittest import mock
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api import admission, views
+
+
+class ClientKeyTests(SimpleTestCase):
+    def _key(self, forwarded=None, **headers):
+        if forwarded is not None:
+            headers["X-Forwarded-For"] = forwarded
+        return admission.client_key(RequestFactory().get("/", REMOTE_ADDR="10.0.0.1", headers=headers))
+
+    @override_settings(RATE_LIMIT_TRUST_FORWARDED=0, RATE_LIMIT_CLIENT_HEADER="")
+    def test_forwarded_ignored_by_default(self):
+        self.assertEqual(self._key("1.2.3.4"), "10.0.0.1")
+
+    @override_settings(RATE_LIMIT_TRUST_FORWARDED=1, RATE_LIMIT_CLIENT_HEADER="")
+    def test_forged_entries_do_not_change_the_key(self):
+        # The proxy appends the address it saw; whatever the client sent stays left of it.
+        self.assertEqual(self._key("203.0.113.9"), "203.0.113.9")
+        self.assertEqual(self._key("6.6.6.6, 203.0.113.9"), "203.0.113.9")
+        self.assertEqual(self._key("7.7.7.7, 6.6.6.6, 203.0.113.9"), "203.0.113.9")
+
+    @override_settings(RATE_LIMIT_TRUST_FORWARDED=2, RATE_LIMIT_CLIENT_HEADER="")
+    def test_trusted_hops_count_from_the_right(self):
+        self.assertEqual(self._key("6.6.6.6, 203.0.113.9, 10.1.1.1"), "203.0.113.9")
+        # Fewer entries than trusted proxies: the header cannot be trusted.
+        self.assertEqual(self._key("203.0.113.9"), "10.0.0.1")
+
+    @override_settings(RATE_LIMIT_CLIENT_HEADER="X-Api-Key")
+    def test_client_header_wins(self):
+        self.assertEqual(self._key(**{"X-Api-Key": "abc"}), "h:abc")
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_burst_then_wait(self):
+        limiter = admission.RateLimiter(rate=1.0, burst=2)
+        with mock.patch.object(admission.time, "monotonic", return_value=100.0):
+            self.assertEqual(limiter.acquire("a"), 0.0)
+            self.assertEqual(limiter.acquire("a"), 0.0)
+            self.assertAlmostEqual(limiter.acquire("a"), 1.0)
+            # Buckets are per client.
+            self.assertEqual(limiter.acquire("b"), 0.0)
+        with mock.patch.object(admission.time, "monotonic", return_value=101.0):
+            self.assertEqual(limiter.acquire("a"), 0.0)
+
+    def test_cost_is_capped_at_the_burst(self):
+        limiter = admission.RateLimiter(rate=1.0, burst=5)
+        self.assertEqual(limiter.acquire("a", cost=50), 0.0)
+
+    def test_zero_rate_admits_everything(self):
+        limiter = admission.RateLimiter(rate=0, burst=1)
+        self.assertTrue(all(limiter.acquire("a") == 0.0 for _ in range(100)))
+
+    def test_least_recent_clients_are_dropped(self):
+        limiter = admission.RateLimiter(rate=1.0, burst=1, max_clients=2)
+        for key in ("a", "b", "c"):
+            limiter.acquire(key)
+        self.assertEqual(limiter.clients(), 2)
+
+
+class StageGateTests(SimpleTestCase):
+    def test_limit_and_force(self):
+        gate = admission.StageGate(1)
+        self.assertTrue(gate.try_acquire())
+        self.assertFalse(gate.try_acquire())
+        self.assertTrue(gate.try_acquire(force=True))
+        gate.release()
+        gate.release()
+        self.assertEqual(gate.in_use, 0)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], RESULT_CACHE_ENABLED=False, RATE_LIMIT_CLIENT_HEADER="X-Api-Key")
+class ImageUploadClientTests(SimpleTestCase):
+    async def test_image_upload_spends_the_clients_ai_quota(self):
+        ocr_result = ("Hemoglobin 10.2 g/dL (Low)", {}, {"pages": 1, "pages_ocr": 1, "early_stop": False})
+        calls = []
+
+        async def fake_process_text(*args, **kwargs):
+            calls.append(kwargs)
+            return {"status": "ok", "tests": []}, 200
+
+        upload = SimpleUploadedFile("scan.png", io.BytesIO(b"\x89PNG").getvalue(), content_type="image/png")
+        with mock.patch.object(views.ocr, "ocr_document", mock.AsyncMock(return_value=ocr_result)), \
+                mock.patch.object(views, "_process_text", fake_process_text):
+            response = await self.async_client.post("/api/process", {"image": upload}, headers={"X-Api-Key": "k1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(calls[0]["client"], "h:k1")
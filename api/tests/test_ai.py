@@ -0,0 +1,60 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api import ai, cache, views
+from api.resilience import CircuitOpen, Deadline
+
+
+_REPORT = "Hemoglobin: 10.2 g/dL\nFerritin level 95 ng/mL measured"
+
+
+@override_settings(AI_EXTRACT_POLICY="always", AI_SUMMARY_POLICY="never")
+class AIExtractErrorTests(SimpleTestCase):
+    def _process(self):
+        return asyncio.run(views._process_text(_REPORT, None, {}, Deadline(5.0), client=None))
+
+    def test_provider_failure_raises(self):
+        with mock.patch.object(ai, "_has_groq_key", return_value=True), \
+                mock.patch.object(ai, "_chat", side_effect=CircuitOpen("circuit_open")):
+            with self.assertRaises(ai.AIExtractError):
+                ai.extract_tests_ai(_REPORT)
+
+    def test_missing_key_finds_nothing(self):
+        with mock.patch.object(ai, "_has_groq_key", return_value=False):
+            self.assertEqual(ai.extract_tests_ai(_REPORT), ([], 0.0))
+
+    def test_failed_extraction_is_reported_and_not_cached(self):
+        with mock.patch.object(ai, "_has_groq_key", return_value=True), \
+                mock.patch.object(ai, "_chat", side_effect=TimeoutError("timed out")):
+            payload, status = self._process()
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["meta"]["ai_extract_error"], "timed out")
+        self.assertTrue(payload["tests"])
+        self.assertFalse(cache._cacheable(payload, status))
+
+    def test_empty_extraction_is_cached(self):
+        with mock.patch.object(ai, "_has_groq_key", return_value=True), \
+                mock.patch.object(ai, "_chat", return_value='{"tests_raw": []}'):
+            payload, status = self._process()
+        self.assertNotIn("ai_extract_error", payload["meta"])
+        self.assertTrue(cache._cacheable(payload, status))
+
+
+@override_settings(AI_SUMMARY_POLICY="always")
+class SummaryCallCountTests(SimpleTestCase):
+    def test_shared_batch_summary_is_counted_once(self):
+        tests = [{"name": "Hemoglobin", "value": 10.2, "unit": "g/dL", "status": "low"}]
+        ai_out = {"_used": True, "summary": "Low hemoglobin.", "explanations": []}
+
+        async def run():
+            group = {}
+            for _ in range(3):
+                await views._summarize(tests, {}, Deadline(5.0), summary_group=group)
+
+        before = views.metrics.AI_CALLS._values.get(("summary",), 0.0)
+        with mock.patch.object(views, "summarize_with_ai", return_value=ai_out) as summarize:
+            asyncio.run(run())
+        summarize.assert_called_once()
+        self.assertEqual(views.metrics.AI_CALLS._values.get(("summary",), 0.0) - before, 1)
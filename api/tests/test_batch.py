@@ -0,0 +1,41 @@
+from unittest import mock
+import json
+
+from django.test import SimpleTestCase, override_settings
+
+from api import classify, views
+
+
+_PANEL = (
+    "Hemoglobin: {hb} g/dL\nHematocrit: 40 %\nRBC: 4.5 million/uL\nWBC: {wbc} /uL\n"
+    "Platelets: 250000 /uL\nMCV: 88 fL\nMCH: 29 pg\nMCHC: 33 g/dL\n"
+)
+
+
+def _report(i):
+    return {
+        "id": f"r{i}",
+        "text": _PANEL.format(hb=9 + i % 8, wbc=3000 + 250 * i),
+        "patient": {"sex": "MF"[i % 2], "age": 20 + i},
+    }
+
+
+@override_settings(
+    ALLOWED_HOSTS=["testserver"], RESULT_CACHE_ENABLED=False, RATE_LIMIT_PER_SECOND=0,
+    AI_EXTRACT_POLICY="never", AI_SUMMARY_POLICY="never",
+)
+class BatchClassificationTests(SimpleTestCase):
+    async def test_batch_classifies_all_reports_in_one_evaluate_call(self):
+        reports = [_report(i) for i in range(40)]
+        self.assertGreaterEqual(8 * len(reports), classify.VECTOR_MIN)
+        with mock.patch.object(classify, "evaluate", wraps=classify.evaluate) as evaluate:
+            response = await self.async_client.post("/api/process/batch", json.dumps(reports), content_type="application/json")
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        lines = [json.loads(line) for line in body.splitlines()]
+        evaluate.assert_called_once()
+        self.assertEqual([line["id"] for line in lines], [r["id"] for r in reports])
+        for report, line in zip(reports, lines):
+            tests, _ = views._normalize_tests(
+                views._extract_tests_raw(report["text"])[0], classify.parse_patient(report["patient"]),
+            )
+            self.assertEqual(line["tests"], json.loads(views.results.dumps(tests)))
@@ -0,0 +1,71 @@
+from unittest import mock
+import math
+import random
+
+from django.test import SimpleTestCase
+
+from api import classify, registry
+
+
+class ClassifyValuesTests(SimpleTestCase):
+    def test_scalar_path_matches_evaluate(self):
+        rng = random.Random(0)
+        codes = [rng.randrange(len(registry.ANALYTES)) for _ in range(200)]
+        values = []
+        for code in codes:
+            a = registry.ANALYTES[code]
+            values.append(rng.uniform(a.ref_low * 0.5, a.ref_high * 1.5))
+        for sex in classify.SEXES.values():
+            for age in (math.nan, 0.7, 5, 12, 45):
+                with self.subTest(sex=sex, age=age):
+                    statuses, severities, ranges = classify.classify_values(codes, values, sex, age)
+                    expected = classify.evaluate(codes, values, sex, age)
+                    self.assertEqual(statuses, expected.status.tolist())
+                    for got, want in zip(severities, expected.severity.tolist()):
+                        self.assertAlmostEqual(got, want, places=12)
+                    self.assertEqual(ranges, expected.ref_range.tolist())
+
+    def test_large_inputs_use_numpy(self):
+        code = classify.CODES["hemoglobin"]
+        n = classify.VECTOR_MIN
+        statuses, _, _ = classify.classify_values([code] * n, [5.0] * n)
+        self.assertEqual(set(statuses), {classify.LOW})
+
+    def test_age_and_sex_select_the_range(self):
+        code = classify.CODES["hemoglobin"]
+        self.assertEqual(classify.classify_values([code], [13.0], 1, 40)[0], [classify.LOW])
+        self.assertEqual(classify.classify_values([code], [13.0], 2, 40)[0], [classify.NORMAL])
+
+
+class ClassifyReportsTests(SimpleTestCase):
+    def _reports(self, count):
+        rng = random.Random(1)
+        reports = []
+        for i in range(count):
+            codes = [rng.randrange(len(registry.ANALYTES)) for _ in range(rng.randint(0, 12))]
+            values = [rng.uniform(registry.ANALYTES[c].ref_low * 0.5, registry.ANALYTES[c].ref_high * 1.5) for c in codes]
+            sex = list(classify.SEXES.values())[i % 3]
+            age = (math.nan, 0.7, 5, 45)[i % 4]
+            reports.append((codes, values, sex, age))
+        return reports
+
+    def test_batch_is_one_evaluate_call_split_per_report(self):
+        reports = self._reports(80)
+        self.assertGreaterEqual(sum(len(r[0]) for r in reports), classify.VECTOR_MIN)
+        with mock.patch.object(classify, "evaluate", wraps=classify.evaluate) as evaluate:
+            batched = classify.classify_reports(reports)
+        evaluate.assert_called_once()
+        self.assertEqual(len(batched), len(reports))
+        for report, (statuses, severities, ranges) in zip(reports, batched):
+            expected = classify.classify_values(*report)
+            self.assertEqual(statuses, expected[0])
+            self.assertEqual(ranges, expected[2])
+            for got, want in zip(severities, expected[1]):
+                self.assertAlmostEqual(got, want, places=12)
+
+    def test_small_batches_skip_numpy(self):
+        with mock.patch.object(classify, "evaluate") as evaluate:
+            batched = classify.classify_reports(self._reports(3))
+        evaluate.assert_not_called()
+        self.assertEqual(len(batched), 3)
+        self.assertEqual(classify.classify_reports([]), [])
@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase
+
+from api import extraction
+
+
+def _found(text):
+    return [(m.key, m.value) for m in extraction.scan(extraction.simple_ocr_text_cleanup(text))]
+
+
+class OCRCorrectionTests(SimpleTestCase):
+    def test_known_glyph_confusions_are_fixed(self):
+        self.assertEqual(_found("W8C 5000 /uL"), [("wbc", "5000")])
+        self.assertEqual(_found("WBG 11,200 /uL"), [("wbc", "11200")])
+        self.assertEqual(_found("R8C 4.5 million/uL"), [("rbc", "4.5")])
+
+    def test_misspelled_names_are_fixed(self):
+        self.assertEqual(_found("Hemoglobn 10.2 g/dL"), [("hemoglobin", "10.2")])
+        self.assertEqual(_found("Hernatocrit 41 %"), [("hematocrit", "41")])
+        self.assertEqual(_found("Platelel Count 250,000 /uL"), [("platelet", "250000")])
+
+    def test_other_lab_acronyms_are_left_alone(self):
+        for text in ("MPV 10.2 fL", "MPV 10.2 fL (Low)", "PCV 40 %", "RDW 13.1 %", "PDW 12 fL", "NRBC 0.1 million/uL"):
+            with self.subTest(text=text):
+                self.assertEqual(extraction.simple_ocr_text_cleanup(text), text)
+                self.assertEqual(_found(text), [])
+
+    def test_three_letter_tokens_are_not_fuzzy_matched(self):
+        for word in ("MCG", "MCY", "WBX", "ABC"):
+            with self.subTest(word=word):
+                self.assertEqual(extraction.simple_ocr_text_cleanup(f"{word} 30 pg"), f"{word} 30 pg")
+
+    def test_anchor_does_not_match_inside_a_word(self):
+        self.assertEqual(_found("Hemoglobin 10 g/dL\nNRBC 0.1 /uL\nRBC 4.5 million/uL"),
+                         [("hemoglobin", "10"), ("rbc", "4.5")])
+
+    def test_ordinary_words_are_not_rewritten(self):
+        for text in ("Mount Sinai Hospital", "much better now", "Amount 5"):
+            with self.subTest(text=text):
+                self.assertEqual(extraction.simple_ocr_text_cleanup(text), text)
+
+    def test_status_is_only_fixed_in_parentheses(self):
+        self.assertEqual(extraction.simple_ocr_text_cleanup("Hemoglobin 9 g/dL (Hihg)"), "Hemoglobin 9 g/dL (High)")
+        self.assertEqual(extraction.simple_ocr_text_cleanup("Seen now"), "Seen now")
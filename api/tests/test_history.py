@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+import json
+
+from django.test import TestCase, override_settings
+
+from api import history
+from api.models import LabValue, PatientReport
+
+
+_TESTS = [{"name": "Hemoglobin", "value": 10.2, "unit": "g/dL", "status": "low"}]
+
+
+class RecordTests(TestCase):
+    def test_report_without_collected_at_is_stored_once(self):
+        target = history.parse_target("p1")
+        self.assertIsNone(target.collected_at)
+        first = history.record(target, "key-1", _TESTS)
+        again = history.record(history.parse_target("p1"), "key-1", _TESTS)
+        self.assertFalse(first.duplicate)
+        self.assertTrue(again.duplicate)
+        self.assertEqual(again.report_id, first.report_id)
+        self.assertEqual(PatientReport.objects.count(), 1)
+        self.assertEqual(LabValue.objects.count(), 1)
+
+    def test_untimed_resubmission_matches_a_timed_report(self):
+        when = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        first = history.record(history.Target("p1", when), "key-1", _TESTS)
+        again = history.record(history.parse_target("p1"), "key-1", _TESTS)
+        self.assertTrue(again.duplicate)
+        self.assertEqual(again.report_id, first.report_id)
+
+    def test_same_report_at_another_time_is_stored(self):
+        history.record(history.parse_target("p1", "2024-03-01"), "key-1", _TESTS)
+        later = history.record(history.parse_target("p1", "2024-04-01"), "key-1", _TESTS)
+        self.assertFalse(later.duplicate)
+        self.assertEqual(PatientReport.objects.count(), 2)
+
+    def test_untimed_target_survives_a_job_round_trip(self):
+        target = history.parse_target("p1")
+        self.assertEqual(history.target_from_json(target.to_json()), target)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], HISTORY_API_KEYS=["secret-key"], RESULT_CACHE_ENABLED=False)
+class HistoryAuthTests(TestCase):
+    def _process(self, headers=None):
+        return self.client.post(
+            "/api/process", json.dumps({"text": "Hemoglobin 10.2 g/dL (Low)", "patient_id": "p1"}),
+            content_type="application/json", headers=headers or {},
+        )
+
+    def test_trends_need_a_key(self):
+        self.assertEqual(self.client.get("/api/patients/p1/trends").status_code, 403)
+        self.assertEqual(self.client.get("/api/patients/p1/trends", headers={"X-API-Key": "wrong"}).status_code, 403)
+        response = self.client.get("/api/patients/p1/trends", headers={"Authorization": "Bearer secret-key"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_storing_history_needs_a_key(self):
+        self.assertEqual(self._process().status_code, 403)
+        self.assertEqual(PatientReport.objects.count(), 0)
+        response = self._process({"X-API-Key": "secret-key"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PatientReport.objects.count(), 1)
+
+    def test_batch_with_patient_ids_needs_a_key(self):
+        body = json.dumps([{"text": "Hemoglobin 10.2 g/dL", "patient_id": "p1"}])
+        response = self.client.post("/api/process/batch", body, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_requests_without_patient_id_need_no_key(self):
+        response = self.client.post("/api/process", json.dumps({"text": "Hemoglobin 10.2 g/dL"}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(HISTORY_API_KEYS=[])
+    def test_history_is_off_without_configured_keys(self):
+        response = self.client.get("/api/patients/p1/trends", headers={"Authorization": "Bearer "})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,64 @@
+from unittest import mock
+import asyncio
+import os
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+
+from api import jobs, ocr
+from api.models import Job
+
+
+_IMAGE = b"\x89PNG\r\n\x1a\n" + b"\0" * 4096
+
+
+@override_settings(JOBS_EMBEDDED_WORKER=False, ALLOWED_HOSTS=["testserver"], RATE_LIMIT_PER_SECOND=0, RESULT_CACHE_ENABLED=False)
+class ImageJobTests(TransactionTestCase):
+    def setUp(self):
+        self.upload_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.upload_dir.cleanup)
+        settings_override = override_settings(JOBS_UPLOAD_DIR=self.upload_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _create(self) -> Job:
+        response = self.client.post("/api/jobs", {"image": SimpleUploadedFile("report.png", _IMAGE)})
+        self.assertEqual(response.status_code, 202)
+        return Job.objects.get(pk=response.json()["id"])
+
+    def _run(self, job: Job) -> None:
+        # As ``jobs._claim`` leaves it.
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, attempts=1)
+
+        async def run():
+            worker = jobs.JobWorker()
+            worker._ocr_slots = asyncio.Semaphore(1)
+            worker._ai_slots = asyncio.Semaphore(1)
+            await worker._run(job)
+
+        asyncio.run(run())
+
+    def test_upload_is_kept_as_a_file(self):
+        job = self._create()
+        self.assertEqual(os.path.dirname(job.image_path), self.upload_dir.name)
+        with open(job.image_path, "rb") as fh:
+            self.assertEqual(fh.read(), _IMAGE)
+
+    def test_worker_ocrs_the_file_and_deletes_it(self):
+        job = self._create()
+        ocr_result = ("Hemoglobin: 10.2 g/dL", {}, {"pages": 1})
+        with mock.patch.object(ocr, "ocr_document", new=mock.AsyncMock(return_value=ocr_result)) as ocr_document:
+            self._run(job)
+        ocr_document.assert_awaited_once_with(job.image_path, partial=False)
+        self.assertFalse(os.path.exists(job.image_path))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.image_path), (Job.DONE, ""))
+
+    def test_busy_ocr_keeps_the_file_for_the_retry(self):
+        job = self._create()
+        with mock.patch.object(ocr, "ocr_document", new=mock.AsyncMock(side_effect=ocr.OCRBusy("busy"))):
+            self._run(job)
+        self.assertTrue(os.path.exists(job.image_path))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
@@ -0,0 +1,59 @@
+from concurrent.futures import Future
+from unittest import mock
+import asyncio
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from api import ocr
+
+
+class OCRDocumentTests(SimpleTestCase):
+    def test_page_count_runs_off_the_event_loop(self):
+        threads = []
+
+        def page_count(data, config=None):
+            threads.append(threading.get_ident())
+            raise ocr.ImageTooLarge("document has 99 pages, limit is 20")
+
+        async def run():
+            threads.append(threading.get_ident())
+            await ocr.ocr_document(b"image")
+
+        with mock.patch.object(ocr, "page_count", side_effect=page_count), \
+                mock.patch.object(ocr, "_submit") as submit:
+            with self.assertRaises(ocr.ImageTooLarge):
+                asyncio.run(run())
+        submit.assert_not_called()
+        loop_thread, count_thread = threads
+        self.assertNotEqual(count_thread, loop_thread)
+
+    def _saturated_after_first_page(self):
+        # Page 0 is accepted and finishes; the pool is full for every page after it.
+        def submit(fn, data, page, config):
+            if page:
+                raise ocr.OCRBusy()
+            future = Future()
+            future.set_result(("Hemoglobin: 10.2 g/dL", {"ocr_tesseract": 1.0}))
+            return future
+        return mock.patch.object(ocr, "_submit", side_effect=submit)
+
+    @override_settings(OCR_WORKERS=1)
+    def test_saturated_pool_returns_pages_already_read(self):
+        with mock.patch.object(ocr, "page_count", return_value=3), self._saturated_after_first_page():
+            text, timings, info = asyncio.run(ocr.ocr_document(b"image"))
+        self.assertIn("Hemoglobin", text)
+        self.assertEqual(timings, {"ocr_tesseract": 1.0})
+        self.assertEqual(info, {"pages": 3, "pages_ocr": 1, "early_stop": False, "truncated": True})
+
+    @override_settings(OCR_WORKERS=1)
+    def test_saturated_pool_raises_without_partial(self):
+        with mock.patch.object(ocr, "page_count", return_value=3), self._saturated_after_first_page():
+            with self.assertRaises(ocr.OCRBusy):
+                asyncio.run(ocr.ocr_document(b"image", partial=False))
+
+    def test_saturated_pool_raises_before_the_first_page(self):
+        with mock.patch.object(ocr, "page_count", return_value=3), \
+                mock.patch.object(ocr, "_submit", side_effect=ocr.OCRBusy()):
+            with self.assertRaises(ocr.OCRBusy):
+                asyncio.run(ocr.ocr_document(b"image"))
@@ -0,0 +1,19 @@
+from django.test import SimpleTestCase, override_settings
+
+
+@override_settings(
+    ALLOWED_HOSTS=["testserver"], RESULT_CACHE_ENABLED=False, RATE_LIMIT_PER_SECOND=0,
+    AI_EXTRACT_POLICY="never", AI_SUMMARY_POLICY="never",
+)
+class ProcessJSONTests(SimpleTestCase):
+    def test_non_object_body_is_a_400(self):
+        for body in ("[1, 2]", '"Hemoglobin: 10.2 g/dL"', "3", "null"):
+            with self.subTest(body=body):
+                response = self.client.post("/api/process", body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["error"], "invalid_json")
+
+    def test_object_body_is_processed(self):
+        response = self.client.post("/api/process", {"text": "Hemoglobin: 10.2 g/dL"}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tests"][0]["name"], "Hemoglobin")
@@ -0,0 +1,268 @@
+from unittest import mock
+import os
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from api import ai, resilience
+from api.resilience import CircuitBreaker, CircuitOpen, Deadline, DeadlineExceeded, SingleFlight, call_with_retries
+from benchmarks import groq_stub
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DeadlineTests(SimpleTestCase):
+    def test_cap_is_bounded_by_the_remaining_budget(self):
+        clock = _Clock()
+        with mock.patch.object(resilience.time, "monotonic", clock):
+            deadline = Deadline(5.0)
+            self.assertEqual(deadline.cap(10.0), 5.0)
+            clock.now += 4.0
+            self.assertEqual(deadline.cap(10.0), 1.0)
+            self.assertFalse(deadline.expired)
+            clock.now += 2.0
+            self.assertEqual(deadline.remaining(), 0.0)
+            self.assertTrue(deadline.expired)
+
+    def test_no_budget(self):
+        deadline = Deadline(None)
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(deadline.cap(3.0), 3.0)
+        self.assertFalse(deadline.expired)
+
+
+class RetryTests(SimpleTestCase):
+    def setUp(self):
+        # Full jitter: pick the top of each step so the schedule is visible.
+        uniform = mock.patch.object(resilience.random, "uniform", side_effect=lambda low, high: high)
+        self.uniform = uniform.start()
+        self.addCleanup(uniform.stop)
+        sleep = mock.patch.object(resilience.time, "sleep")
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def _flaky(self, failures: int, error=TimeoutError):
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            if len(calls) <= failures:
+                raise error("boom")
+            return "ok"
+
+        return fn, calls
+
+    def test_retries_with_exponential_jittered_backoff(self):
+        fn, calls = self._flaky(2)
+        result = call_with_retries(fn, timeout=2.0, retries=3, backoff=0.5, retry_on=(TimeoutError,))
+        self.assertEqual(result, "ok")
+        self.assertEqual(calls, [2.0, 2.0, 2.0])
+        self.assertEqual([c.args for c in self.uniform.call_args_list], [(0, 0.5), (0, 1.0)])
+        self.assertEqual([c.args for c in self.sleep.call_args_list], [(0.5,), (1.0,)])
+
+    def test_gives_up_after_the_retry_budget(self):
+        fn, calls = self._flaky(10)
+        breaker = CircuitBreaker(failure_threshold=5)
+        with self.assertRaises(TimeoutError):
+            call_with_retries(fn, timeout=1.0, retries=2, backoff=0.1, retry_on=(TimeoutError,), breaker=breaker)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(breaker.snapshot()["consecutive_failures"], 1)
+
+    def test_other_errors_are_not_retried_or_counted(self):
+        fn, calls = self._flaky(1, ValueError)
+        breaker = CircuitBreaker(failure_threshold=1)
+        with self.assertRaises(ValueError):
+            call_with_retries(fn, timeout=1.0, retries=3, backoff=0.1, retry_on=(TimeoutError,), breaker=breaker)
+        self.assertEqual(len(calls), 1)
+        self.sleep.assert_not_called()
+        self.assertEqual(breaker.snapshot()["state"], CircuitBreaker.CLOSED)
+
+    def test_no_retry_sleeps_past_the_deadline(self):
+        fn, calls = self._flaky(10)
+        with mock.patch.object(resilience.time, "monotonic", _Clock()):
+            with self.assertRaises(TimeoutError):
+                call_with_retries(fn, timeout=5.0, retries=5, backoff=1.0, retry_on=(TimeoutError,), deadline=Deadline(1.5))
+        # Timeouts are capped by the budget; the second backoff (2s) no longer fits.
+        self.assertEqual(calls, [1.5, 1.5])
+        self.assertEqual([c.args for c in self.sleep.call_args_list], [(1.0,)])
+
+    def test_expired_deadline_and_open_breaker_skip_the_call(self):
+        fn, calls = self._flaky(0)
+        with self.assertRaises(DeadlineExceeded):
+            call_with_retries(fn, timeout=1.0, retries=1, backoff=0.1, retry_on=(TimeoutError,), deadline=Deadline(0))
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+        with self.assertRaises(CircuitOpen):
+            call_with_retries(fn, timeout=1.0, retries=1, backoff=0.1, retry_on=(TimeoutError,), breaker=breaker)
+        self.assertEqual(calls, [])
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch.object(resilience.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0)
+
+    def _open(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.snapshot()["state"], CircuitBreaker.CLOSED)
+        self._open()
+        self.assertEqual(self.breaker.snapshot()["state"], CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.snapshot()["rejected"], 1)
+
+    def test_half_open_lets_one_trial_through(self):
+        self._open()
+        self.clock.now += 10.0
+        self.assertEqual(self.breaker.snapshot()["state"], CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.snapshot()["state"], CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self._open()
+        self.clock.now += 10.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.snapshot()["state"], CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 10.0
+        self.assertTrue(self.breaker.allow())
+
+
+class _CountingEvent(threading.Event):
+    """An Event that counts the threads that have started waiting on it."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = threading.Semaphore(0)
+
+    def wait(self, timeout=None):
+        self.waiters.release()
+        return super().wait(timeout)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def _lead(self, flights, key, result=None, error=None, followers=3):
+        """Run a leader call and ``followers`` calls that join it while it is in flight."""
+        release = threading.Event()
+        started = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            if error is not None:
+                raise error
+            return result
+
+        def run(outcomes, call):
+            try:
+                outcomes.append(flights.do(key, call))
+            except Exception as e:
+                outcomes.append(e)
+
+        leader_outcome, follower_outcomes = [], []
+        leader = threading.Thread(target=run, args=(leader_outcome, fn))
+        leader.start()
+        self.assertTrue(started.wait(5))
+        done = flights._flights[key].done = _CountingEvent()
+        threads = [threading.Thread(target=run, args=(follower_outcomes, lambda: "follower ran")) for _ in range(followers)]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            self.assertTrue(done.waiters.acquire(timeout=5))
+        release.set()
+        for thread in [leader, *threads]:
+            thread.join(5)
+        return calls, leader_outcome[0], follower_outcomes
+
+    def test_concurrent_calls_share_one_result(self):
+        flights = SingleFlight()
+        calls, leader, followers = self._lead(flights, "k", result="answer")
+        self.assertEqual(calls, [1])
+        self.assertEqual(leader, ("answer", False))
+        self.assertEqual(followers, [("answer", True)] * 3)
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_followers_get_the_leaders_error(self):
+        flights = SingleFlight()
+        error = TimeoutError("provider timed out")
+        calls, leader, followers = self._lead(flights, "k", error=error)
+        self.assertEqual(calls, [1])
+        self.assertIs(leader, error)
+        self.assertEqual(followers, [error] * 3)
+
+    def test_follower_gives_up_at_its_deadline(self):
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        leader = threading.Thread(target=flights.do, args=("k", lambda: started.set() or release.wait(5)))
+        leader.start()
+        self.assertTrue(started.wait(5))
+        with self.assertRaises(DeadlineExceeded):
+            flights.do("k", lambda: "unused", Deadline(0.01))
+        release.set()
+        leader.join(5)
+
+    def test_nothing_is_remembered(self):
+        flights = SingleFlight()
+        self.assertEqual(flights.do("k", lambda: 1), (1, False))
+        self.assertEqual(flights.do("k", lambda: 2), (2, False))
+
+
+@override_settings(AI_COALESCE=False, AI_MAX_RETRIES=1, AI_RETRY_BACKOFF=0.0, AI_CALL_TIMEOUT=5.0)
+class GroqStubTests(SimpleTestCase):
+    """``ai._chat`` against ``benchmarks.groq_stub`` over HTTP."""
+
+    def _stub(self, fail_rate: float):
+        server, state = groq_stub.serve(port=0, fail_rate=fail_rate, background=True)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address
+        for patcher in (
+            mock.patch.dict(os.environ, {"GROQ_API_KEY": "stub", "GROQ_BASE_URL": f"http://{host}:{port}"}),
+            mock.patch.object(ai, "_client", None),
+            mock.patch.object(ai, "_breaker", CircuitBreaker(failure_threshold=2, reset_timeout=60.0)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return state
+
+    def test_extraction_through_the_stub(self):
+        state = self._stub(fail_rate=0.0)
+        tests, confidence = ai.extract_tests_ai("Hemoglobin: 10.2 g/dL (Low)")
+        self.assertEqual(tests, ["Hemoglobin: 10.2 g/dL (Low)"])
+        self.assertGreater(confidence, 0)
+        self.assertEqual(state.calls, 1)
+
+    def test_outage_is_retried_then_trips_the_breaker(self):
+        from groq import InternalServerError
+
+        state = self._stub(fail_rate=1.0)
+        for _ in range(2):
+            with self.assertRaises(InternalServerError):
+                ai._chat("system", "user")
+        # One call plus one retry each.
+        self.assertEqual(state.calls, 4)
+        self.assertEqual(ai.breaker_state()["state"], CircuitBreaker.OPEN)
+        with self.assertRaises(ai.AIExtractError):
+            ai.extract_tests_ai("Hemoglobin: 10.2 g/dL")
+        self.assertEqual(state.calls, 4)
@@ -0,0 +1,36 @@
+import pickle
+
+from django.test import SimpleTestCase
+
+from api import results
+
+
+_TESTS = [
+    results.LabResult("Hemoglobin", 10.2, "g/dL", "low", results.ref_range(12.0, 15.5), 0.51),
+    results.LabResult("WBC", 7000.0, "/uL", "normal", results.ref_range(4000, 11000), 0.0),
+    results.LabResult("Ferritin", 95.0, "ng/mL", "unknown"),
+]
+
+
+class ResultColumnsTests(SimpleTestCase):
+    def test_round_trip(self):
+        columns = results.ResultColumns(_TESTS)
+        self.assertEqual(list(columns), _TESTS)
+        self.assertEqual(columns[1:], _TESTS[1:])
+        self.assertIs(columns[0].ref_range, _TESTS[0].ref_range)
+        self.assertEqual(columns.status_counts(), {"low": 1, "normal": 1, "unknown": 1})
+
+    def test_pack_and_unpack_payloads(self):
+        columns = results.ResultColumns()
+        first = columns.pack({"tests": _TESTS[:2], "status": "ok"})
+        second = columns.pack({"tests": _TESTS[2:], "status": "ok"})
+        unprocessed = columns.pack({"status": "unprocessed"})
+        self.assertEqual(first["tests"], slice(0, 2))
+        self.assertEqual(columns.unpack(second), {"tests": _TESTS[2:], "status": "ok"})
+        self.assertEqual(columns.unpack(first)["tests"], _TESTS[:2])
+        self.assertEqual(columns.unpack(unprocessed), {"status": "unprocessed"})
+
+    def test_pickle_round_trip(self):
+        # How simplify_reports workers send a chunk's results back.
+        columns = pickle.loads(pickle.dumps(results.ResultColumns(_TESTS)))
+        self.assertEqual(list(columns), _TESTS)
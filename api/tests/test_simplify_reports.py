@@ -0,0 +1,85 @@
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
+import io
+import json
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from api.management.commands import simplify_reports
+
+
+class _InlinePool:
+    """Runs submitted calls only when ``wait`` asks for one, tracking the queue length."""
+
+    def __init__(self, *args, **kwargs):
+        self.pending = []
+        self.max_pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.pending.append((future, fn, args))
+        self.max_pending = max(self.max_pending, len(self.pending))
+        return future
+
+    def wait(self, futures, return_when=None):
+        future, fn, args = self.pending.pop(0)
+        future.set_result(fn(*args))
+        return {future}, set()
+
+
+class SimplifyReportsTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.output = self.dir / "out.jsonl"
+
+    def _run(self, *inputs, workers=1, chunk_size=64):
+        pool = _InlinePool()
+        with mock.patch.object(simplify_reports, "ProcessPoolExecutor", return_value=pool), \
+                mock.patch.object(simplify_reports, "wait", pool.wait):
+            call_command(
+                "simplify_reports", *map(str, inputs), "-o", str(self.output), "--workers", str(workers),
+                "--chunk-size", str(chunk_size),
+                stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+        return pool, [json.loads(line) for line in self.output.read_text().splitlines()]
+
+    def test_reports_are_queued_in_a_bounded_window(self):
+        source = self.dir / "reports.jsonl"
+        source.write_text("".join(json.dumps({"id": f"r{i}", "text": "Hemoglobin: 10.2 g/dL"}) + "\n" for i in range(20)))
+        pool, results = self._run(source, workers=2, chunk_size=3)
+        self.assertEqual(pool.max_pending, 4)
+        self.assertEqual(sorted(r["id"] for r in results), sorted(f"r{i}" for i in range(20)))
+        self.assertTrue(all(r["http_status"] == 200 for r in results))
+
+    def test_invalid_lines_are_reported_and_skipped(self):
+        source = self.dir / "reports.jsonl"
+        source.write_text('"Hemoglobin: 10.2 g/dL"\n{not json\n[1, 2]\n3\n')
+        _, results = self._run(source)
+        by_id = {r["id"]: r for r in results}
+        self.assertEqual(by_id[f"{source}:1"]["http_status"], 200)
+        for lineno in (2, 3, 4):
+            self.assertEqual(by_id[f"{source}:{lineno}"]["reason"], "invalid_report")
+            self.assertEqual(by_id[f"{source}:{lineno}"]["http_status"], 400)
+
+    def test_torn_last_line_is_cut_off(self):
+        self.output.write_text('{"id": "a"}\n{"id": "b"')
+        self.assertEqual(simplify_reports._completed_ids(self.output), {"a"})
+        self.assertEqual(self.output.read_text(), '{"id": "a"}\n')
+
+    def test_bad_line_before_the_end_is_an_error(self):
+        self.output.write_text('{"id": "a"}\nnot json\n{"id": "c"}\n')
+        with self.assertRaisesRegex(CommandError, r":2 is not a result line"):
+            simplify_reports._completed_ids(self.output)
+        self.assertIn('"c"', self.output.read_text())
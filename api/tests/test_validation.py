@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase
+
+from api import validation
+
+
+_REPORT = (
+    "Patient: Jane  Age: 45\n"
+    "MRN 12345\n"
+    "Hemoglobin (Hb) 10.2 g/dL (Low)\n"
+    "WBC Count: 7,000 /uL\n"
+    "Ferritin level 95 ng/mL\n"
+)
+
+
+class ValidateTests(SimpleTestCase):
+    def setUp(self):
+        self.index = validation.SourceIndex(_REPORT)
+
+    def assertValid(self, candidate):
+        self.assertIsNotNone(self.index.validate(candidate), candidate)
+
+    def assertInvalid(self, candidate):
+        self.assertIsNone(self.index.validate(candidate), candidate)
+
+    def test_tests_in_the_report_validate(self):
+        for candidate in ("Hemoglobin 10.2 g/dL", "Hemoglobin 10.2", "WBC 7000 /uL", "WBC 7000", "Ferritin 95 ng/mL"):
+            with self.subTest(candidate=candidate):
+                self.assertValid(candidate)
+
+    def test_evidence_points_into_the_source(self):
+        evidence = self.index.validate("Hemoglobin 10.2 g/dL (Low)")
+        self.assertEqual(evidence.test, "Hemoglobin 10.2 g/dL (Low)")
+        self.assertEqual(_REPORT[slice(*evidence.value)], "10.2")
+        self.assertEqual(_REPORT[slice(*evidence.unit)], "g/dL")
+        self.assertEqual(_REPORT[slice(*evidence.status)], "Low")
+
+    def test_metadata_is_not_a_test(self):
+        for candidate in ("Age 45", "Age 45 years", "MRN 12345", "Patient 45"):
+            with self.subTest(candidate=candidate):
+                self.assertInvalid(candidate)
+
+    def test_name_does_not_borrow_another_labels_value(self):
+        self.assertInvalid("Jane 45")
+        self.assertInvalid("Jane 45 years")
+        self.assertIsNone(validation.SourceIndex("Ferritin  Age: 45 ng/mL").validate("Ferritin 45 ng/mL"))
+
+    def test_unitless_candidates_must_be_registry_analytes(self):
+        self.assertInvalid("Ferritin 95")
+        self.assertIsNone(validation.SourceIndex("Score 7").validate("Score 7"))
+        self.assertIsNotNone(validation.SourceIndex("Score 7 pts").validate("Score 7 pts"))
+
+    def test_unstated_status_is_dropped(self):
+        evidence = self.index.validate("Ferritin 95 ng/mL (High)")
+        self.assertEqual(evidence.test, "Ferritin 95 ng/mL")
+        self.assertIsNone(evidence.status)
+
+    def test_wrong_value_or_unit_is_refused(self):
+        self.assertInvalid("Hemoglobin 11.2 g/dL")
+        self.assertInvalid("Ferritin 95 mg/dL")
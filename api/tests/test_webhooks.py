@@ -0,0 +1,76 @@
+from unittest import mock
+import json
+import socket
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api import jobs
+
+
+def _resolves_to(*addresses):
+    return mock.patch.object(
+        jobs.socket, "getaddrinfo",
+        return_value=[(socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, 443)) for a in addresses],
+    )
+
+
+@override_settings(JOBS_WEBHOOK_ALLOWED_HOSTS=[], JOBS_WEBHOOK_ALLOW_PRIVATE=False)
+class WebhookValidationTests(SimpleTestCase):
+    def test_public_host_is_accepted(self):
+        with _resolves_to("93.184.216.34"):
+            self.assertEqual(jobs.validate_webhook_url("https://example.com/hook"), "https://example.com/hook")
+
+    def test_internal_addresses_are_refused(self):
+        for address in ("169.254.169.254", "127.0.0.1", "10.0.0.5", "192.168.1.1", "::1", "fe80::1", "0.0.0.0"):
+            with self.subTest(address=address), _resolves_to(address):
+                with self.assertRaises(jobs.InvalidWebhook):
+                    jobs.validate_webhook_url("http://hooks.example.com/")
+
+    def test_literal_metadata_address_is_refused(self):
+        with self.assertRaises(jobs.InvalidWebhook):
+            jobs.validate_webhook_url("http://169.254.169.254/latest/meta-data/")
+
+    def test_any_private_address_among_several_is_refused(self):
+        with _resolves_to("93.184.216.34", "10.1.2.3"), self.assertRaises(jobs.InvalidWebhook):
+            jobs.validate_webhook_url("https://example.com/hook")
+
+    def test_unresolvable_host_is_refused(self):
+        with mock.patch.object(jobs.socket, "getaddrinfo", side_effect=socket.gaierror), \
+                self.assertRaises(jobs.InvalidWebhook):
+            jobs.validate_webhook_url("https://nowhere.invalid/")
+
+    def test_non_http_scheme_is_refused(self):
+        with self.assertRaises(jobs.InvalidWebhook):
+            jobs.validate_webhook_url("file:///etc/passwd")
+
+    @override_settings(JOBS_WEBHOOK_ALLOWED_HOSTS=["hooks.internal"])
+    def test_allowlist(self):
+        self.assertEqual(jobs.validate_webhook_url("http://hooks.internal/x"), "http://hooks.internal/x")
+        with self.assertRaises(jobs.InvalidWebhook):
+            jobs.validate_webhook_url("https://example.com/hook")
+
+    @override_settings(JOBS_WEBHOOK_ALLOW_PRIVATE=True)
+    def test_private_addresses_allowed_when_configured(self):
+        self.assertEqual(jobs.validate_webhook_url("http://127.0.0.1:9000/"), "http://127.0.0.1:9000/")
+
+    def test_redirects_are_not_followed(self):
+        handler = jobs._NoRedirect()
+        self.assertIsNone(handler.redirect_request(None, None, 302, "Found", {}, "http://169.254.169.254/"))
+
+
+@override_settings(JOBS_EMBEDDED_WORKER=False, ALLOWED_HOSTS=["testserver"], RATE_LIMIT_PER_SECOND=0)
+class JobsCreateTests(TestCase):
+    def test_non_object_body_is_a_400(self):
+        for body in ("[1, 2]", '"text"', "3"):
+            with self.subTest(body=body):
+                response = self.client.post("/api/jobs", body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["error"], "invalid_request")
+
+    def test_internal_webhook_is_a_400(self):
+        response = self.client.post(
+            "/api/jobs", json.dumps({"text": "Hemoglobin 10 g/dL", "webhook_url": "http://169.254.169.254/"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "invalid_webhook")
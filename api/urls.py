@@ -5,6 +5,12 @@ urlpatterns = [
     path('', views.ui, name='ui'),
     path('health', views.health, name='health'),
     path('process', views.process, name='process'),
+    path('process/batch', views.process_batch, name='process_batch'),
+    path('process/revise', views.process_revise, name='process_revise'),
+    path('jobs', views.jobs_create, name='jobs'),
+    path('jobs/<uuid:job_id>', views.job_detail, name='job_detail'),
+    path('patients/<str:patient_id>/trends', views.patient_trends, name='patient_trends'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
 
 
@@ -0,0 +1,217 @@
+"""Check AI-extracted tests against the report they came from.
+
+``SourceIndex`` tokenizes the source once: words are case-folded and
+OCR-corrected, numbers are comma-stripped and keyed by value. Validating a
+candidate such as ``"Glucose 95 mg/dL (High)"`` then starts from the rarer of
+the value's and the name's occurrences and checks the tokens around each one,
+so the cost per candidate does not grow with the report. Offsets in the
+returned ``Evidence`` refer to the original source text.
+
+Report metadata is not a test: a candidate named like ``extraction._NOT_TESTS``
+("Age 45") is refused, a name may not borrow a value across another label
+("Patient: Jane  Age: 45" does not support "Jane 45"), and a candidate with
+no unit must be a registry analyte.
+"""
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import re
+
+from . import extraction, registry
+
+
+_TOKEN_RE = re.compile(r"\d[\d,]*(?:\.\d+)?|[^\W\d_]+|[%/^]")
+_CANDIDATE_RE = re.compile(
+    r"^\s*(?P<name>[^\d:]*?[^\W\d_][^\d:]*?)\s*:?\s*(?P<value>\d[\d,]*(?:\.\d+)?)\s*"
+    r"(?P<unit>[^()]*?)\s*(?:\((?P<status>low|high|normal)\))?\s*$",
+    re.IGNORECASE,
+)
+# Spellings of the same unit piece, folded before comparison.
+_UNIT_ALIASES = {"µl": "ul", "μl": "ul", "mcl": "ul", "µ": "u", "μ": "u"}
+# Tokens allowed between a name and its value, e.g. "Hemoglobin (Hb) 10.2";
+# never a number or a label (a word followed by ":", or metadata like "Age").
+_NAME_GAP = 2
+_LABEL_END_RE = re.compile(r"[ \t]*:")
+# Tokens after the value (unit included) in which a stated status must appear.
+_STATUS_WINDOW = 6
+
+
+class Token(NamedTuple):
+    text: str  # folded: lowercased, OCR-fixed, numbers without commas
+    start: int
+    end: int
+
+
+class Evidence(NamedTuple):
+    """Where a validated test was found; spans are ``(start, end)`` offsets."""
+
+    test: str  # the candidate, without a status the source does not state
+    name: Tuple[int, int]
+    value: Tuple[int, int]
+    unit: Optional[Tuple[int, int]]
+    status: Optional[Tuple[int, int]]
+
+
+@lru_cache(maxsize=8192)
+def _fold(word: str) -> str:
+    word = extraction.fix_ocr_word(word).lower()
+    return _UNIT_ALIASES.get(word, word)
+
+
+def _number(text: str) -> Optional[float]:
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _words(phrase: str) -> List[str]:
+    return [_fold(m.group(0)) for m in _TOKEN_RE.finditer(phrase)]
+
+
+def _unit_words(unit: str) -> List[str]:
+    # OCR often drops the slash ("gdL"), so slashes are not compared.
+    return [w for w in _words(unit) if w != "/"]
+
+
+# Registry analytes by the folded words of their names, labels and aliases.
+_ANALYTE_NAMES: Dict[Tuple[str, ...], registry.Analyte] = {
+    tuple(_words(phrase)): a for a in registry.ANALYTES for phrase in (a.name, a.label, *a.aliases)
+}
+
+
+class SourceIndex:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens: List[Token] = []
+        self.values: List[Optional[float]] = []
+        self.numbers: Dict[float, List[int]] = {}
+        self.words: Dict[str, List[int]] = {}
+        # Token indexes a name cannot reach its value across.
+        self.stops: set = set()
+        for m in _TOKEN_RE.finditer(text):
+            raw = m.group(0)
+            value = None
+            if raw[0].isdigit():
+                value = _number(raw)
+                folded = raw.replace(",", "")
+                if value is not None:
+                    self.numbers.setdefault(value, []).append(len(self.tokens))
+            else:
+                folded = _fold(raw)
+            if value is not None or folded in extraction._NOT_TESTS or _LABEL_END_RE.match(text, m.end()):
+                self.stops.add(len(self.tokens))
+            self.words.setdefault(folded, []).append(len(self.tokens))
+            self.values.append(value)
+            self.tokens.append(Token(folded, m.start(), m.end()))
+
+    def _value_positions(self, names: Sequence[List[str]], value: float) -> List[int]:
+        """Token indexes where ``value`` occurs, found via whichever of value or name is rarer."""
+        by_value = self.numbers.get(value, [])
+        by_name = [self.words.get(words[-1], []) for words in names if words]
+        if not by_name or sum(map(len, by_name)) >= len(by_value):
+            return by_value
+        last = len(self.tokens)
+        return sorted({
+            at
+            for hits in by_name for p in hits for at in range(p + 1, min(p + 2 + _NAME_GAP, last))
+            if self.values[at] == value
+        })
+
+    def _name_before(self, names: Sequence[List[str]], at: int) -> Optional[Tuple[int, int]]:
+        for words in names:
+            for gap in range(_NAME_GAP + 1):
+                end = at - gap
+                start = end - len(words)
+                if start < 0 or (gap and end in self.stops):
+                    break
+                if all(self.tokens[start + k].text == w for k, w in enumerate(words)):
+                    return self.tokens[start].start, self.tokens[end - 1].end
+        return None
+
+    def _unit_after(self, unit: List[str], at: int) -> Optional[Tuple[int, int]]:
+        i, matched = at + 1, 0
+        while matched < len(unit) and i < len(self.tokens):
+            token = self.tokens[i]
+            if token.text != "/":
+                if token.text != unit[matched]:
+                    return None
+                matched += 1
+            i += 1
+        if matched < len(unit):
+            return None
+        return self.tokens[at + 1].start, self.tokens[i - 1].end
+
+    def _status_after(self, status: str, at: int) -> Optional[Tuple[int, int]]:
+        for token in self.tokens[at + 1:at + 1 + _STATUS_WINDOW]:
+            if token.text == status:
+                return token.start, token.end
+        return None
+
+    def find(self, names: Sequence[str], value: float, unit: str = "") -> Optional[Tuple[int, Tuple, Tuple, Optional[Tuple]]]:
+        """First occurrence of ``value`` preceded by one of ``names`` and followed by ``unit``.
+
+        Returns ``(value token index, name span, value span, unit span)``.
+        """
+        name_words = [_words(n) for n in names if n]
+        unit_words = _unit_words(unit) if unit else []
+        for at in self._value_positions(name_words, value):
+            name_span = self._name_before(name_words, at)
+            if name_span is None:
+                continue
+            unit_span = None
+            if unit_words:
+                unit_span = self._unit_after(unit_words, at)
+                if unit_span is None:
+                    continue
+            token = self.tokens[at]
+            return at, name_span, (token.start, token.end), unit_span
+        return None
+
+    def validate(self, candidate: str) -> Optional[Evidence]:
+        """Evidence for one ``"Name value unit (Status)"`` string, or None if the source does not support it."""
+        m = _CANDIDATE_RE.match(candidate or "")
+        if m is None:
+            return None
+        value = _number(m.group("value"))
+        if value is None:
+            return None
+        name = m.group("name").strip()
+        unit = m.group("unit").strip()
+        name_words = _words(name)
+        if not name_words or name_words[0] in extraction._NOT_TESTS:
+            return None
+        names = [name]
+        match = extraction.parse(candidate)
+        analyte = registry.BY_KEY[match.key] if match is not None else _ANALYTE_NAMES.get(tuple(name_words))
+        if analyte is not None:
+            names.extend(analyte.aliases)
+        elif not _unit_words(unit):
+            # A bare "Name 45" is only a test if the registry knows the name.
+            return None
+        found = self.find(names, value, unit)
+        if found is None:
+            return None
+        at, name_span, value_span, unit_span = found
+        status_span = None
+        test = candidate.strip()
+        if m.group("status"):
+            status_span = self._status_after(m.group("status").lower(), at)
+            if status_span is None:
+                # Keep the test but not a status the report does not state.
+                test = candidate[:m.start("status") - 1].rstrip()
+        return Evidence(test, name_span, value_span, unit_span, status_span)
+
+
+def validate(candidates: Sequence, text: str) -> List[Evidence]:
+    """Evidence for each candidate string supported by ``text``, de-duplicated, in order."""
+    index = SourceIndex(text)
+    seen = set()
+    found: List[Evidence] = []
+    for candidate in candidates:
+        if not isinstance(candidate, str):
+            continue
+        evidence = index.validate(candidate)
+        if evidence is not None and evidence.test not in seen:
+            seen.add(evidence.test)
+            found.append(evidence)
+    return found
@@ -1,257 +1,163 @@
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+import copy
+import itertools
+import logging
+import math
 import re
-from django.http import JsonResponse, HttpRequest
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, JsonResponse, HttpRequest, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from .ai import extract_tests_ai, summarize_with_ai
+from . import cache as result_cache
+from . import admission, classify, extraction, history, ingest, jobs, metrics, ocr, registry, results, revise, validation
+from .ai import AIExtractError, breaker_state, extract_tests_ai, summarize_with_ai, summary_cache_stats, summary_key
+from .models import Job
+from .resilience import Deadline
 
 
-def health(request: HttpRequest):
-    return JsonResponse({"status": "ok","hello": "world"})
-
+logger = logging.getLogger(__name__)
 
-def _simple_ocr_text_cleanup(text: str) -> str:
-    if not text:
-        return ""
-    fixes = {
-        r"\bHemglobin\b": "Hemoglobin",
-        r"\bHgh\b": "High",
-        r"\bHg\b": "High",
-        r"\bWBC\b": "WBC",
-        r"\bCBC\b": "CBC",
-        r"\b/uL\b": "/uL",
-    }
-    cleaned = text
-    for pattern, repl in fixes.items():
-        cleaned = re.sub(pattern, repl, cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r",?\s*\(Low\)|,?\s*\(High\)|,?\s*\(Normal\)", lambda m: f" ({m.group(0).strip(' ,()')})", cleaned, flags=re.IGNORECASE)
-    # Do not collapse newlines here; preserve structure for line parsing
-    cleaned = re.sub(r"[\t\r]+", " ", cleaned)
-    return cleaned
+def health(request: HttpRequest):
+    return JsonResponse({
+        "status": "ok",
+        "hello": "world",
+        "summary_cache": summary_cache_stats(),
+        "ai_breaker": breaker_state(),
+        "admission": admission.snapshot(),
+    })
 
 
 def _extract_tests_raw(text: str) -> Tuple[List[str], float]:
     if not text:
         return [], 0.0
-    cleaned = _simple_ocr_text_cleanup(text)
-    flat = re.sub(r"\s+", " ", cleaned).strip()
-
-    candidates: List[str] = []
-    patterns = [
-        # Hemoglobin with optional colon
-        r"Hemoglobin\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?",
-        # WBC or WBC Count with optional colon
-        r"WBC(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?",
-        # RBC Count in million/uL
-        r"RBC(?:\s*Count)?\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:million)?\s*/?uL(?:\s*\((Low|High|Normal)\))?",
-        # Platelet Count
-        r"Platelet(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?",
-        # Hematocrit %
-        r"Hematocrit\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*%(?:\s*\((Low|High|Normal)\))?",
-        # MCV fL
-        r"MCV\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*fL(?:\s*\((Low|High|Normal)\))?",
-        # MCH pg
-        r"MCH\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*pg(?:\s*\((Low|High|Normal)\))?",
-        # MCHC g/dL
-        r"MCHC\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?",
-    ]
-    for pat in patterns:
-        for m in re.finditer(pat, flat, flags=re.IGNORECASE):
-            start, end = m.span()
-            snippet = flat[start:end]
-            snippet = re.sub(r"\s+/uL", " /uL", snippet)
-            if re.search(r"\b(WBC|Platelet)\b", snippet, flags=re.IGNORECASE):
-                snippet = re.sub(r",", "", snippet)
-            snippet = re.sub(r"\(low\)", "(Low)", snippet, flags=re.IGNORECASE)
-            snippet = re.sub(r"\(high\)", "(High)", snippet, flags=re.IGNORECASE)
-            snippet = re.sub(r"\(normal\)", "(Normal)", snippet, flags=re.IGNORECASE)
-            candidates.append(snippet)
-
-    # Line-based fallback for list items like "- Hemoglobin: 10.2 g/dL (Low)"
-    if not candidates:
-        for line in cleaned.split('\n'):
-            s = line.strip(" -•\t")
-            if not s:
-                continue
-            m = re.search(r"Hemoglobin\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m:
-                val = m.group(1)
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"Hemoglobin {val} g/dL{status}")
-            m2 = re.search(r"WBC(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m2:
-                val = m2.group(1).replace(',', '')
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"WBC {val} /uL{status}")
-            m3 = re.search(r"RBC(?:\s*Count)?\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:million)?\s*/?uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m3:
-                val = m3.group(1)
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"RBC {val} million/uL{status}")
-            m4 = re.search(r"Platelet(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m4:
-                val = m4.group(1).replace(',', '')
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"Platelet {val} /uL{status}")
-            m5 = re.search(r"Hematocrit\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*%(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m5:
-                val = m5.group(1)
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"Hematocrit {val} %{status}")
-            m6 = re.search(r"MCV\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*fL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m6:
-                val = m6.group(1)
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"MCV {val} fL{status}")
-            m7 = re.search(r"MCH\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*pg(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m7:
-                val = m7.group(1)
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"MCH {val} pg{status}")
-            m8 = re.search(r"MCHC\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-            if m8:
-                val = m8.group(1)
-                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
-                candidates.append(f"MCHC {val} g/dL{status}")
-
-    candidates = list(dict.fromkeys(candidates))
-    confidence = 0.8 if candidates else 0.0
+    candidates, confidence, _ = _extract_cleaned(extraction.simple_ocr_text_cleanup(text))
     return candidates, confidence
 
 
-def _normalize_tests(tests_raw: List[str]) -> Tuple[List[Dict,], float]:
-    normalized: List[Dict] = []
-    for item in tests_raw:
-        s = item.strip()
+def _extract_cleaned(cleaned: str) -> Tuple[List[str], float, List[str]]:
+    """Canonical test strings, confidence, and measurements no analyte matched."""
+    if not cleaned:
+        return [], 0.0, []
+    # One pass over the cleaned text; analyte patterns tolerate newlines, so
+    # list layouts ("- Hemoglobin: 10.2 g/dL") need no separate line fallback.
+    matches = list(extraction.scan(cleaned))
+    candidates = list(dict.fromkeys(m.as_text() for m in matches))
+    confidence = 0.8 if candidates else 0.0
+    return candidates, confidence, extraction.unmatched_measurements(cleaned, matches)
 
-        m_hb = re.search(r"Hemoglobin\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/dL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_hb:
-            value = float(m_hb.group(1))
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value < 12.0 else ("high" if value > 15.0 else "normal"))
-            normalized.append({
-                "name": "Hemoglobin",
-                "value": value,
-                "unit": "g/dL",
-                "status": status,
-                "ref_range": {"low": 12.0, "high": 15.0},
-            })
-            continue
 
-        m_wbc = re.search(r"WBC(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_wbc:
-            value = float(m_wbc.group(1).replace(",", ""))
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value < 4000 else ("high" if value > 11000 else "normal"))
-            normalized.append({
-                "name": "WBC",
-                "value": value,
-                "unit": "/uL",
-                "status": status,
-                "ref_range": {"low": 4000, "high": 11000},
-            })
-            continue
+def _ai_extract_skip(leftovers: List[str]) -> Optional[str]:
+    """Why AI extraction is not worth calling, or None to call it."""
+    policy = getattr(settings, "AI_EXTRACT_POLICY", "auto")
+    if policy == "never":
+        return "policy"
+    if policy == "auto" and not leftovers:
+        return "covered"
+    return None
 
-        m_rbc = re.search(r"RBC(?:\s*Count)?\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:million)?\s*/uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_rbc:
-            value_million = float(m_rbc.group(1))
-            # Normalize to million/uL unit
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value_million < 4.5 else ("high" if value_million > 5.9 else "normal"))
-            normalized.append({
-                "name": "RBC",
-                "value": value_million,
-                "unit": "million/uL",
-                "status": status,
-                "ref_range": {"low": 4.5, "high": 5.9},
-            })
-            continue
 
-        m_platelet = re.search(r"Platelet(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_platelet:
-            value = float(m_platelet.group(1).replace(",", ""))
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value < 150000 else ("high" if value > 450000 else "normal"))
-            normalized.append({
-                "name": "Platelet Count",
-                "value": value,
-                "unit": "/uL",
-                "status": status,
-                "ref_range": {"low": 150000, "high": 450000},
-            })
-            continue
+def _ai_summary_skip(tests: List[Dict]) -> Optional[str]:
+    """Why the AI summary is not worth calling, or None to call it."""
+    policy = getattr(settings, "AI_SUMMARY_POLICY", "abnormal")
+    if policy == "never":
+        return "policy"
+    if policy == "abnormal" and not any(t.get("status") in ("low", "high") for t in tests):
+        return "all_normal"
+    return None
 
-        m_hct = re.search(r"Hematocrit\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*%(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_hct:
-            value = float(m_hct.group(1))
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value < 36 else ("high" if value > 46 else "normal"))
-            normalized.append({
-                "name": "Hematocrit",
-                "value": value,
-                "unit": "%",
-                "status": status,
-                "ref_range": {"low": 36, "high": 46},
-            })
-            continue
 
-        m_mcv = re.search(r"MCV\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*fL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_mcv:
-            value = float(m_mcv.group(1))
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value < 80 else ("high" if value > 100 else "normal"))
-            normalized.append({
-                "name": "MCV",
-                "value": value,
-                "unit": "fL",
-                "status": status,
-                "ref_range": {"low": 80, "high": 100},
-            })
-            continue
+def _shed_ai(call: str, client: Optional[str], shed: bool = True) -> Optional[str]:
+    """Take an AI pool slot for one call, or say why the call is shed under load.
+
+    With ``shed`` off (background jobs) a slot is always taken, so those calls
+    still count towards what interactive requests see as in flight.
+    """
+    if not admission.AI_GATE.try_acquire(force=not shed):
+        reason = "overload"
+    elif shed and client is not None and admission.AI_QUOTA.acquire(client) > 0:
+        admission.AI_GATE.release()
+        reason = "quota"
+    else:
+        return None
+    metrics.DEGRADED.inc(call=call, reason=reason)
+    return reason
 
-        m_mch = re.search(r"MCH\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*pg(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_mch:
-            value = float(m_mch.group(1))
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value < 27 else ("high" if value > 33 else "normal"))
-            normalized.append({
-                "name": "MCH",
-                "value": value,
-                "unit": "pg",
-                "status": status,
-                "ref_range": {"low": 27, "high": 33},
-            })
-            continue
 
-        m_mchc = re.search(r"MCHC\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/dL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
-        if m_mchc:
-            value = float(m_mchc.group(1))
-            status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
-            status = status_match.group(1).lower() if status_match else ("low" if value < 32 else ("high" if value > 36 else "normal"))
-            normalized.append({
-                "name": "MCHC",
-                "value": value,
-                "unit": "g/dL",
-                "status": status,
-                "ref_range": {"low": 32, "high": 36},
-            })
+def _start_ai_extract(
+    text: str,
+    leftovers: List[str],
+    timings: Dict[str, float],
+    deadline: Deadline,
+    client: Optional[str] = None,
+    shed: bool = True,
+) -> Tuple[Optional["asyncio.Future"], Optional[str]]:
+    """AI extraction of ``text`` in the pool, or None and why it was skipped."""
+    skip = _ai_extract_skip(leftovers)
+    if skip is not None:
+        metrics.AI_CALLS_AVOIDED.inc(call="extract", reason=skip)
+        return None, skip
+    skip = _shed_ai("extract", client, shed)
+    if skip is not None:
+        return None, skip
+    metrics.AI_CALLS.inc(call="extract")
+    task = _in_pool(timings, "ai_extract", extract_tests_ai, text, deadline)
+    task.add_done_callback(admission.AI_GATE.release)
+    return task, None
+
+
+async def _ai_extract_result(task: "asyncio.Future") -> Tuple[List[str], float, Optional[str]]:
+    """The AI extraction's tests and confidence, plus the error if it failed."""
+    try:
+        ai_raw, ai_conf = await task
+    except AIExtractError as e:
+        return [], 0.0, str(e)[:200]
+    return ai_raw, ai_conf, None
+
+
+_STATUS_RE = re.compile(r"\((Low|High|Normal)\)", re.IGNORECASE)
+# Pattern: Name: value unit (Status)
+_GENERIC_TEST_RE = re.compile(
+    r"^\s*([A-Za-z][A-Za-z \-\/]+?)\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*([%A-Za-z\/µ]+)?(?:\s*\((Low|High|Normal)\))?\s*$",
+    re.IGNORECASE,
+)
+
+
+class _Parsed(NamedTuple):
+    """One report's tests, before classification: registry analytes are left as
+    ``None`` in ``normalized`` at ``positions``."""
+    normalized: List[Optional[results.LabResult]]
+    positions: List[int]
+    codes: List[int]
+    values: List[float]
+    stated: List[str]
+
+
+def _parse_tests(tests_raw: List[str]) -> _Parsed:
+    parsed = _Parsed([], [], [], [], [])
+    normalized = parsed.normalized
+    for item in tests_raw:
+        s = item.strip()
+
+        match = extraction.parse(s)
+        if match:
+            status = match.status
+            if not status:
+                status_match = _STATUS_RE.search(s)
+                status = status_match.group(1) if status_match else ""
+            parsed.positions.append(len(normalized))
+            parsed.codes.append(classify.CODES[match.key])
+            parsed.values.append(float(match.value))
+            parsed.stated.append(status.lower())
+            normalized.append(None)
             continue
 
         # Generic fallback: pass through any validated test string as a generic item
-        # Pattern: Name: value unit (Status)
-        m_generic = re.search(
-            r"^\s*([A-Za-z][A-Za-z \-\/]+?)\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*([%A-Za-z\/µ]+)?(?:\s*\((Low|High|Normal)\))?\s*$",
-            s,
-            flags=re.IGNORECASE,
-        )
+        m_generic = _GENERIC_TEST_RE.search(s)
         if m_generic:
             name = m_generic.group(1).strip()
             try:
@@ -261,16 +167,75 @@ def _normalize_tests(tests_raw: List[str]) -> Tuple[List[Dict,], float]:
             unit = (m_generic.group(3) or "").strip()
             status = (m_generic.group(4) or "unknown").lower()
             if value is not None:
-                normalized.append({
-                    "name": name,
-                    "value": value,
-                    "unit": unit,
-                    "status": status,
-                })
+                normalized.append(results.LabResult(name, value, unit, status))
                 continue
+    return parsed
+
+
+def _normalize_many(reports: Sequence[Tuple[List[str], Optional[Dict]]]) -> List[Tuple[List[results.LabResult], float]]:
+    """``_normalize_tests`` for many ``(tests_raw, patient)`` reports, classified together."""
+    parsed = [_parse_tests(tests_raw) for tests_raw, _ in reports]
+    classified = classify.classify_reports([
+        (p.codes, p.values, *classify.patient_args(patient)) for p, (_, patient) in zip(parsed, reports)
+    ])
+    normalized_reports = []
+    for p, (computed, severities, ranges) in zip(parsed, classified):
+        normalized = p.normalized
+        for i, position in enumerate(p.positions):
+            analyte = registry.ANALYTES[p.codes[i]]
+            normalized[position] = results.LabResult(
+                analyte.name,
+                p.values[i],
+                analyte.unit,
+                # A status printed on the report wins over the computed one.
+                p.stated[i] or classify.STATUSES[computed[i]],
+                ranges[i],
+                round(severities[i], 2),
+            )
+        normalized_reports.append((normalized, 0.84 if normalized else 0.0))
+    return normalized_reports
+
+
+def _normalize_tests(tests_raw: List[str], patient: Optional[Dict] = None) -> Tuple[List[results.LabResult], float]:
+    return _normalize_many([(tests_raw, patient)])[0]
+
+
+class _Rules(NamedTuple):
+    """Rule-based extraction of one report; ``tests`` also covers provided ``tests_raw``."""
+    tests_raw: List[str]
+    confidence: float
+    leftovers: List[str]
+    tests: List[results.LabResult]
+    normalization_confidence: float
+
+
+def _rules_many(
+    reports: Sequence[Tuple[str, Optional[list], Optional[Dict]]],
+    timings: Sequence[Dict[str, float]],
+) -> List[_Rules]:
+    """Rule-based extraction of many ``(source, tests_raw, patient)`` reports.
+
+    Extraction is per report; normalization classifies all of them in one
+    ``classify.classify_reports`` call, and its time is split evenly between
+    the reports' ``timings``.
+    """
+    extracted = []
+    for (source, _, _), report_timings in zip(reports, timings):
+        cleaned = _timed(report_timings, "cleanup", extraction.simple_ocr_text_cleanup, source) if source else ""
+        extracted.append(_timed(report_timings, "extract", _extract_cleaned, cleaned))
+    t0 = time.perf_counter()
+    normalized = _normalize_many([
+        (_merge_provided(tests_raw, provided), patient)
+        for (tests_raw, _, _), (_, provided, patient) in zip(extracted, reports)
+    ])
+    share = round((time.perf_counter() - t0) * 1000 / max(1, len(reports)), 2)
+    for report_timings in timings:
+        report_timings["normalize"] = share
+    return [
+        _Rules(tests_raw, confidence, leftovers, tests, conf_norm)
+        for (tests_raw, confidence, leftovers), (tests, conf_norm) in zip(extracted, normalized)
+    ]
 
-    confidence = 0.84 if normalized else 0.0
-    return normalized, confidence
 
 def _summarize_tests(tests: List[Dict]) -> Dict:
     highlights = []
@@ -288,127 +253,804 @@ def _summarize_tests(tests: List[Dict]) -> Dict:
     # Keep minimal rule-based explanations; AI may enrich later
     explanations: List[str] = []
     for t in tests:
-        if t.get("name") == "Hemoglobin" and (t.get("status") == "low"):
-            explanations.append("Low hemoglobin may relate to anemia.")
-        if t.get("name") == "WBC" and (t.get("status") == "high"):
-            explanations.append("High WBC can occur with infections.")
+        analyte = registry.BY_NAME.get(t.get("name"))
+        explanation = analyte.explanations.get(t.get("status")) if analyte else None
+        if explanation:
+            explanations.append(explanation)
 
     return {"summary": summary, "explanations": explanations}
 
 
+# Bounded pool for blocking provider calls so the event loop keeps
+# serving other requests while an LLM round-trip is in flight.
+_ai_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, "AI_MAX_CONCURRENCY", 8),
+    thread_name_prefix="ai",
+)
+
+
+def _timed(timings: Dict[str, float], stage: str, fn, *args):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = round((time.perf_counter() - t0) * 1000, 2)
+
+
+def _in_pool(timings: Dict[str, float], stage: str, fn, *args) -> "asyncio.Future":
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(_ai_pool, _timed, timings, stage, fn, *args)
+
+
+def _json_response(payload: Dict, status: int, started: float, cache: Optional[str] = None) -> HttpResponse:
+    t0 = time.perf_counter()
+    response = HttpResponse(results.dumps(payload), content_type="application/json", status=status)
+    done = time.perf_counter()
+    metrics.STAGE_SECONDS.observe(done - t0, stage="serialize")
+    metrics.observe_request("process", status, done - started, cache)
+    if logger.isEnabledFor(logging.INFO):
+        meta = payload.get("meta") or {}
+        logger.info("process", extra={
+            "status": status,
+            "cache": cache,
+            "tests": len(payload.get("tests") or []),
+            "total_ms": round((done - started) * 1000, 2),
+            "ai_summary_error": meta.get("ai_summary_error"),
+        })
+    return response
+
+
+def _history_forbidden(started: Optional[float] = None) -> HttpResponse:
+    """403 for reading or writing patient history without a HISTORY_API_KEYS key."""
+    payload = {"error": "forbidden", "detail": "patient history requires an API key"}
+    if started is not None:
+        return _json_response(payload, 403, started)
+    return JsonResponse(payload, status=403)
+
+
+def _too_large(limit: int, started: Optional[float] = None) -> HttpResponse:
+    """413 for a JSON body over REQUEST_MAX_BYTES (only reached under WSGI or
+    without a Content-Length; ``ingest.BodyLimit`` usually answers first)."""
+    payload = {"error": "request_too_large", "max_bytes": limit}
+    if started is not None:
+        return _json_response(payload, 413, started)
+    return JsonResponse(payload, status=413)
+
+
+def _rate_limited(endpoint: str, client: str, started: float, cost: float = 1.0) -> Optional[HttpResponse]:
+    """A 429 response when ``client`` is over its request rate, else None."""
+    wait = admission.admit(client, cost)
+    if wait is None:
+        return None
+    metrics.SHED.inc(endpoint=endpoint, reason="rate_limited")
+    metrics.observe_request(endpoint, 429, time.perf_counter() - started)
+    response = JsonResponse({"error": "rate_limited", "retry_after": round(wait, 2)}, status=429)
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+async def _record_history(target: Optional[history.Target], report_key: str, payload: Dict, status: int) -> Optional[Dict]:
+    """Store a successful result in the patient's history; ``meta.history``."""
+    if target is None or status != 200 or not payload.get("tests"):
+        return None
+    try:
+        return history.history_meta(await history.arecord(target, report_key, payload["tests"]))
+    except Exception as e:
+        # The result is still returned; only the history write is lost.
+        logger.warning("history_write_failed", extra={"error": type(e).__name__})
+        return {"error": "write_failed"}
+
+
+async def _respond_and_cache(
+    cache_key: str,
+    payload: Dict,
+    timings: Dict[str, float],
+    started: float,
+    status: int = 200,
+    target: Optional[history.Target] = None,
+) -> HttpResponse:
+    result_cache.set_result(cache_key, payload, status)
+    meta = payload.setdefault("meta", {})
+    meta["cache"] = "miss"
+    stored = await _record_history(target, cache_key, payload, status)
+    if stored is not None:
+        meta["history"] = stored
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    meta["timings_ms"] = timings
+    metrics.observe_stages(timings)
+    return _json_response(payload, status, started, "miss")
+
+
+async def _cache_hit(cache_key: str, started: float, target: Optional[history.Target] = None):
+    cached = result_cache.get_result(cache_key)
+    if cached is None:
+        return None
+    payload, status = cached
+    meta = payload.setdefault("meta", {})
+    meta["cache"] = "hit"
+    stored = await _record_history(target, cache_key, payload, status)
+    if stored is not None:
+        meta["history"] = stored
+    meta["timings_ms"] = {"total": round((time.perf_counter() - started) * 1000, 2)}
+    return _json_response(payload, status, started, "hit")
+
+
+def _ai_deadline() -> Deadline:
+    return Deadline(getattr(settings, "AI_DEADLINE_SECONDS", 20.0))
+
+
+async def _summarize(
+    tests: List[Dict],
+    timings: Dict[str, float],
+    deadline: Deadline,
+    summary_group: Optional[Dict[str, "asyncio.Future"]] = None,
+    ai_summary: bool = True,
+    client: Optional[str] = None,
+    shed: bool = True,
+) -> Tuple[Dict, Dict]:
+    # Start the AI summary first and compute the rule-based one while it is in
+    # flight; the rule-based result is the fallback if AI is unavailable.
+    if not ai_summary:
+        return _timed(timings, "summary", _summarize_tests, tests), {"_used": False, "error": "disabled"}
+    skip = _ai_summary_skip(tests)
+    if skip is not None:
+        metrics.AI_CALLS_AVOIDED.inc(call="summary", reason=skip)
+        return _timed(timings, "summary", _summarize_tests, tests), {"_used": False, "error": None, "skipped": skip}
+    # Reports in one batch with the same test set share a single AI call.
+    key = summary_key(tests) if summary_group is not None else None
+    ai_task = summary_group.get(key) if summary_group is not None else None
+    if ai_task is None:
+        skip = _shed_ai("summary", client, shed)
+        if skip is not None:
+            return _timed(timings, "summary", _summarize_tests, tests), {"_used": False, "error": None, "skipped": skip}
+        metrics.AI_CALLS.inc(call="summary")
+        ai_task = _in_pool(timings, "ai_summary", summarize_with_ai, tests, deadline)
+        ai_task.add_done_callback(admission.AI_GATE.release)
+        if summary_group is not None:
+            summary_group[key] = ai_task
+    summ = _timed(timings, "summary", _summarize_tests, tests)
+    ai_out = await ai_task
+    if ai_out.get("_used") and ai_out.get("summary"):
+        summ["summary"] = ai_out["summary"]
+    if ai_out.get("_used") and ai_out.get("explanations"):
+        summ["explanations"] = ai_out["explanations"]
+    return summ, ai_out
+
+
+def _merge_provided(tests_raw: List[str], provided_tests_raw) -> List[str]:
+    """``tests_raw`` plus caller-supplied strings not already in it."""
+    merged = list(tests_raw)
+    if isinstance(provided_tests_raw, list) and provided_tests_raw:
+        seen = set(merged)
+        for item in provided_tests_raw:
+            if isinstance(item, str) and item.strip():
+                if item.strip() not in seen:
+                    merged.append(item.strip())
+                    seen.add(item.strip())
+    return merged
+
+
+async def _process_text(
+    source: str,
+    provided_tests_raw,
+    timings: Dict[str, float],
+    deadline: Deadline,
+    use_ai: bool = True,
+    summary_group: Optional[Dict[str, "asyncio.Future"]] = None,
+    ai_summary: bool = True,
+    on_event: Optional[Callable[[str, Dict], None]] = None,
+    patient: Optional[Dict] = None,
+    client: Optional[str] = None,
+    shed_ai: bool = True,
+    rules: Optional[_Rules] = None,
+) -> Tuple[Dict, int]:
+    """Extraction, normalization and summarization for one report's text.
+
+    ``patient`` (from ``classify.parse_patient``) selects age/sex-specific
+    reference ranges. AI calls are charged to ``client``'s quota and, unless
+    ``shed_ai`` is off, skipped under load (``meta.degraded``). With ``on_event``, the rule-based tests and summary are reported as
+    ``"rules"`` before any AI call is awaited, and tests added by AI
+    extraction as ``"ai_tests"``; the return value is unchanged. Bulk callers
+    pass the report's ``rules`` from ``_rules_many``.
+    """
+    if rules is None:
+        rules = _rules_many([(source, provided_tests_raw, patient)], [timings])[0]
+    tests_raw, conf_extract, leftovers = rules.tests_raw, rules.confidence, rules.leftovers
+    # AI extraction only runs when the regex pass left measurements unclaimed.
+    ai_task, extract_skip = (
+        _start_ai_extract(source, leftovers, timings, deadline, client, shed_ai) if use_ai else (None, None)
+    )
+    rule_tests = rules.tests
+    if on_event is not None:
+        ai_pending = ai_task is not None or (ai_summary and _ai_summary_skip(rule_tests) is None)
+        on_event("rules", {"tests": rule_tests, **_summarize_tests(rule_tests), "ai_pending": ai_pending})
+    ai_extract_used = False
+    extract_error = None
+    if ai_task is not None:
+        ai_raw, ai_conf, extract_error = await _ai_extract_result(ai_task)
+        logger.debug("ai_extract", extra={"ai_tests": len(ai_raw), "ai_confidence": ai_conf})
+        if ai_raw:
+            tests_raw = list(dict.fromkeys([*tests_raw, *ai_raw]))
+            conf_extract = max(conf_extract, ai_conf)
+            ai_extract_used = True
+    tests_raw = _merge_provided(tests_raw, provided_tests_raw)
+
+    if ai_extract_used:
+        tests, conf_norm = _timed(timings, "normalize", _normalize_tests, tests_raw, patient)
+    else:
+        tests, conf_norm = rule_tests, rules.normalization_confidence
+    if on_event is not None and ai_extract_used and tests != rule_tests:
+        on_event("ai_tests", {"tests": tests})
+    logger.debug("normalized", extra={"source_chars": len(source), "tests_raw": len(tests_raw), "tests": len(tests)})
+    if not tests:
+        if provided_tests_raw:
+            return {"status": "unprocessed", "reason": "hallucinated tests not present in input"}, 400
+        payload: Dict = {"status": "unprocessed", "reason": "no tests found"}
+        if extract_skip in admission.SHED_REASONS:
+            payload["meta"] = {"degraded": True}
+        if extract_error is not None:
+            payload.setdefault("meta", {})["ai_extract_error"] = extract_error
+        return payload, 200
+
+    summ, ai_out = await _summarize(tests, timings, deadline, summary_group, ai_summary, client, shed_ai)
+    logger.debug("summarized", extra={
+        "ai_summary_used": bool(ai_out.get("_used")),
+        "ai_summary_cached": bool(ai_out.get("_cached")),
+        "ai_summary_error": ai_out.get("error"),
+    })
+
+    meta = {
+        "confidence": round(conf_extract, 2),
+        "normalization_confidence": round(conf_norm, 2),
+    }
+    if use_ai:
+        meta["ai_extract_used"] = ai_extract_used
+        if extract_skip is not None:
+            meta["ai_extract_skipped"] = extract_skip
+        if extract_error is not None:
+            meta["ai_extract_error"] = extract_error
+    meta.update({
+        "ai_summary_used": bool(ai_out.get("_used")),
+        "ai_summary_cached": bool(ai_out.get("_cached")),
+        "ai_summary_error": ai_out.get("error")
+    })
+    if ai_out.get("skipped"):
+        meta["ai_summary_skipped"] = ai_out["skipped"]
+    meta["degraded"] = extract_skip in admission.SHED_REASONS or ai_out.get("skipped") in admission.SHED_REASONS
+    return {
+        "tests": tests,
+        "summary": summ.get("summary"),
+        "explanations": summ.get("explanations"),
+        "status": "ok",
+        "meta": meta,
+    }, 200
+
+
+async def _revise_text(
+    source: str,
+    previous: Dict,
+    previous_text: Optional[str],
+    timings: Dict[str, float],
+    deadline: Deadline,
+    patient: Optional[Dict] = None,
+    client: Optional[str] = None,
+) -> Tuple[Dict, int]:
+    """Re-process a corrected report, reusing what did not change in ``previous``.
+
+    Regex extraction reruns on the whole text (it is cheaper than diffing).
+    AI extraction only sees the lines that changed since ``previous_text``,
+    and is skipped when that is unknown or nothing changed. Previous tests
+    the regex pass cannot see are kept while the text still supports them,
+    and the AI summary is only requested again when the set of abnormal
+    results changed.
+    """
+    previous_tests = [t for t in previous.get("tests") or [] if isinstance(t, dict)]
+    lines = revise.changed_lines(previous_text, source) if isinstance(previous_text, str) else []
+    ai_task = extract_skip = None
+    if lines:
+        changed = "\n".join(lines)
+        _, _, leftovers = _extract_cleaned(extraction.simple_ocr_text_cleanup(changed))
+        ai_task, extract_skip = _start_ai_extract(changed, leftovers, timings, deadline, client)
+    cleaned = _timed(timings, "cleanup", extraction.simple_ocr_text_cleanup, source) if source else ""
+    tests_raw, conf_extract, _ = _timed(timings, "extract", _extract_cleaned, cleaned)
+    ai_extract_used = False
+    extract_error = None
+    if ai_task is not None:
+        ai_raw, ai_conf, extract_error = await _ai_extract_result(ai_task)
+        if ai_raw:
+            tests_raw = list(dict.fromkeys([*tests_raw, *ai_raw]))
+            conf_extract = max(conf_extract, ai_conf)
+            ai_extract_used = True
+
+    tests, conf_norm = _timed(timings, "normalize", _normalize_tests, tests_raw, patient)
+    seen = {t.get("name") for t in tests}
+    index = validation.SourceIndex(source)
+    tests.extend(
+        t for t in previous_tests
+        if t.get("name") not in seen and revise.has_evidence(t, index)
+    )
+    if not tests:
+        return {"status": "unprocessed", "reason": "no tests found"}, 200
+
+    changes = revise.diff_tests(previous_tests, tests)
+    reuse = (
+        previous.get("summary") is not None
+        and revise.abnormal_signature(previous_tests) == revise.abnormal_signature(tests)
+    )
+    if reuse:
+        summ = {"summary": previous.get("summary"), "explanations": previous.get("explanations") or []}
+        ai_out: Dict = {"_used": False, "error": None}
+    else:
+        summ, ai_out = await _summarize(tests, timings, deadline, client=client)
+
+    meta = {
+        "confidence": round(conf_extract, 2),
+        "normalization_confidence": round(conf_norm, 2),
+        "ai_extract_used": ai_extract_used,
+        "ai_extract_lines": len(lines),
+        "ai_extract_error": extract_error,
+        "summary_reused": reuse,
+        "ai_summary_used": bool(ai_out.get("_used")),
+        "ai_summary_cached": bool(ai_out.get("_cached")),
+        "ai_summary_error": ai_out.get("error"),
+    }
+    if ai_out.get("skipped"):
+        meta["ai_summary_skipped"] = ai_out["skipped"]
+    meta["degraded"] = extract_skip in admission.SHED_REASONS or ai_out.get("skipped") in admission.SHED_REASONS
+    return {
+        "tests": tests,
+        "summary": summ.get("summary"),
+        "explanations": summ.get("explanations"),
+        "changes": changes,
+        "status": "ok",
+        "meta": meta,
+    }, 200
+
+
 @csrf_exempt
-def process(request: HttpRequest):
+async def process_revise(request: HttpRequest):
+    """Re-process a corrected report against a previous result.
+
+    Body: ``{text, previous?: <result payload>, previous_id?: <job id>,
+    previous_text?: <the earlier report text>}``.
+    """
+    started = time.perf_counter()
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    client = admission.client_key(request)
+    limited = _rate_limited("revise", client, started)
+    if limited is not None:
+        return limited
+    try:
+        data = ingest.read_json(request, {})
+    except ingest.RequestTooLarge as e:
+        return _too_large(e.limit)
+    except Exception:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    previous = data.get("previous")
+    if data.get("previous_id"):
+        try:
+            job = await Job.objects.defer("source").aget(pk=data["previous_id"])
+        except (Job.DoesNotExist, ValueError, ValidationError):
+            return JsonResponse({"error": "not_found", "detail": "no job with that previous_id"}, status=404)
+        if job.status != Job.DONE or not isinstance(job.result, dict):
+            return JsonResponse({"error": "previous_not_ready", "status": job.status}, status=409)
+        previous = job.result
+    if not isinstance(previous, dict) or not isinstance(previous.get("tests"), list):
+        return JsonResponse({"error": "previous_required", "detail": "pass previous (a result) or previous_id (a job)"}, status=400)
+
+    try:
+        patient = classify.parse_patient(data.get("patient"))
+    except ValueError as e:
+        return JsonResponse({"error": "invalid_patient", "detail": str(e)}, status=400)
+
+    source = (data.get("text") or "").strip() or (data.get("image_text") or "").strip()
+    timings: Dict[str, float] = {}
+    try:
+        payload, status = await _revise_text(
+            source, previous, data.get("previous_text"), timings, _ai_deadline(), patient, client,
+        )
+    except Exception as e:
+        logger.exception("revise_failed")
+        return _json_response({"error": "server_error", "detail": str(e)}, 500, started)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    payload.setdefault("meta", {})["timings_ms"] = timings
+    metrics.observe_stages(timings)
+    return _json_response(payload, status, started)
+
+
+def _ndjson(event: str, data: Dict) -> bytes:
+    return results.dumps({"event": event, **data}) + b"\n"
+
+
+async def _stream_process(
+    cache_key: str,
+    source: str,
+    provided_tests_raw,
+    deadline: Deadline,
+    started: float,
+    patient: Optional[Dict] = None,
+    target: Optional[history.Target] = None,
+    client: Optional[str] = None,
+):
+    """NDJSON events for one report: ``rules`` as soon as the regex pass is
+    done, ``ai_tests`` if AI extraction added tests, then ``result`` with the
+    same payload the non-streaming response would have had."""
+    cached = result_cache.get_result(cache_key)
+    if cached is not None:
+        payload, status = cached
+        meta = payload.setdefault("meta", {})
+        meta["cache"] = "hit"
+        stored = await _record_history(target, cache_key, payload, status)
+        if stored is not None:
+            meta["history"] = stored
+        meta["timings_ms"] = {"total": round((time.perf_counter() - started) * 1000, 2)}
+        metrics.observe_request("process_stream", status, time.perf_counter() - started, "hit")
+        yield _ndjson("result", {**payload, "http_status": status})
+        return
+
+    timings: Dict[str, float] = {}
+    queue: "asyncio.Queue[Optional[Tuple[str, Dict]]]" = asyncio.Queue()
+    task = asyncio.ensure_future(_process_text(
+        source, provided_tests_raw, timings, deadline, use_ai=True, patient=patient, client=client,
+        on_event=lambda event, data: queue.put_nowait((event, data)),
+    ))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            event, data = item
+            yield _ndjson(event, {**data, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)})
+        try:
+            payload, status = task.result()
+        except Exception as e:
+            logger.exception("process_failed")
+            metrics.observe_request("process_stream", 500, time.perf_counter() - started)
+            yield _ndjson("result", {"error": "server_error", "detail": str(e), "http_status": 500})
+            return
+        result_cache.set_result(cache_key, payload, status)
+        meta = payload.setdefault("meta", {})
+        meta["cache"] = "miss"
+        stored = await _record_history(target, cache_key, payload, status)
+        if stored is not None:
+            meta["history"] = stored
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        meta["timings_ms"] = timings
+        metrics.observe_stages(timings)
+        metrics.observe_request("process_stream", status, time.perf_counter() - started, "miss")
+        yield _ndjson("result", {**payload, "http_status": status})
+    finally:
+        task.cancel()
+
+
+def _ndjson_response(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="application/x-ndjson")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@csrf_exempt
+async def process(request: HttpRequest):
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    deadline = _ai_deadline()
     try:
         if request.method != "POST":
             return JsonResponse({"error": "POST required"}, status=405)
+        client = admission.client_key(request)
+        limited = _rate_limited("process", client, started)
+        if limited is not None:
+            return limited
 
+        max_bytes = ingest.upload_too_large(request)
+        if max_bytes:
+            return _json_response({"status": "unprocessed", "reason": "image_too_large", "max_bytes": max_bytes}, 413, started)
         if getattr(request, 'FILES', None) and request.FILES.get('image'):
             uploaded = request.FILES['image']
             try:
-                from PIL import Image
-                import pytesseract
-                import platform
-
-                if platform.system() == "Windows":
-                    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-                else:
-                    pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
-                image = Image.open(uploaded)
-                ocr_text = pytesseract.image_to_string(image)
-                print("ocr_text", ocr_text)
+                target = history.parse_target(request.POST.get("patient_id"), request.POST.get("collected_at"))
+            except history.InvalidTarget as e:
+                return _json_response({"error": "invalid_history", "detail": str(e)}, 400, started)
+            if target is not None and not history.authorized(request):
+                return _history_forbidden(started)
+            cache_key = result_cache.bytes_key(uploaded.chunks())
+            hit = await _cache_hit(cache_key, started, target)
+            if hit is not None:
+                return hit
+            try:
+                t0 = time.perf_counter()
+                # A spooled upload is passed by path; the OCR workers map the file.
+                ocr_text, ocr_timings, ocr_info = await ocr.ocr_document(ingest.upload_source(uploaded))
+                timings.update(ocr_timings)
+                timings["ocr"] = round((time.perf_counter() - t0) * 1000, 2)
+                logger.debug("ocr", extra={"ocr_chars": len(ocr_text), **ocr_info})
+            except ocr.OCRBusy:
+                metrics.SHED.inc(endpoint="process", reason="ocr_busy")
+                response = _json_response({"status": "unprocessed", "reason": "ocr_busy"}, 503, started)
+                response["Retry-After"] = "2"
+                return response
+            except ocr.ImageTooLarge as e:
+                return _json_response({"status": "unprocessed", "reason": "image_too_large", "detail": str(e)}, 413, started)
             except Exception as e:
-                return JsonResponse({"status": "unprocessed", "reason": "ocr_failed", "detail": str(e)}, status=400)
-
-            tests_raw, conf_extract = _extract_tests_raw(ocr_text)
-            tests, conf_norm = _normalize_tests(tests_raw)
-            if not tests:
-                return JsonResponse({"status": "unprocessed", "reason": "no tests found"}, status=200)
-            # Base summary from rules
-            summ = _summarize_tests(tests)
-            # Optional AI explanations that do not modify tests
-            ai_out = summarize_with_ai(tests)
-            if ai_out.get("_used") and ai_out.get("summary"):
-                summ["summary"] = ai_out["summary"]
-            if ai_out.get("_used") and ai_out.get("explanations"):
-                summ["explanations"] = ai_out["explanations"]
-            return JsonResponse({
-                "tests": tests,
-                "summary": summ.get("summary"),
-                "explanations": summ.get("explanations"),
-                "status": "ok",
-                "meta": {
-                    "confidence": round(conf_extract, 2),
-                    "normalization_confidence": round(conf_norm, 2),
-                    "ai_summary_used": bool(ai_out.get("_used")),
-                    "ai_summary_error": ai_out.get("error")
-                }
-            })
+                logger.warning("ocr_failed", extra={"error": type(e).__name__})
+                return _json_response({"status": "unprocessed", "reason": "ocr_failed", "detail": str(e)}, 400, started)
+
+            # OCR text goes through rules only; AI explanations never modify tests
+            payload, status = await _process_text(ocr_text, None, timings, deadline, use_ai=False, client=client)
+            payload.setdefault("meta", {})["ocr"] = ocr_info
+            return await _respond_and_cache(cache_key, payload, timings, started, status=status, target=target)
 
         # JSON body workflow
         try:
-            import json
-            data = json.loads(request.body or b"{}")
+            data = ingest.read_json(request, {})
+        except ingest.RequestTooLarge as e:
+            return _too_large(e.limit, started)
         except Exception:
             data = {}
+        if not isinstance(data, dict):
+            return _json_response({"error": "invalid_json", "detail": "expected a JSON object"}, 400, started)
 
         text = (data.get("text") or "").strip()
         image_text = (data.get("image_text") or "").strip()
-        # Always enable AI extraction merge (still guarded/validated against source text)
-        use_ai = True
         source = text or image_text
-        print("source", source)
-        tests_raw, conf_extract = _extract_tests_raw(source)
-        ai_extract_used = False
-        if use_ai:
-            print("use_ai", use_ai)
-            print("entered use AI")
-            ai_raw, ai_conf = extract_tests_ai(source)
-            print("ai_raw", ai_raw)
-            print("ai_conf", ai_conf)
-            if ai_raw:
-                tests_raw = list(dict.fromkeys([*tests_raw, *ai_raw]))
-                conf_extract = max(conf_extract, ai_conf)
-                ai_extract_used = True
-        print("tests_raw", tests_raw)
         provided_tests_raw = data.get("tests_raw")
-        if isinstance(provided_tests_raw, list) and provided_tests_raw:
-            seen = set(tests_raw)
-            for item in provided_tests_raw:
-                if isinstance(item, str) and item.strip():
-                    if item.strip() not in seen:
-                        tests_raw.append(item.strip())
-                        seen.add(item.strip())
-
-        tests, conf_norm = _normalize_tests(tests_raw)
-        print("tests", tests)
-        if not tests:
-            if provided_tests_raw:
-                return JsonResponse({"status": "unprocessed", "reason": "hallucinated tests not present in input"}, status=400)
-            return JsonResponse({"status": "unprocessed", "reason": "no tests found"}, status=200)
-
-        summ = _summarize_tests(tests)
-        ai_out = summarize_with_ai(tests)
-        print("ai_out", ai_out)
-        if ai_out.get("_used") and ai_out.get("summary"):
-            summ["summary"] = ai_out["summary"]
-        if ai_out.get("_used") and ai_out.get("explanations"):
-            summ["explanations"] = ai_out["explanations"]
-
-        return JsonResponse({
-            "tests": tests,
-            "summary": summ.get("summary"),
-            "explanations": summ.get("explanations"),
-            "status": "ok",
-            "meta": {
-                "confidence": round(conf_extract, 2),
-                "normalization_confidence": round(conf_norm, 2),
-                "ai_extract_used": ai_extract_used,
-                "ai_summary_used": bool(ai_out.get("_used")),
-                "ai_summary_error": ai_out.get("error")
-            }
-        })
+        try:
+            target = history.target_from_json(data)
+        except history.InvalidTarget as e:
+            return _json_response({"error": "invalid_history", "detail": str(e)}, 400, started)
+        if target is not None and not history.authorized(request):
+            return _history_forbidden(started)
+        try:
+            patient = classify.parse_patient(data.get("patient"))
+        except ValueError as e:
+            return _json_response({"error": "invalid_patient", "detail": str(e)}, 400, started)
+        cache_key = result_cache.text_key(
+            source, provided_tests_raw if isinstance(provided_tests_raw, list) else None, patient,
+        )
+        if request.GET.get("stream") in ("1", "true") or data.get("stream") is True:
+            return _ndjson_response(_stream_process(
+                cache_key, source, provided_tests_raw, deadline, started, patient, target, client,
+            ))
+        hit = await _cache_hit(cache_key, started, target)
+        if hit is not None:
+            return hit
+        # Always enable AI extraction merge (still guarded/validated against source text)
+        payload, status = await _process_text(
+            source, provided_tests_raw, timings, deadline, use_ai=True, patient=patient, client=client,
+        )
+        return await _respond_and_cache(cache_key, payload, timings, started, status=status, target=target)
     except Exception as e:
-        return JsonResponse({"error": "server_error", "detail": str(e)}, status=500)
+        logger.exception("process_failed")
+        return _json_response({"error": "server_error", "detail": str(e)}, 500, started)
+
+
+def _batch_items(request: HttpRequest, max_reports: int) -> List:
+    """Reports from a JSON array, ``{"reports": [...]}``, or an NDJSON body.
+
+    Parsed while the body is read, stopping after ``max_reports + 1`` so an
+    over-long batch is refused without decoding the rest.
+    """
+    return list(itertools.islice(ingest.iter_reports(request), max_reports + 1))
+
+
+def _batch_source(item) -> Tuple[str, Optional[list], Optional[Dict], Optional[history.Target]]:
+    if isinstance(item, str):
+        return item.strip(), None, None, None
+    if isinstance(item, dict):
+        source = (item.get("text") or "").strip() or (item.get("image_text") or "").strip()
+        provided = item.get("tests_raw")
+        patient = classify.parse_patient(item.get("patient"))
+        return source, provided if isinstance(provided, list) else None, patient, history.target_from_json(item)
+    raise ValueError("report must be a string or an object")
+
+
+async def _batch_results(items: List, client: Optional[str] = None):
+    """Yield one NDJSON line per report, in input order, as each completes."""
+    semaphore = asyncio.Semaphore(getattr(settings, "BATCH_CONCURRENCY", 16))
+    summary_group: Dict[str, "asyncio.Future"] = {}
+    tasks: Dict[str, "asyncio.Task"] = {}
+    # Finished reports wait for their turn in input order (and for the bulk
+    # history write) with their tests stored column-wise.
+    columns = results.ResultColumns()
+
+    async def run(cache_key: str, source: str, provided: Optional[list], patient: Optional[Dict],
+                  rules: _Rules, timings: Dict[str, float]) -> Tuple[Dict, int, bool]:
+        async with semaphore:
+            payload, status = await _process_text(
+                source, provided, timings, _ai_deadline(), summary_group=summary_group, patient=patient,
+                client=client, rules=rules,
+            )
+        metrics.observe_stages(timings)
+        result_cache.set_result(cache_key, payload, status)
+        return columns.pack(payload), status, False
+
+    async def from_cache(cached: Tuple[Dict, int]) -> Tuple[Dict, int, bool]:
+        return columns.pack(cached[0]), cached[1], True
+
+    plan = []
+    # Identical reports in the same batch are processed once.
+    unique: Dict[str, Tuple[str, Optional[list], Optional[Dict]]] = {}
+    for index, item in enumerate(items):
+        try:
+            source, provided, patient, target = _batch_source(item)
+        except ValueError as e:
+            plan.append((index, item, None, None, str(e)))
+            continue
+        cache_key = result_cache.text_key(source, provided, patient)
+        if cache_key not in unique and cache_key not in tasks:
+            cached = result_cache.get_result(cache_key)
+            if cached is not None:
+                tasks[cache_key] = asyncio.ensure_future(from_cache(cached))
+            else:
+                unique[cache_key] = (source, provided, patient)
+        plan.append((index, item, cache_key, target, None))
+    # Rule extraction of every report not cached; their values are classified in one call.
+    timings = {key: {} for key in unique}
+    for (key, report), rules in zip(unique.items(), _rules_many(list(unique.values()), list(timings.values()))):
+        tasks[key] = asyncio.ensure_future(run(key, *report, rules, timings[key]))
+
+    # History rows are written in bulk, HISTORY_BULK_SIZE reports at a time.
+    bulk_size = getattr(settings, "HISTORY_BULK_SIZE", 1000)
+    pending: List[Tuple] = []
+
+    async def flush() -> None:
+        if not pending:
+            return
+        try:
+            await history.arecord_many([(target, key, columns[span]) for target, key, span in pending])
+        except Exception as e:
+            logger.warning("history_write_failed", extra={"error": type(e).__name__, "reports": len(pending)})
+        pending.clear()
+
+    started = time.perf_counter()
+    try:
+        for index, item, cache_key, target, error in plan:
+            report_id = item.get("id") if isinstance(item, dict) else None
+            if error is not None:
+                line = {"index": index, "id": report_id, "status": "unprocessed", "reason": "invalid_report", "detail": error, "http_status": 400}
+            else:
+                try:
+                    payload, status, hit = await tasks[cache_key]
+                    line = {"index": index, "id": report_id, **columns.unpack(copy.deepcopy(payload)), "http_status": status}
+                    line.setdefault("meta", {})["cache"] = "hit" if hit else "miss"
+                    if target is not None and status == 200 and line.get("tests"):
+                        pending.append((target, cache_key, payload["tests"]))
+                except Exception as e:
+                    logger.exception("batch_report_failed", extra={"index": index})
+                    line = {"index": index, "id": report_id, "error": "server_error", "detail": str(e), "http_status": 500}
+            t0 = time.perf_counter()
+            encoded = results.dumps(line) + b"\n"
+            done = time.perf_counter()
+            metrics.STAGE_SECONDS.observe(done - t0, stage="serialize")
+            # Time since the batch started: what the client waited for this line.
+            metrics.observe_request("batch", line["http_status"], done - started, (line.get("meta") or {}).get("cache"))
+            yield encoded
+            if len(pending) >= bulk_size:
+                await flush()
+        await flush()
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+@csrf_exempt
+async def process_batch(request: HttpRequest):
+    started = time.perf_counter()
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    max_reports = getattr(settings, "BATCH_MAX_REPORTS", 1000)
+    try:
+        items = _batch_items(request, max_reports)
+    except ingest.RequestTooLarge as e:
+        return _too_large(e.limit)
+    except ValueError as e:
+        return JsonResponse({"error": "invalid_batch", "detail": str(e)}, status=400)
+    if len(items) > max_reports:
+        return JsonResponse({"error": "batch_too_large", "max_reports": max_reports}, status=413)
+    if any(isinstance(item, dict) and item.get("patient_id") for item in items) and not history.authorized(request):
+        return _history_forbidden()
+    client = admission.client_key(request)
+    # One token per report, so batching does not get around the rate limit.
+    limited = _rate_limited("batch", client, started, cost=max(1, len(items)))
+    if limited is not None:
+        return limited
+    return _ndjson_response(_batch_results(items, client))
+
+
+@csrf_exempt
+async def jobs_create(request: HttpRequest):
+    """Queue a report (same inputs as /api/process, plus ``webhook_url``) and return its id at once."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    limited = _rate_limited("jobs", admission.client_key(request), time.perf_counter())
+    if limited is not None:
+        return limited
+    try:
+        max_bytes = ingest.upload_too_large(request)
+        if max_bytes:
+            return JsonResponse({"status": "unprocessed", "reason": "image_too_large", "max_bytes": max_bytes}, status=413)
+        if getattr(request, 'FILES', None) and request.FILES.get('image'):
+            uploaded = request.FILES['image']
+            target = history.parse_target(request.POST.get("patient_id"), request.POST.get("collected_at"))
+            if target is not None and not history.authorized(request):
+                return _history_forbidden()
+            job = await jobs.submit(
+                Job.IMAGE, upload=uploaded, cache_key=result_cache.bytes_key(uploaded.chunks()),
+                webhook_url=request.POST.get("webhook_url", ""),
+                history=target.to_json() if target else None,
+            )
+        else:
+            try:
+                data = ingest.read_json(request, {})
+            except ingest.RequestTooLarge as e:
+                return _too_large(e.limit)
+            except Exception:
+                data = {}
+            if not isinstance(data, dict):
+                return JsonResponse({"error": "invalid_request", "detail": "expected a JSON object"}, status=400)
+            source, provided, patient, target = _batch_source(data)
+            if target is not None and not history.authorized(request):
+                return _history_forbidden()
+            job = await jobs.submit(
+                Job.TEXT, source=source, tests_raw=provided, patient=patient,
+                cache_key=result_cache.text_key(source, provided, patient),
+                webhook_url=data.get("webhook_url") or "",
+                history=target.to_json() if target else None,
+            )
+    except jobs.InvalidWebhook as e:
+        return JsonResponse({"error": "invalid_webhook", "detail": str(e)}, status=400)
+    except history.InvalidTarget as e:
+        return JsonResponse({"error": "invalid_history", "detail": str(e)}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": "invalid_patient", "detail": str(e)}, status=400)
+    poll = reverse("job_detail", args=[job.pk])
+    response = JsonResponse({"id": str(job.pk), "status": job.status, "poll": poll}, status=202)
+    response["Location"] = poll
+    return response
+
+
+async def job_detail(request: HttpRequest, job_id):
+    try:
+        job = await Job.objects.defer("source").aget(pk=job_id)
+    except Job.DoesNotExist:
+        return JsonResponse({"error": "not_found"}, status=404)
+    # Restarts leave queued jobs behind; polling picks them back up.
+    jobs.ensure_worker()
+    return JsonResponse(jobs.job_payload(job))
+
+
+async def patient_trends(request: HttpRequest, patient_id: str):
+    """Per-analyte time series for a patient: ``?analyte=hemoglobin,wbc&since=&until=&limit=``."""
+    started = time.perf_counter()
+    if request.method != "GET":
+        return JsonResponse({"error": "GET required"}, status=405)
+    if not history.authorized(request):
+        metrics.observe_request("trends", 403, time.perf_counter() - started)
+        return _history_forbidden()
+    try:
+        history.parse_target(patient_id)
+        analytes = [a.strip() for value in request.GET.getlist("analyte") for a in value.split(",") if a.strip()]
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+        data = await history.atrends(
+            patient_id, analytes, request.GET.get("since"), request.GET.get("until"), limit,
+        )
+    except ValueError as e:
+        return JsonResponse({"error": "invalid_query", "detail": str(e)}, status=400)
+    response = HttpResponse(results.dumps(data), content_type="application/json")
+    metrics.observe_request("trends", 200, time.perf_counter() - started)
+    return response
+
+
+def metrics_view(request: HttpRequest):
+    if not getattr(settings, "METRICS_ENABLED", True):
+        return JsonResponse({"error": "not_found"}, status=404)
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 def ui(request: HttpRequest):
@@ -0,0 +1,39 @@
+"""Warm the process before it serves traffic.
+
+``warm()`` imports the URLconf and every module behind ``/api/process`` and
+runs one sample report through the rule-based stages, so regexes are
+compiled, registry and reference-range tables are built and NumPy has done
+its first-call setup. It makes no network calls, touches no database and
+starts no threads or processes, so it is safe in a gunicorn master before
+workers are forked (``preload_app``): the workers then share the warm pages.
+"""
+import logging
+import os
+import time
+
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE = (
+    "CBC: Hemoglobin 10.2 g/dL (Low), WBC 11,200 /uL (High), Platelets 250000 /uL\n"
+    "Glucose: 95 mg/dL\n"
+)
+
+
+def warm() -> float:
+    """Seconds spent warming up."""
+    started = time.perf_counter()
+    from django.urls import get_resolver
+
+    from . import ai, results, validation, views
+
+    get_resolver().resolve("/api/process")
+    candidates, _ = views._extract_tests_raw(_SAMPLE)
+    tests, _ = views._normalize_tests(candidates)
+    validation.validate(candidates, _SAMPLE)
+    results.dumps({"tests": tests})
+    if os.getenv("GROQ_API_KEY"):
+        ai.preload()
+    elapsed = time.perf_counter() - started
+    logger.info("warmup_done", extra={"seconds": round(elapsed, 4), "tests": len(tests)})
+    return elapsed
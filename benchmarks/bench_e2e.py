@@ -0,0 +1,164 @@
+"""End-to-end load test of ``POST /api/process`` with Groq replaced by the local stub.
+
+By default the ASGI app runs in-process (Django's async test client) and a
+stub with configurable latency and failure rate stands in for Groq, so the
+numbers include AI fan-out, deadlines and retries but no network. With
+``--url`` the requests go to an already running server instead; start that
+server with ``GROQ_BASE_URL`` pointing at a stub yourself.
+
+    python -m benchmarks.bench_e2e -n 500 --concurrency 32 --stub-latency 0.3 -o e2e.json
+
+``--distinct K`` draws the requests from only K different reports, the way a
+popular report is posted by many users at once; with the result cache off,
+``stub.calls`` then shows how many Groq calls coalescing saved.
+
+With more requests in flight than AI_MAX_CONCURRENCY + AI_MAX_PENDING, the
+excess AI calls are skipped; ``degraded`` counts the responses served from
+the rule-based path as a result.
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks import harness
+from benchmarks.corpus import generate_corpus
+
+
+async def _drive(post, bodies: List[bytes], concurrency: int) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    cache: Dict[str, int] = {}
+    degraded = 0
+    stage_ms: Dict[str, List[float]] = {}
+
+    async def one(body: bytes) -> None:
+        nonlocal degraded
+        async with semaphore:
+            t0 = time.perf_counter()
+            status, content = await post(body)
+            latencies.append(time.perf_counter() - t0)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        try:
+            meta = json.loads(content).get("meta") or {}
+        except ValueError:
+            return
+        cache[str(meta.get("cache"))] = cache.get(str(meta.get("cache")), 0) + 1
+        degraded += bool(meta.get("degraded"))
+        for stage, ms in (meta.get("timings_ms") or {}).items():
+            stage_ms.setdefault(stage, []).append(ms / 1e3)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(b) for b in bodies))
+    elapsed = time.perf_counter() - started
+    return {
+        "latency": harness.latency_stats(latencies, elapsed=elapsed),
+        "status": statuses,
+        "cache": cache,
+        "degraded": degraded,
+        "server_stages": {stage: harness.latency_stats(v) for stage, v in sorted(stage_ms.items())},
+    }
+
+
+def _in_process_poster():
+    from django.conf import settings
+    from django.test import AsyncClient
+
+    # What Django's test runner does for the test client's default host.
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+    client = AsyncClient()
+
+    async def post(body: bytes):
+        response = await client.post("/api/process", data=body, content_type="application/json")
+        return response.status_code, response.content
+
+    return post, None
+
+
+def _http_poster(url: str):
+    import httpx
+
+    client = httpx.AsyncClient(base_url=url, timeout=120.0)
+
+    async def post(body: bytes):
+        response = await client.post("/api/process", content=body, headers={"Content-Type": "application/json"})
+        return response.status_code, response.content
+
+    return post, client
+
+
+def run(args) -> Dict:
+    corpus = generate_corpus(min(args.n, args.distinct or args.n), args.seed, args.max_pages)
+    bodies = [json.dumps({"text": corpus[i % len(corpus)]["text"]}).encode() for i in range(args.n)]
+
+    stub = state = None
+    if args.url:
+        post, client = _http_poster(args.url)
+    else:
+        env = {"RESULT_CACHE_ENABLED": "1" if args.cache else "0"}
+        if not args.no_ai:
+            from benchmarks.groq_stub import serve
+
+            stub, state = serve(0, args.stub_latency, args.stub_jitter, args.fail_rate, background=True)
+            env["GROQ_API_KEY"] = "stub"
+            env["GROQ_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}"
+        harness.django_setup(ai=not args.no_ai, **env)
+        post, client = _in_process_poster()
+
+    async def main():
+        try:
+            return await _drive(post, bodies, args.concurrency)
+        finally:
+            if client is not None:
+                await client.aclose()
+
+    result = asyncio.run(main())
+    if stub is not None:
+        stub.shutdown()
+        result["stub"] = {"calls": state.calls, "failures": state.failures, "connections": state.connections}
+    if not args.url:
+        from api import metrics
+        from api.ai import breaker_state
+
+        result["ai_breaker"] = breaker_state()
+        result["ai_requests"] = {
+            "/".join(key): int(count) for key, count in sorted(metrics.AI_REQUESTS._values.items())
+        }
+        result["ai_degraded"] = {
+            "/".join(key): int(count) for key, count in sorted(metrics.DEGRADED._values.items())
+        }
+    return {
+        "benchmark": "e2e",
+        "environment": harness.environment(),
+        "params": {
+            "n": args.n, "distinct": args.distinct, "seed": args.seed, "max_pages": args.max_pages, "concurrency": args.concurrency,
+            "target": args.url or "in-process", "ai": not args.no_ai, "cache": args.cache,
+            "stub_latency": args.stub_latency, "stub_jitter": args.stub_jitter, "fail_rate": args.fail_rate,
+        },
+        **result,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=500, help="number of requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pages", type=int, default=3)
+    parser.add_argument("--distinct", type=int, default=0, help="cycle through this many different reports (0: all distinct)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stub-latency", type=float, default=0.3, help="seconds per stubbed Groq call")
+    parser.add_argument("--stub-jitter", type=float, default=0.1)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--no-ai", action="store_true", help="rule-based path only, no stub")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache enabled")
+    parser.add_argument("--url", help="benchmark a running server instead, e.g. http://127.0.0.1:8000")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    harness.emit(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,84 @@
+"""Compare the single-pass extractor with the original per-pattern loops.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_extraction [--sizes 1 10 100] [--repeat 5]
+"""
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from api import extraction
+from benchmarks.legacy_extraction import _extract_tests_raw as legacy_extract_tests_raw
+
+
+_LINES = [
+    "Hemglobin {hb} g/dL ({hb_s})",
+    "WBC Count: {wbc:,} /uL ({wbc_s})",
+    "RBC {rbc} million/uL",
+    "Platelet Count {plt:,} /uL",
+    "Hematocrit {hct} %",
+    "MCV {mcv} fL",
+    "MCH {mch} pg",
+    "MCHC {mchc} g/dL",
+    "Patient reviewed on {day} by Dr. Smith, no further comments.",
+]
+
+
+def synthetic_report(pages: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines: List[str] = []
+    for day in range(pages):
+        lines.append(f"Page {day + 1} - Complete Blood Count")
+        for tmpl in _LINES:
+            lines.append("- " + tmpl.format(
+                hb=round(rng.uniform(8, 17), 1), hb_s=rng.choice(["Low", "Hgh", "Normal"]),
+                wbc=rng.randint(3000, 15000), wbc_s=rng.choice(["Low", "High", "Normal"]),
+                rbc=round(rng.uniform(3.5, 6.5), 2), plt=rng.randint(100000, 500000),
+                hct=round(rng.uniform(30, 50), 1), mcv=rng.randint(70, 110),
+                mch=rng.randint(24, 36), mchc=round(rng.uniform(30, 38), 1), day=day,
+            ))
+        lines.append("Lorem ipsum dolor sit amet, " * 8)
+    return "\n".join(lines)
+
+
+def new_extract_tests_raw(text: str):
+    if not text:
+        return [], 0.0
+    candidates = extraction.extract(extraction.simple_ocr_text_cleanup(text))
+    return candidates, 0.8 if candidates else 0.0
+
+
+def _best_of(fn: Callable[[str], object], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'KB':>8} {'legacy ms':>10} {'new ms':>10} {'speedup':>8} {'tests':>6}")
+    for pages in args.sizes:
+        text = synthetic_report(pages)
+        legacy, _ = legacy_extract_tests_raw(text)
+        new, _ = new_extract_tests_raw(text)
+        t_legacy = _best_of(legacy_extract_tests_raw, text, args.repeat)
+        t_new = _best_of(new_extract_tests_raw, text, args.repeat)
+        print(
+            f"{pages:>6} {len(text) / 1024:>8.1f} {t_legacy * 1e3:>10.2f} {t_new * 1e3:>10.2f}"
+            f" {t_legacy / t_new:>7.1f}x {len(new):>6}"
+        )
+        if len(legacy) != len(new):
+            print(f"  warning: legacy found {len(legacy)} tests, new found {len(new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Patient history at scale: bulk insert rate and trend query latency.
+
+Creates a throwaway SQLite database, bulk-inserts ``--reports`` reports of
+synthetic CBC values spread over ``--patients`` patients through
+``api.history.record_many`` (the batch endpoint's path), then times
+``api.history.trends`` for random patients with and without an analyte
+filter, and records the query plan of the per-analyte series query::
+
+    python -m benchmarks.bench_history --patients 20000 --reports 200000 [-o history.json]
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import harness
+
+
+_ANALYTES = (
+    ("Hemoglobin", "g/dL", 9.0, 17.0),
+    ("WBC", "/uL", 3000, 15000),
+    ("Platelets", "/uL", 100000, 450000),
+    ("RBC", "million/uL", 3.5, 6.0),
+    ("Hematocrit", "%", 30, 52),
+)
+
+
+def _tests(rng: random.Random) -> List[Dict]:
+    return [
+        {"name": name, "value": round(rng.uniform(low, high), 1), "unit": unit, "status": "normal"}
+        for name, unit, low, high in _ANALYTES
+    ]
+
+
+def run(patients: int, reports: int, queries: int, chunk: int, seed: int) -> Dict:
+    from django.db import connection
+
+    from api import history
+    from api.models import LabValue
+
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    insert_s = 0.0
+    written = 0
+    while written < reports:
+        items = []
+        for i in range(written, min(reports, written + chunk)):
+            target = history.Target(f"p{rng.randrange(patients)}", start + timedelta(hours=rng.randrange(24 * 3650)))
+            items.append((target, f"report-{i}", _tests(rng)))
+        t0 = time.perf_counter()
+        history.record_many(items)
+        insert_s += time.perf_counter() - t0
+        written += len(items)
+    rows = LabValue.objects.count()
+
+    def timed(**kwargs) -> List[float]:
+        out = []
+        for _ in range(queries):
+            patient = f"p{rng.randrange(patients)}"
+            t0 = time.perf_counter()
+            history.trends(patient, **kwargs)
+            out.append(time.perf_counter() - t0)
+        return out
+
+    since = (start + timedelta(days=365 * 8)).isoformat()
+    series_sql, params = (
+        LabValue.objects.filter(patient_id="p1", analyte="hemoglobin")
+        .order_by("-collected_at", "-pk").values_list("collected_at", "value")[:101].query.sql_with_params()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + series_sql, params)
+        plan = [row[-1] for row in cursor.fetchall()]
+
+    return {
+        "benchmark": "history",
+        "environment": harness.environment(),
+        "params": {"patients": patients, "reports": reports, "queries": queries, "chunk": chunk, "seed": seed},
+        "rows": rows,
+        "insert": {
+            "seconds": round(insert_s, 3),
+            "reports_per_s": round(reports / insert_s, 1) if insert_s else 0.0,
+            "rows_per_s": round(rows / insert_s, 1) if insert_s else 0.0,
+        },
+        "trends_all_analytes": harness.latency_stats(timed()),
+        "trends_one_analyte": harness.latency_stats(timed(analytes=["hemoglobin"], limit=100)),
+        "trends_since": harness.latency_stats(timed(analytes=["hemoglobin"], since=since)),
+        "series_query_plan": plan,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--reports", type=int, default=100000, help="each report stores 5 values")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--chunk", type=int, default=1000, help="reports per record_many call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        harness.django_setup(DATABASE_PATH=os.path.join(tmp, "history.sqlite3"))
+        from django.core.management import call_command
+
+        call_command("migrate", verbosity=0)
+        result = run(args.patients, args.reports, args.queries, args.chunk, args.seed)
+    harness.emit(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
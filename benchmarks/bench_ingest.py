@@ -0,0 +1,201 @@
+"""Server memory while ingesting large request bodies concurrently.
+
+Each scenario starts a fresh ``uvicorn`` server (lean profile, no provider
+key, result cache off) and sends ``--concurrency`` large requests at once:
+
+- ``upload``: multipart image uploads of ``--upload-mb`` MB (uncompressed BMP).
+- ``upload_too_large``: uploads just over ``OCR_MAX_UPLOAD_BYTES``; the server
+  should answer 413 without keeping them.
+- ``batch_ndjson`` / ``batch_json``: ``/api/process/batch`` bodies of
+  ``--batch-mb`` MB.
+
+Reported per scenario: status counts, latency, and peak resident memory
+(``VmHWM``) of the server process and of its OCR worker processes, next to
+the server's resident memory before the requests. Linux only (reads
+``/proc``). OCR needs ``tesseract``; without it uploads are still received,
+spooled and decoded, then fail with 400 ``ocr_failed``::
+
+    python -m benchmarks.bench_ingest --concurrency 8 --upload-mb 8 [-o ingest.json]
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from benchmarks import harness
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _bmp(megabytes: float) -> bytes:
+    """An 8-bit grayscale BMP of about ``megabytes`` MB with a little text-like noise."""
+    side = int((megabytes * 1024 * 1024) ** 0.5) // 4 * 4
+    palette = b"".join(bytes((i, i, i, 0)) for i in range(256))
+    offset = 14 + 40 + len(palette)
+    header = b"BM" + struct.pack("<IHHI", offset + side * side, 0, 0, offset)
+    info = struct.pack("<IiiHHIIiiII", 40, side, side, 1, 8, 0, side * side, 2835, 2835, 256, 0)
+    row = bytes(255 if (x // 7) % 5 else 0 for x in range(side))
+    blank = b"\xff" * side
+    return header + info + palette + b"".join(row if (y // 9) % 4 == 0 else blank for y in range(side))
+
+
+def _batch(megabytes: float, ndjson: bool, count: int = 900) -> bytes:
+    """``count`` reports (within BATCH_MAX_REPORTS), padded to about ``megabytes`` MB in all."""
+    text = "Hemoglobin 10.2 g/dL (Low)\nWBC 11,200 /uL (High)\nPlatelet Count 250,000 /uL\n"
+    padding = max(0, int(megabytes * 1024 * 1024 / count) - len(text) - 16)
+    line = json.dumps({"text": text + "Comment: " + "x" * padding})
+    if ndjson:
+        return ("\n".join([line] * count) + "\n").encode()
+    return ("[" + ",".join([line] * count) + "]").encode()
+
+
+def _status_kb(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid: int) -> List[int]:
+    out = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as fh:
+                out.extend(int(p) for p in fh.read().split())
+    except OSError:
+        pass
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(env: Dict[str, str]):
+    port = _free_port()
+    child_env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+    child_env.update({
+        "API_LEAN": "1", "GROQ_API_KEY": "", "RESULT_CACHE_ENABLED": "0", "LOG_LEVEL": "ERROR",
+        "JOBS_EMBEDDED_WORKER": "0", **env,
+    })
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "medical_simplifier.asgi:application", "--port", str(port),
+         "--log-level", "error", "--no-access-log"],
+        cwd=ROOT, env=child_env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return server, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+async def _send(url: str, concurrency: int, request) -> Dict:
+    import httpx
+
+    statuses: Dict[str, int] = {}
+    latencies: List[float] = []
+    async with httpx.AsyncClient(base_url=url, timeout=300.0) as client:
+        async def one() -> None:
+            t0 = time.perf_counter()
+            try:
+                status = str((await request(client)).status_code)
+            except httpx.TransportError as e:
+                # e.g. the server closed the connection before the body was sent.
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"status": statuses, "latency": harness.latency_stats(latencies, elapsed=elapsed)}
+
+
+def _scenario(name: str, concurrency: int, request, env: Dict[str, str]) -> Dict:
+    server, url = _start(env)
+    try:
+        import httpx
+
+        # One small request first so lazily created pools exist before measuring.
+        httpx.post(url + "/api/process", json={"text": "Hemoglobin 10 g/dL"}, timeout=60)
+        before = _status_kb(server.pid, "VmRSS")
+        result = asyncio.run(_send(url, concurrency, request))
+        workers = _children(server.pid)
+        result.update({
+            "server_rss_before_mb": round(before / 1024, 1),
+            "server_peak_rss_mb": round(_status_kb(server.pid, "VmHWM") / 1024, 1),
+            "workers_peak_rss_mb": [round(_status_kb(p, "VmHWM") / 1024, 1) for p in workers],
+        })
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run(concurrency: int, upload_mb: float, batch_mb: float, scenarios: List[str]) -> Dict:
+    image = _bmp(upload_mb)
+    limit = len(image) + 1024 * 1024
+    too_large = _bmp((limit + 2 * 1024 * 1024) / (1024 * 1024))
+    env = {"OCR_MAX_UPLOAD_BYTES": str(limit), "OCR_MAX_PENDING": str(concurrency)}
+    ndjson, array = _batch(batch_mb, True), _batch(batch_mb, False)
+
+    def upload(data: bytes):
+        return lambda c: c.post("/api/process", files={"image": ("scan.bmp", data, "image/bmp")})
+
+    def batch(data: bytes, content_type: str):
+        return lambda c: c.post("/api/process/batch", content=data, headers={"Content-Type": content_type})
+
+    requests = {
+        "upload": upload(image),
+        "upload_too_large": upload(too_large),
+        "batch_ndjson": batch(ndjson, "application/x-ndjson"),
+        "batch_json": batch(array, "application/json"),
+    }
+    out = {}
+    for name in scenarios:
+        out[name] = _scenario(name, concurrency, requests[name], env)
+    return {
+        "benchmark": "ingest",
+        "environment": harness.environment(),
+        "params": {
+            "concurrency": concurrency, "upload_bytes": len(image), "too_large_bytes": len(too_large),
+            "upload_limit_bytes": limit, "batch_ndjson_bytes": len(ndjson), "batch_json_bytes": len(array),
+        },
+        "scenarios": out,
+    }
+
+
+SCENARIOS = ("upload", "upload_too_large", "batch_ndjson", "batch_json")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--upload-mb", type=float, default=8.0)
+    parser.add_argument("--batch-mb", type=float, default=8.0)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="default: all")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    harness.emit(run(args.concurrency, args.upload_mb, args.batch_mb, args.scenario or list(SCENARIOS)), args.output)
+
+
+if __name__ == "__main__":
+    main()
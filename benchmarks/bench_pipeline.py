@@ -0,0 +1,91 @@
+"""Per-stage latency and throughput of the rule-based pipeline.
+
+Each synthetic report goes through OCR cleanup, extraction, normalization and
+the rule summary, timed individually. Extraction recall and precision against
+the generator's ground truth guard against a faster but wrong change.
+
+Run from the repository root and compare across commits::
+
+    python -m benchmarks.bench_pipeline -n 2000 -o before.json
+    python -m benchmarks.bench_pipeline -n 2000 -o after.json
+    python -m benchmarks.compare before.json after.json
+"""
+from typing import Callable, Dict, List
+import argparse
+import gc
+import time
+
+from benchmarks import harness
+from benchmarks.corpus import generate_corpus
+
+
+STAGES = ("cleanup", "extract", "normalize", "summarize", "pipeline")
+
+
+def _timed(fn: Callable, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def run(n: int, seed: int, max_pages: int, noise: float, warmup: int) -> Dict:
+    from api import extraction, registry, views
+
+    corpus = generate_corpus(n, seed, max_pages, noise)
+    for record in corpus[:warmup]:
+        views._summarize_tests(views._normalize_tests(views._extract_tests_raw(record["text"])[0])[0])
+
+    latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    expected_total = found_total = true_positive = 0
+    gc.collect()
+    for record in corpus:
+        text = record["text"]
+        _, t_cleanup = _timed(extraction.simple_ocr_text_cleanup, text)
+        (tests_raw, _), t_extract = _timed(views._extract_tests_raw, text)
+        (tests, _), t_normalize = _timed(views._normalize_tests, tests_raw)
+        _, t_summarize = _timed(views._summarize_tests, tests)
+        latencies["cleanup"].append(t_cleanup)
+        latencies["extract"].append(t_extract)
+        latencies["normalize"].append(t_normalize)
+        latencies["summarize"].append(t_summarize)
+        # extract already includes cleanup.
+        latencies["pipeline"].append(t_extract + t_normalize + t_summarize)
+
+        found = {registry.BY_NAME[t["name"]].key for t in tests if t.get("name") in registry.BY_NAME}
+        expected = set(record["expected"])
+        expected_total += len(expected)
+        found_total += len(found)
+        true_positive += len(found & expected)
+
+    nbytes = sum(len(r["text"].encode("utf-8")) for r in corpus)
+    return {
+        "benchmark": "pipeline",
+        "environment": harness.environment(),
+        "params": {"n": n, "seed": seed, "max_pages": max_pages, "noise": noise, "corpus_bytes": nbytes},
+        "stages": {
+            stage: harness.latency_stats(values, nbytes=nbytes if stage != "summarize" else 0)
+            for stage, values in latencies.items()
+        },
+        "accuracy": {
+            "recall": round(true_positive / expected_total, 4) if expected_total else 1.0,
+            "precision": round(true_positive / found_total, 4) if found_total else 1.0,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=2000, help="number of reports")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pages", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    harness.django_setup()
+    harness.emit(run(args.n, args.seed, args.max_pages, args.noise, args.warmup), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Memory and serialization cost of normalized test results.
+
+Compares the per-test dicts the pipeline used to build with ``LabResult``
+objects and with ``ResultColumns``, both in memory and pickled (what a
+``simplify_reports`` worker sends back per chunk), and times JSON encoding of the same
+payloads with the stdlib encoder and with ``api.results.dumps``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_results -n 2000 [--repeat 5] [-o results.json]
+"""
+from typing import Callable, Dict
+import argparse
+import gc
+import json
+import pickle
+import time
+import tracemalloc
+
+from benchmarks import harness
+from benchmarks.corpus import generate_corpus
+
+
+def _legacy_dict(t) -> Dict:
+    # What _normalize_tests built before LabResult: a dict and a nested dict per test.
+    data = {"name": t.name, "value": t.value, "unit": t.unit, "status": t.status}
+    if t.ref_range is not None:
+        data["ref_range"] = {"low": t.ref_range.low, "high": t.ref_range.high}
+    return data
+
+
+def _allocated(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def _best_of(fn: Callable, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(n: int, seed: int, repeat: int) -> Dict:
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    from api import results, views
+
+    corpus = generate_corpus(n, seed, 3, 0.2)
+    reports = [views._normalize_tests(views._extract_tests_raw(r["text"])[0])[0] for r in corpus]
+    flat = [t for tests in reports for t in tests]
+
+    memory = {
+        "dicts": _allocated(lambda: [_legacy_dict(t) for t in flat]),
+        "lab_results": _allocated(lambda: [results.LabResult(t.name, t.value, t.unit, t.status, t.ref_range) for t in flat]),
+        "columns": _allocated(lambda: results.ResultColumns(flat)),
+    }
+    memory_out = {
+        name: {"bytes": size, "bytes_per_test": round(size / len(flat), 1) if flat else 0.0}
+        for name, size in memory.items()
+    }
+    pickled = {
+        "lab_results": len(pickle.dumps(list(flat), pickle.HIGHEST_PROTOCOL)),
+        "columns": len(pickle.dumps(results.ResultColumns(flat), pickle.HIGHEST_PROTOCOL)),
+    }
+    pickled_out = {
+        name: {"bytes": size, "bytes_per_test": round(size / len(flat), 1) if flat else 0.0}
+        for name, size in pickled.items()
+    }
+
+    legacy_payloads = [{"tests": [_legacy_dict(t) for t in tests], "status": "ok"} for tests in reports]
+    payloads = [{"tests": tests, "status": "ok"} for tests in reports]
+    encoders = {
+        "stdlib_dicts": lambda: [json.dumps(p, cls=DjangoJSONEncoder) for p in legacy_payloads],
+        "stdlib_lab_results": lambda: [json.dumps(p, cls=results.ResultEncoder) for p in payloads],
+    }
+    if results.orjson is not None:
+        encoders["orjson_lab_results"] = lambda: [results.dumps(p) for p in payloads]
+    serialize = {}
+    for name, fn in encoders.items():
+        elapsed = _best_of(fn, repeat)
+        serialize[name] = {
+            "total_ms": round(elapsed * 1e3, 3),
+            "per_report_us": round(elapsed / len(payloads) * 1e6, 3) if payloads else 0.0,
+        }
+
+    return {
+        "benchmark": "results",
+        "environment": harness.environment(),
+        "params": {"n": n, "seed": seed, "repeat": repeat, "tests": len(flat), "orjson": results.orjson is not None},
+        "memory": memory_out,
+        "pickled": pickled_out,
+        "serialize": serialize,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=2000, help="number of reports")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="serialization runs; the best is reported")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    harness.django_setup()
+    harness.emit(run(args.n, args.seed, args.repeat), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Cold-start cost: from interpreter start to the first ``/api/process`` response.
+
+Each run starts a fresh Python process that imports the ASGI application
+(``medical_simplifier.asgi``, including the warm-up) and sends one report
+straight to it, with no server or sockets involved. Reported per profile:
+
+- ``import_ms``: importing the app, which covers Django setup, the URLconf and the warm-up.
+- ``first_request_ms`` / ``second_request_ms``: the first two responses.
+- ``process_ms``: wall time of the whole child process as seen by the parent.
+- ``modules``: how many modules were loaded by the end.
+
+The profiles are ``full`` (all contrib apps), ``lean`` (``API_LEAN=1``) and
+``lean-nowarm`` (``API_LEAN=1 APP_WARMUP=0``). No provider key is set, so the
+rule-based path runs and nothing leaves the machine::
+
+    python -m benchmarks.bench_startup --runs 7 [-o startup.json]
+"""
+from typing import Dict, List, Optional
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import harness
+
+
+PROFILES = {
+    "full": {"API_LEAN": "0", "APP_WARMUP": "1"},
+    "lean": {"API_LEAN": "1", "APP_WARMUP": "1"},
+    "lean-nowarm": {"API_LEAN": "1", "APP_WARMUP": "0"},
+}
+
+_CHILD = r'''
+import time
+t0 = time.perf_counter()
+import asyncio, json, os, sys
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "medical_simplifier.settings")
+from medical_simplifier.asgi import application
+t1 = time.perf_counter()
+
+BODY = json.dumps({"text": "Hemoglobin 10.2 g/dL (Low)\nWBC 11,200 /uL (High)\nPlatelets 250,000 /uL"}).encode()
+
+
+async def call():
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/process", "raw_path": b"/api/process", "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+        "headers": [(b"host", b"localhost"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(BODY)).encode())],
+    }
+    pending = [{"type": "http.request", "body": BODY, "more_body": False}]
+    status = []
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+async def main():
+    first = await call()
+    t2 = time.perf_counter()
+    await call()
+    return first, t2, time.perf_counter()
+
+status, t2, t3 = asyncio.run(main())
+print(json.dumps({
+    "status": status,
+    "import_ms": (t1 - t0) * 1e3,
+    "first_request_ms": (t2 - t1) * 1e3,
+    "second_request_ms": (t3 - t2) * 1e3,
+    "modules": len(sys.modules),
+}))
+'''
+
+
+def _child_env(profile: Dict[str, str]) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k != "GROQ_API_KEY"}
+    env.update(profile)
+    # An empty key also stops settings.py's .env from supplying one.
+    env.update({"GROQ_API_KEY": "", "RESULT_CACHE_ENABLED": "0", "LOG_LEVEL": "WARNING"})
+    return env
+
+
+def _one(profile: Dict[str, str]) -> Dict:
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD], env=_child_env(profile), capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True,
+    )
+    sample = json.loads(out.stdout.strip().splitlines()[-1])
+    sample["process_ms"] = (time.perf_counter() - started) * 1e3
+    return sample
+
+
+def run(runs: int, profiles: List[str]) -> Dict:
+    out = {}
+    for name in profiles:
+        samples = [_one(PROFILES[name]) for _ in range(runs)]
+        statuses = {s["status"] for s in samples}
+        out[name] = {
+            "status": sorted(statuses),
+            "modules": samples[-1]["modules"],
+            **{
+                field: round(statistics.median(s[field] for s in samples), 2)
+                for field in ("import_ms", "first_request_ms", "second_request_ms", "process_ms")
+            },
+        }
+    return {
+        "benchmark": "startup",
+        "environment": harness.environment(),
+        "params": {"runs": runs, "profiles": profiles, "statistic": "median"},
+        "profiles": out,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="child processes per profile")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES), help="default: all")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    harness.emit(run(args.runs, args.profile or list(PROFILES)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare two benchmark JSON results (``bench_pipeline`` or ``bench_e2e``).
+
+    python -m benchmarks.compare before.json after.json [--threshold 10] [--strict]
+
+Prints p50/p99 latency and throughput per stage with the relative change.
+With ``--strict`` the exit status is 1 when any p50 or p99 regresses by more
+than ``--threshold`` percent, so it can gate a CI job.
+"""
+from typing import Dict, List, Tuple
+import argparse
+import json
+import sys
+
+
+_METRICS = ("p50_ms", "p99_ms", "throughput_per_s")
+
+
+def _sections(result: Dict) -> Dict[str, Dict]:
+    if result.get("benchmark") == "e2e":
+        sections = {"request": result.get("latency") or {}}
+        sections.update({f"server:{k}": v for k, v in (result.get("server_stages") or {}).items()})
+        return sections
+    return result.get("stages") or {}
+
+
+def compare(before: Dict, after: Dict, threshold: float) -> Tuple[List[str], bool]:
+    lines = [f"{'stage':<22} {'metric':<18} {'before':>12} {'after':>12} {'change':>9}"]
+    regressed = False
+    old, new = _sections(before), _sections(after)
+    for stage in sorted(set(old) & set(new)):
+        for metric in _METRICS:
+            a, b = old[stage].get(metric), new[stage].get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a * 100.0
+            # Latency going up and throughput going down are both regressions.
+            worse = change > threshold if metric.endswith("_ms") else change < -threshold
+            if worse and metric != "throughput_per_s":
+                regressed = True
+            flag = "  <-- worse" if worse else ""
+            lines.append(f"{stage:<22} {metric:<18} {a:>12.4f} {b:>12.4f} {change:>+8.1f}%{flag}")
+    for key in ("accuracy", "status"):
+        if before.get(key) != after.get(key):
+            lines.append(f"{key}: {before.get(key)} -> {after.get(key)}")
+    return lines, regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change to flag")
+    parser.add_argument("--strict", action="store_true", help="exit 1 on a latency regression")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as fh:
+        before = json.load(fh)
+    with open(args.after, encoding="utf-8") as fh:
+        after = json.load(fh)
+    envs = (before.get("environment") or {}, after.get("environment") or {})
+    print(f"before: {envs[0].get('commit', '?')}  after: {envs[1].get('commit', '?')}")
+    lines, regressed = compare(before, after, args.threshold)
+    print("\n".join(lines))
+    if args.strict and regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Synthetic CBC-style lab reports for benchmarks and load tests.
+
+Reports vary in size (pages), layout (one test per line vs. inline
+comma-separated), number formatting (``12,000`` vs. ``12000``) and OCR noise
+(``Hemglobin``, ``Platelel``, ``WBG``, ``Hgh``, lower-case ``wbc``/``/ul``,
+stray tabs). Each record carries the analyte keys it contains so extraction
+recall can be checked.
+
+Generate a JSONL corpus usable by ``/api/process/batch`` and
+``manage.py simplify_reports``::
+
+    python -m benchmarks.corpus -n 1000 --seed 1 -o corpus.jsonl
+"""
+from typing import Dict, List, Optional
+import argparse
+import json
+import random
+import sys
+
+
+# key -> (line template, value generator); every value carries its unit.
+_ANALYTES = {
+    "hemoglobin": ("{name} {value} g/dL", lambda r: round(r.uniform(8, 17), 1)),
+    "wbc": ("{name} {value} /uL", lambda r: r.randint(3000, 15000)),
+    "rbc": ("{name} {value} million/uL", lambda r: round(r.uniform(3.5, 6.5), 2)),
+    "platelet": ("{name} {value} /uL", lambda r: r.randint(100000, 500000)),
+    "hematocrit": ("{name} {value} %", lambda r: round(r.uniform(30, 50), 1)),
+    "mcv": ("{name} {value} fL", lambda r: r.randint(70, 110)),
+    "mch": ("{name} {value} pg", lambda r: r.randint(24, 36)),
+    "mchc": ("{name} {value} g/dL", lambda r: round(r.uniform(30, 38), 1)),
+}
+
+_NAMES = {
+    "hemoglobin": ["Hemoglobin"],
+    "wbc": ["WBC", "WBC Count"],
+    "rbc": ["RBC", "RBC Count"],
+    "platelet": ["Platelet Count", "Platelet"],
+    "hematocrit": ["Hematocrit"],
+    "mcv": ["MCV"],
+    "mch": ["MCH"],
+    "mchc": ["MCHC"],
+}
+
+# What tesseract tends to get wrong on scanned CBC reports.
+_NOISY_NAMES = {
+    "hemoglobin": ["Hemglobin", "HEMOGLOBIN", "Hemoglobn", "Hemog1obin"],
+    "wbc": ["wbc", "Wbc Count", "WBG"],
+    "platelet": ["Platelel Count", "Plateiet"],
+    "hematocrit": ["Hematocrt", "Hernatocrit"],
+}
+_NOISY_STATUS = {"High": ["Hgh", "Hg", "HIGH", "Hihg"], "Low": ["low", "LOW", "L0w"], "Normal": ["normal", "Nromal"]}
+
+_FILLER = [
+    "Complete Blood Count (CBC)",
+    "Specimen: whole blood (EDTA). Collected 08:10, reported 11:45.",
+    "Reviewed by Dr. Smith, MD. No further comments.",
+    "Reference ranges apply to adults; interpret with clinical context.",
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+]
+
+
+def _value_text(value, commas: bool) -> str:
+    if isinstance(value, int) and value >= 1000 and commas:
+        return f"{value:,}"
+    return str(value)
+
+
+def _test_text(key: str, rng: random.Random, noise: float, commas: bool) -> str:
+    template, gen = _ANALYTES[key]
+    name = rng.choice(_NAMES[key])
+    if key in _NOISY_NAMES and rng.random() < noise:
+        name = rng.choice(_NOISY_NAMES[key])
+    text = template.format(name=name, value=_value_text(gen(rng), commas))
+    if rng.random() < noise:
+        text = text.replace("/uL", "/ul").replace(" ", rng.choice([" ", "  ", "\t"]), 1)
+    if rng.random() < 0.3:
+        text = text.replace(name, name + ":", 1)
+    if rng.random() < 0.6:
+        status = rng.choice(["Low", "High", "Normal"])
+        if rng.random() < noise:
+            status = rng.choice(_NOISY_STATUS[status])
+        text += rng.choice([" ", ", "]) + f"({status})"
+    return text
+
+
+def synthetic_report(
+    pages: int = 1,
+    seed: int = 0,
+    noise: float = 0.2,
+    layout: Optional[str] = None,
+    commas: Optional[bool] = None,
+    panel: Optional[List[str]] = None,
+) -> str:
+    return synthetic_record(pages, seed, noise, layout, commas, panel)["text"]
+
+
+def synthetic_record(
+    pages: int = 1,
+    seed: int = 0,
+    noise: float = 0.2,
+    layout: Optional[str] = None,
+    commas: Optional[bool] = None,
+    panel: Optional[List[str]] = None,
+) -> Dict:
+    """One report plus the analyte keys it contains.
+
+    ``layout`` is ``"list"`` or ``"inline"`` and ``commas`` controls
+    thousands separators; both are drawn at random when ``None``.
+    """
+    rng = random.Random(seed)
+    layout = layout or rng.choice(["list", "inline"])
+    commas = rng.random() < 0.5 if commas is None else commas
+    keys = list(panel or _ANALYTES)
+    lines: List[str] = []
+    seen = set()
+    for page in range(pages):
+        lines.append(f"Page {page + 1} - " + rng.choice(_FILLER))
+        page_keys = keys if panel else rng.sample(keys, rng.randint(3, len(keys)))
+        seen.update(page_keys)
+        tests = [_test_text(k, rng, noise, commas) for k in page_keys]
+        if layout == "inline":
+            lines.append(", ".join(tests) + ".")
+        else:
+            lines.extend(rng.choice(["- ", "", "* "]) + t for t in tests)
+        lines.append(rng.choice(_FILLER))
+    return {
+        "id": f"synthetic-{seed}",
+        "text": "\n".join(lines),
+        "expected": sorted(seen),
+        "layout": layout,
+        "pages": pages,
+    }
+
+
+def generate_corpus(n: int, seed: int = 0, max_pages: int = 3, noise: float = 0.2) -> List[Dict]:
+    """``n`` reports with sizes skewed toward one page, as in production."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        pages = 1 if rng.random() < 0.7 else rng.randint(2, max(2, max_pages))
+        corpus.append(synthetic_record(pages, seed=seed * 1_000_003 + i, noise=noise))
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=1000, help="number of reports")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pages", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.2, help="probability of each OCR error")
+    parser.add_argument("-o", "--output", help="JSONL file (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for record in generate_corpus(args.n, args.seed, args.max_pages, args.noise):
+            out.write(json.dumps({"id": record["id"], "text": record["text"]}) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
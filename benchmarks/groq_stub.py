@@ -0,0 +1,134 @@
+"""Local stand-in for the Groq chat completions API.
+
+Point the app at it with ``GROQ_BASE_URL=http://127.0.0.1:8765`` (any
+non-empty ``GROQ_API_KEY``). Latency and failures are configurable so
+timeouts, retries and the circuit breaker can be exercised offline::
+
+    python -m benchmarks.groq_stub --port 8765 --latency 0.2 --fail-rate 0.1
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+import argparse
+import json
+import random
+import re
+import threading
+import time
+
+
+_TEST_RE = re.compile(r"([A-Za-z][A-Za-z ]+?)\s*:?\s*([0-9][0-9,.]*)\s*([%A-Za-z/]+)(?:\s*\((Low|High|Normal)\))?")
+
+
+def _extraction_reply(text: str) -> Dict:
+    tests = [m.group(0).strip() for m in _TEST_RE.finditer(text)]
+    return {"tests_raw": tests, "confidence": 0.9 if tests else 0.0}
+
+
+def _summary_reply(compact: str) -> Dict:
+    abnormal: List[str] = []
+    for line in compact.splitlines():
+        m = re.match(r"(.+?):.*\[(low|high)\]", line)
+        if m:
+            abnormal.append(f"{m.group(2)} {m.group(1).lower()}")
+    summary = ", ".join(abnormal).capitalize() + "." if abnormal else "All results are within range."
+    return {"summary": summary, "explanations": [f"Stub explanation for {a}." for a in abnormal[:4]]}
+
+
+class StubState:
+    def __init__(self, latency: float, jitter: float, fail_rate: float, fail_status: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        # TCP connections accepted; far below ``calls`` when clients keep connections alive.
+        self.connections = 0
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def _send(self, status: int, body: Dict) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            try:
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up (timeout); that is the point of the stub.
+                pass
+
+        def do_GET(self):
+            with state.lock:
+                self._send(200, {"calls": state.calls, "failures": state.failures, "connections": state.connections})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with state.lock:
+                state.calls += 1
+                fail = random.random() < state.fail_rate
+                if fail:
+                    state.failures += 1
+            time.sleep(max(0.0, state.latency + random.uniform(-state.jitter, state.jitter)))
+            if fail:
+                self._send(state.fail_status, {"error": {"message": "stub failure", "type": "server_error"}})
+                return
+            messages = request.get("messages") or [{}, {}]
+            system, user = messages[0].get("content", ""), messages[-1].get("content", "")
+            reply = _summary_reply(user) if '"summary"' in system else _extraction_reply(user)
+            self._send(200, {
+                "id": f"stub-{state.calls}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": json.dumps(reply)},
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+    return Handler
+
+
+def serve(port: int = 8765, latency: float = 0.0, jitter: float = 0.0, fail_rate: float = 0.0,
+          fail_status: int = 503, background: bool = False):
+    state = StubState(latency, jitter, fail_rate, fail_status)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, state
+    server.serve_forever()
+    return server, state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+    print(f"Groq stub listening on http://127.0.0.1:{args.port}")
+    serve(args.port, args.latency, args.jitter, args.fail_rate, args.fail_status)
+
+
+if __name__ == "__main__":
+    main()
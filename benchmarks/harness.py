@@ -0,0 +1,84 @@
+"""Shared helpers for the benchmark scripts: latency statistics and JSON output."""
+from typing import Dict, List, Optional
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+
+
+def django_setup(ai: bool = False, **env: str) -> None:
+    """Configure Django for a benchmark run; ``env`` overrides settings read from the environment.
+
+    Unless ``ai`` is set, no provider key is visible after setup, so every
+    request takes the rule-based path and nothing leaves the machine.
+    """
+    for key, value in env.items():
+        os.environ[key] = value
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "medical_simplifier.settings")
+    import django
+
+    django.setup()
+    if not ai:
+        # settings.py loads .env, which may define a key.
+        os.environ.pop("GROQ_API_KEY", None)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(q / 100.0 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def latency_stats(latencies: List[float], elapsed: Optional[float] = None, nbytes: int = 0) -> Dict:
+    """Summary of per-item latencies (seconds); ``elapsed`` defaults to their sum."""
+    values = sorted(latencies)
+    elapsed = sum(values) if elapsed is None else elapsed
+    stats = {
+        "n": len(values),
+        "throughput_per_s": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1e3, 4) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1e3, 4),
+        "p90_ms": round(percentile(values, 90) * 1e3, 4),
+        "p99_ms": round(percentile(values, 99) * 1e3, 4),
+        "max_ms": round(values[-1] * 1e3, 4) if values else 0.0,
+    }
+    if nbytes:
+        stats["mb_per_s"] = round(nbytes / elapsed / 1e6, 3) if elapsed else 0.0
+    return stats
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def environment() -> Dict:
+    """Where and on what revision a result was measured."""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def emit(result: Dict, output: Optional[str]) -> None:
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+        print(f"wrote {output}", file=sys.stderr)
+    else:
+        print(text)
@@ -0,0 +1,120 @@
+"""Frozen copy of the original per-pattern extractor, kept as a benchmark baseline."""
+from typing import List, Tuple
+import re
+
+
+def _simple_ocr_text_cleanup(text: str) -> str:
+    if not text:
+        return ""
+    fixes = {
+        r"\bHemglobin\b": "Hemoglobin",
+        r"\bHgh\b": "High",
+        r"\bHg\b": "High",
+        r"\bWBC\b": "WBC",
+        r"\bCBC\b": "CBC",
+        r"\b/uL\b": "/uL",
+    }
+    cleaned = text
+    for pattern, repl in fixes.items():
+        cleaned = re.sub(pattern, repl, cleaned, flags=re.IGNORECASE)
+    cleaned = re.sub(r",?\s*\(Low\)|,?\s*\(High\)|,?\s*\(Normal\)", lambda m: f" ({m.group(0).strip(' ,()')})", cleaned, flags=re.IGNORECASE)
+    # Do not collapse newlines here; preserve structure for line parsing
+    cleaned = re.sub(r"[\t\r]+", " ", cleaned)
+    return cleaned
+
+
+def _extract_tests_raw(text: str) -> Tuple[List[str], float]:
+    if not text:
+        return [], 0.0
+    cleaned = _simple_ocr_text_cleanup(text)
+    flat = re.sub(r"\s+", " ", cleaned).strip()
+
+    candidates: List[str] = []
+    patterns = [
+        # Hemoglobin with optional colon
+        r"Hemoglobin\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?",
+        # WBC or WBC Count with optional colon
+        r"WBC(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?",
+        # RBC Count in million/uL
+        r"RBC(?:\s*Count)?\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:million)?\s*/?uL(?:\s*\((Low|High|Normal)\))?",
+        # Platelet Count
+        r"Platelet(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?",
+        # Hematocrit %
+        r"Hematocrit\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*%(?:\s*\((Low|High|Normal)\))?",
+        # MCV fL
+        r"MCV\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*fL(?:\s*\((Low|High|Normal)\))?",
+        # MCH pg
+        r"MCH\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*pg(?:\s*\((Low|High|Normal)\))?",
+        # MCHC g/dL
+        r"MCHC\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?",
+    ]
+    for pat in patterns:
+        for m in re.finditer(pat, flat, flags=re.IGNORECASE):
+            start, end = m.span()
+            snippet = flat[start:end]
+            snippet = re.sub(r"\s+/uL", " /uL", snippet)
+            if re.search(r"\b(WBC|Platelet)\b", snippet, flags=re.IGNORECASE):
+                snippet = re.sub(r",", "", snippet)
+            snippet = re.sub(r"\(low\)", "(Low)", snippet, flags=re.IGNORECASE)
+            snippet = re.sub(r"\(high\)", "(High)", snippet, flags=re.IGNORECASE)
+            snippet = re.sub(r"\(normal\)", "(Normal)", snippet, flags=re.IGNORECASE)
+            candidates.append(snippet)
+
+    # Line-based fallback for list items like "- Hemoglobin: 10.2 g/dL (Low)"
+    if not candidates:
+        for line in cleaned.split('\n'):
+            s = line.strip(" -•\t")
+            if not s:
+                continue
+            m = re.search(r"Hemoglobin\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m:
+                val = m.group(1)
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"Hemoglobin {val} g/dL{status}")
+            m2 = re.search(r"WBC(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m2:
+                val = m2.group(1).replace(',', '')
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"WBC {val} /uL{status}")
+            m3 = re.search(r"RBC(?:\s*Count)?\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:million)?\s*/?uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m3:
+                val = m3.group(1)
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"RBC {val} million/uL{status}")
+            m4 = re.search(r"Platelet(?:\s*Count)?\s*:?\s*([0-9,]+)\s*/?uL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m4:
+                val = m4.group(1).replace(',', '')
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"Platelet {val} /uL{status}")
+            m5 = re.search(r"Hematocrit\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*%(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m5:
+                val = m5.group(1)
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"Hematocrit {val} %{status}")
+            m6 = re.search(r"MCV\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*fL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m6:
+                val = m6.group(1)
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"MCV {val} fL{status}")
+            m7 = re.search(r"MCH\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*pg(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m7:
+                val = m7.group(1)
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"MCH {val} pg{status}")
+            m8 = re.search(r"MCHC\s*:?\s*([0-9]+(?:\.[0-9]+)?)\s*g/?dL(?:\s*\((Low|High|Normal)\))?", s, flags=re.IGNORECASE)
+            if m8:
+                val = m8.group(1)
+                status_match = re.search(r"\((Low|High|Normal)\)", s, flags=re.IGNORECASE)
+                status = f" ({status_match.group(1).capitalize()})" if status_match else ""
+                candidates.append(f"MCHC {val} g/dL{status}")
+
+    candidates = list(dict.fromkeys(candidates))
+    confidence = 0.8 if candidates else 0.0
+    return candidates, confidence
@@ -0,0 +1,23 @@
+"""Gunicorn settings; gunicorn reads this file from the working directory.
+
+With ``preload_app`` the master imports the ASGI application once, including
+the warm-up in ``api.warmup``, and forks workers from it. Workers then start
+with Django configured, patterns compiled and tables built, and share those
+pages copy-on-write. Set GUNICORN_PRELOAD=0 to load the app in each worker
+instead (needed for ``--reload``).
+"""
+import gc
+import os
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        # Keep the collector from touching (and so copying) the preloaded
+        # objects in every worker.
+        gc.freeze()
@@ -1,4 +1,3 @@
-
 import os
 
 from django.core.asgi import get_asgi_application
@@ -6,3 +5,17 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medical_simplifier.settings')
 
 application = get_asgi_application()
+
+# After setup, so the first request (or, with gunicorn's preload_app, every
+# forked worker) starts warm.
+from django.conf import settings  # noqa: E402
+
+if settings.APP_WARMUP:
+    from api.warmup import warm  # noqa: E402
+
+    warm()
+
+# Bodies over REQUEST_MAX_BYTES get 413 before Django has read them in full.
+from api.ingest import BodyLimit  # noqa: E402
+
+application = BodyLimit(application, settings.REQUEST_MAX_BYTES)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -21,26 +22,42 @@ ALLOWED_HOSTS = [
 
 # Application definition
 
-INSTALLED_APPS = [
-    'django.contrib.admin',
-    'django.contrib.auth',
-    'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
-    'django.contrib.staticfiles',
-    "api"
+# API_LEAN=1 is the profile for API-only deployments. The /api/ routes use no
+# admin, auth, sessions or messages, so those apps, their middleware and the
+# /admin/ route are left out; startup and per-request overhead both shrink.
+API_LEAN = os.getenv("API_LEAN", "0") == "1"
 
-]
+if API_LEAN:
+    INSTALLED_APPS = ["api"]
+    MIDDLEWARE = [
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ]
+else:
+    INSTALLED_APPS = [
+        'django.contrib.admin',
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+        "api"
 
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-]
+    ]
+
+    MIDDLEWARE = [
+        'django.middleware.security.SecurityMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+
+# Run api.warmup when the ASGI/WSGI application is created, so compiled
+# patterns and lookup tables exist before the first request.
+APP_WARMUP = os.getenv("APP_WARMUP", "1") == "1"
 
 ROOT_URLCONF = 'medical_simplifier.urls'
 
@@ -50,19 +67,212 @@ TEMPLATES = [
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.request',
+            'context_processors': ['django.template.context_processors.request'] + ([] if API_LEAN else [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-            ],
+            ]),
         },
     },
 ]
 
 WSGI_APPLICATION = 'medical_simplifier.wsgi.application'
+ASGI_APPLICATION = 'medical_simplifier.asgi.application'
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# SQLite backs the job queue. WAL lets several gunicorn workers read while
+# one writes; the timeout covers short write contention.
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("DATABASE_PATH", str(BASE_DIR / "db.sqlite3")),
+        "OPTIONS": {
+            "timeout": 20,
+            "transaction_mode": "IMMEDIATE",
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+        },
+    }
+}
+
+# Result cache for /api/process. The local-memory backend is per worker; point
+# RESULT_CACHE_BACKEND/RESULT_CACHE_LOCATION at a shared backend (e.g.
+# django.core.cache.backends.redis.RedisCache) to share across workers.
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "results": {
+        "BACKEND": os.getenv("RESULT_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("RESULT_CACHE_LOCATION", "results"),
+        "TIMEOUT": int(os.getenv("RESULT_CACHE_TTL", "3600")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))},
+    },
+}
+
+# In-process memo of AI summaries keyed on the compact test list sent to the
+# model. "coarse" keys (and prompts) on analyte + status only; "off" disables.
+SUMMARY_CACHE_MODE = os.getenv("SUMMARY_CACHE_MODE", "exact")
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "512"))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "86400"))
+
+# Upper bound on concurrent blocking provider/OCR calls made by /api/process.
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+
+# Groq call policy. AI_DEADLINE_SECONDS is the budget shared by AI extraction
+# and AI summarization for one request; AI_CALL_TIMEOUT caps each attempt.
+# After AI_BREAKER_FAILURES consecutive failed calls the breaker opens and
+# requests use the rule-based path until AI_BREAKER_RESET_SECONDS have passed.
+AI_DEADLINE_SECONDS = float(os.getenv("AI_DEADLINE_SECONDS", "20"))
+AI_CALL_TIMEOUT = float(os.getenv("AI_CALL_TIMEOUT", "10"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "2"))
+AI_RETRY_BACKOFF = float(os.getenv("AI_RETRY_BACKOFF", "0.5"))
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "5"))
+AI_BREAKER_RESET_SECONDS = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+
+# When to call the LLM at all. AI_EXTRACT_POLICY: "auto" only when the regex
+# pass left measurement-like tokens unclaimed, "always" or "never".
+# AI_SUMMARY_POLICY: "abnormal" only when a test is low/high, "always" or "never".
+AI_EXTRACT_POLICY = os.getenv("AI_EXTRACT_POLICY", "auto")
+AI_SUMMARY_POLICY = os.getenv("AI_SUMMARY_POLICY", "abnormal")
+
+# Groq HTTP transport: one keep-alive connection pool shared by all threads.
+# Size it to cover AI_MAX_CONCURRENCY plus JOBS_AI_CONCURRENCY. AI_COALESCE
+# makes concurrent identical prompts share one in-flight call.
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "16"))
+AI_HTTP_MAX_KEEPALIVE = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", str(AI_HTTP_MAX_CONNECTIONS)))
+AI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AI_HTTP_KEEPALIVE_EXPIRY", "30"))
+AI_COALESCE = os.getenv("AI_COALESCE", "1") == "1"
+
+# Admission control, per process. Each client may send RATE_LIMIT_PER_SECOND
+# requests per second in bursts of RATE_LIMIT_BURST (a batch costs one per
+# report, up to the burst); beyond that the API answers 429. 0 disables it.
+# Clients are told apart by RATE_LIMIT_CLIENT_HEADER when set (only behind a
+# gateway that authenticates it), else, behind RATE_LIMIT_TRUST_FORWARDED
+# proxies, by the X-Forwarded-For entry the outermost of them added (counted
+# from the right; clients can forge anything left of it), else by peer address.
+# AI_RATE_LIMIT_PER_MINUTE / AI_RATE_LIMIT_BURST cap each client's LLM calls,
+# and at most AI_MAX_PENDING calls may wait for an AI_MAX_CONCURRENCY thread.
+# Past either, AI calls are skipped and the rule-based result is returned with
+# meta.degraded set. Background jobs are never degraded.
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+RATE_LIMIT_TRUST_FORWARDED = int(os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0"))
+AI_RATE_LIMIT_PER_MINUTE = float(os.getenv("AI_RATE_LIMIT_PER_MINUTE", "0"))
+AI_RATE_LIMIT_BURST = float(os.getenv("AI_RATE_LIMIT_BURST", "10"))
+AI_MAX_PENDING = int(os.getenv("AI_MAX_PENDING", "16"))
+
+# Patient history (requests with a patient_id). Reading trends and storing
+# results both need one of HISTORY_API_KEYS (comma-separated), sent as
+# "Authorization: Bearer <key>" or "X-API-Key: <key>"; with none configured
+# patient history is off. The batch endpoint writes HISTORY_BULK_SIZE reports
+# per bulk insert; trend queries return at most HISTORY_MAX_POINTS points per
+# analyte.
+HISTORY_API_KEYS = [k.strip() for k in os.getenv("HISTORY_API_KEYS", "").split(",") if k.strip()]
+HISTORY_BULK_SIZE = int(os.getenv("HISTORY_BULK_SIZE", "1000"))
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "1000"))
+
+# /api/process/batch limits: reports per request and reports in flight at once.
+BATCH_MAX_REPORTS = int(os.getenv("BATCH_MAX_REPORTS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+# OCR. Uploads larger than OCR_MAX_UPLOAD_BYTES are rejected before decoding,
+# and images over OCR_MAX_PIXELS are rejected after reading only the header.
+# Scans are converted to grayscale, downscaled to OCR_MAX_SIDE pixels on the
+# long side and binarized before tesseract runs in a pool of OCR_WORKERS
+# processes. At most OCR_MAX_PENDING further jobs may wait; beyond that the
+# request gets 503.
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", "8"))
+OCR_MAX_UPLOAD_BYTES = int(os.getenv("OCR_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", "40000000"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2500"))
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "1") == "1"
+# 6 = assume a single uniform block of text, which suits tabular lab reports.
+OCR_PSM = int(os.getenv("OCR_PSM", "6"))
+# Multi-page TIFF/PDF: pages are OCR'd in parallel and the rest are skipped
+# once every analyte in OCR_EARLY_STOP_PANEL (comma-separated registry keys;
+# unset means the whole registry, empty disables early stop) has been seen.
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "20"))
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "300"))
+_early_stop_panel = os.getenv("OCR_EARLY_STOP_PANEL")
+OCR_EARLY_STOP_PANEL = (
+    None if _early_stop_panel is None
+    else tuple(k.strip() for k in _early_stop_panel.split(",") if k.strip())
+)
+OCR_WHITELIST = os.getenv(
+    "OCR_WHITELIST",
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,:;%/()-+<>*µ",
+)
+
+# Request ingest. A body over REQUEST_MAX_BYTES is refused with 413 as soon
+# as its Content-Length or the bytes received so far exceed it, and an upload
+# is cut off once past OCR_MAX_UPLOAD_BYTES instead of after being received
+# whole. Bodies and uploads above FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to
+# temporary files (OCR workers map the upload's file rather than being sent
+# its bytes), and JSON batches are decoded one report at a time.
+REQUEST_MAX_BYTES = int(os.getenv("REQUEST_MAX_BYTES", str(OCR_MAX_UPLOAD_BYTES + 1024 * 1024)))
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", str(1024 * 1024)))
+FILE_UPLOAD_HANDLERS = [
+    "api.ingest.LimitedUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+# Observability. /api/metrics serves per-stage latency histograms and request
+# counters in the Prometheus text format (per worker process). Application
+# logs are structured (key=value, or one JSON object per line with
+# LOG_FORMAT=json) and carry counts and timings, never report text. The
+# default WARNING level keeps per-request logging off the hot path; INFO adds
+# one line per request and DEBUG adds per-stage details.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "structured": {
+            "()": "api.logfmt.StructuredFormatter",
+            "json_lines": os.getenv("LOG_FORMAT", "text") == "json",
+            "fmt": "%(asctime)s %(levelname)s %(name)s %(message)s",
+        },
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "structured"},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
+
+# Background jobs (POST /api/jobs). Each server process starts a worker on
+# first use unless JOBS_EMBEDDED_WORKER=0, in which case run
+# `manage.py run_jobs` separately. JOBS_CONCURRENCY bounds jobs in flight
+# per worker; OCR and AI/pipeline stages are throttled separately.
+JOBS_EMBEDDED_WORKER = os.getenv("JOBS_EMBEDDED_WORKER", "1") == "1"
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "8"))
+JOBS_OCR_CONCURRENCY = int(os.getenv("JOBS_OCR_CONCURRENCY", str(OCR_WORKERS)))
+JOBS_AI_CONCURRENCY = int(os.getenv("JOBS_AI_CONCURRENCY", "4"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+JOBS_LEASE_SECONDS = int(os.getenv("JOBS_LEASE_SECONDS", "300"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETENTION_SECONDS = int(os.getenv("JOBS_RETENTION_SECONDS", "86400"))
+# Uploaded images of queued jobs are copied here (not into the database) and
+# deleted when the job finishes. Shared by all processes running workers.
+JOBS_UPLOAD_DIR = os.getenv("JOBS_UPLOAD_DIR", str(BASE_DIR / "job_uploads"))
+# Completion webhooks: POSTed JSON, signed with HMAC-SHA256 when a secret is
+# set, without following redirects. Only hosts in JOBS_WEBHOOK_ALLOWED_HOSTS
+# are accepted when it is set; otherwise any host resolving to public
+# addresses only (JOBS_WEBHOOK_ALLOW_PRIVATE=1 also admits loopback, private
+# and link-local ones, e.g. for local development).
+JOBS_WEBHOOK_TIMEOUT = float(os.getenv("JOBS_WEBHOOK_TIMEOUT", "10"))
+JOBS_WEBHOOK_RETRIES = int(os.getenv("JOBS_WEBHOOK_RETRIES", "3"))
+JOBS_WEBHOOK_SECRET = os.getenv("JOBS_WEBHOOK_SECRET", "")
+JOBS_WEBHOOK_ALLOWED_HOSTS = [h.strip() for h in os.getenv("JOBS_WEBHOOK_ALLOWED_HOSTS", "").split(",") if h.strip()]
+JOBS_WEBHOOK_ALLOW_PRIVATE = os.getenv("JOBS_WEBHOOK_ALLOW_PRIVATE", "0") == "1"
@@ -1,8 +1,12 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     # path('', include('api.urls')),
     path('api/', include('api.urls')),
 ]
+
+if not settings.API_LEAN:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -5,3 +5,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medical_simplifier.settings')
 
 application = get_wsgi_application()
+
+# After setup, so the first request (or, with gunicorn's preload_app, every
+# forked worker) starts warm.
+from django.conf import settings  # noqa: E402
+
+if settings.APP_WARMUP:
+    from api.warmup import warm  # noqa: E402
+
+    warm()